@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Response
+
+from app.core.database import db_pool
+from app.core.http_client import transport_stats
+from app.core.metrics import render_metrics, stats_collector
+from app.core.websocket import coalescing_stats
+from app.services.audio_normalize import normalization_stats
+from app.services.blob_store import blob_store
+from app.services.chat_cache import chat_history_cache
+from app.services.extraction_cache import extraction_cache
+from app.services.extraction_jobs import extraction_jobs
+from app.services.intent_classifier import intent_classifier
+from app.services.local_extractors import local_extractor
+from app.services.message_writer import message_writer
+from app.services.provider_gateway import deepseek_gateway, kimi_gateway
+from app.services.response_cache import response_cache
+from app.services.speculation import speculation_stats
+from app.services.title_worker import title_worker
+from app.services.transcription import transcriber
+from app.services.turn_metrics import turn_metrics
+
+router = APIRouter()
+
+stats_collector.register("db_pool", db_pool.stats)
+stats_collector.register("llm_transport", transport_stats, nested={"hosts": "host"})
+for provider, gateway in (("kimi", kimi_gateway), ("deepseek", deepseek_gateway)):
+    stats_collector.register("gateway", gateway.stats, labels={"provider": provider},
+                             nested={"endpoints": "endpoint"}, states=("circuit",))
+stats_collector.register("intent_classifier", intent_classifier.stats)
+stats_collector.register("speculation", speculation_stats.stats)
+stats_collector.register("response_cache", response_cache.stats)
+stats_collector.register("chat_history_cache", chat_history_cache.stats)
+stats_collector.register("message_writer", message_writer.stats)
+stats_collector.register("title_worker", title_worker.stats)
+stats_collector.register("ws_coalescing", coalescing_stats)
+stats_collector.register("turn", turn_metrics.stats, root_label="mode")
+stats_collector.register("extraction_jobs", extraction_jobs.stats)
+stats_collector.register("extraction_cache", extraction_cache.stats)
+stats_collector.register("local_extractor", local_extractor.stats)
+stats_collector.register("blob_store", blob_store.stats)
+stats_collector.register("transcription", transcriber.stats)
+stats_collector.register("audio_normalization", normalization_stats)
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Collected on the event loop: several stats() read structures only the loop mutates
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from app.schemas.schemas import AnalysisResponse, AnalysisIntent, AnalysisStructureSection
 from app.core.logger import logger
-from app.core.database import get_db_connection
-import json
+from app.core.database import run_in_db
+from app.repositories import analysis_repository
 import uuid
 
 router = APIRouter()
@@ -20,34 +20,16 @@ async def create_analysis(intent: AnalysisIntent):
     
     analysis_id = str(uuid.uuid4())
     
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            # Get default user
-            cursor.execute("SELECT id FROM users LIMIT 1")
-            user_row = cursor.fetchone()
-            if not user_row:
-                # Fallback to create a user if strictly needed, or error
-                # For now, let's assume one exists or create a dummy
-                user_id = str(uuid.uuid4())
-                cursor.execute("INSERT INTO users (id, username, password_hash) VALUES (%s, 'admin', 'hash')", (user_id,))
-            else:
-                user_id = user_row['id']
-
-            sql = """
-                INSERT INTO analysis_results (id, user_id, topic, audience, duration, style, structure)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(sql, (
-                analysis_id,
-                user_id,
-                intent.topic,
-                intent.audience,
-                intent.duration,
-                intent.style,
-                json.dumps(structure, ensure_ascii=False)
-            ))
-        conn.commit()
+        await run_in_db(
+            analysis_repository.create_analysis,
+            analysis_id,
+            intent.topic,
+            intent.audience,
+            intent.duration,
+            intent.style,
+            structure
+        )
         logger.info(f"Analysis created with ID: {analysis_id}")
         
         return {
@@ -58,85 +40,42 @@ async def create_analysis(intent: AnalysisIntent):
     except Exception as e:
         logger.error(f"Error creating analysis: {e}")
         raise HTTPException(status_code=500, detail="Failed to create analysis")
-    finally:
-        conn.close()
 
 @router.get("/latest", response_model=AnalysisResponse)
 async def get_latest_analysis():
     logger.info("Fetching latest analysis")
     
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            sql = """
-                SELECT topic, audience, duration, style, structure 
-                FROM analysis_results 
-                ORDER BY created_at DESC 
-                LIMIT 1
-            """
-            cursor.execute(sql)
-            row = cursor.fetchone()
-            
-            if not row:
-                # Return a default/mock if DB is empty to avoid frontend crash on init
-                return {
-                    "intent": {
-                        "topic": "欢迎",
-                        "audience": "通用",
-                        "duration": 0,
-                        "style": "默认"
-                    },
-                    "structure": []
-                }
-            
-            return {
-                "intent": {
-                    "topic": row['topic'],
-                    "audience": row['audience'],
-                    "duration": row['duration'],
-                    "style": row['style']
-                },
-                "structure": json.loads(row['structure']) if isinstance(row['structure'], str) else row['structure']
-            }
-            
+        analysis = await run_in_db(analysis_repository.get_latest_analysis)
     except Exception as e:
         logger.error(f"Error fetching latest analysis: {e}")
         raise HTTPException(status_code=500, detail="Database error")
-    finally:
-        conn.close()
+
+    if not analysis:
+        # Return a default/mock if DB is empty to avoid frontend crash on init
+        return {
+            "intent": {
+                "topic": "欢迎",
+                "audience": "通用",
+                "duration": 0,
+                "style": "默认"
+            },
+            "structure": []
+        }
+    
+    return analysis
 
 @router.get("/{id}", response_model=AnalysisResponse)
 async def get_analysis(id: str):
     logger.info(f"Fetching analysis with ID: {id}")
     
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            sql = """
-                SELECT topic, audience, duration, style, structure 
-                FROM analysis_results 
-                WHERE id = %s
-            """
-            cursor.execute(sql, (id,))
-            row = cursor.fetchone()
-            
-            if not row:
-                raise HTTPException(status_code=404, detail="Analysis not found")
-            
-            return {
-                "intent": {
-                    "topic": row['topic'],
-                    "audience": row['audience'],
-                    "duration": row['duration'],
-                    "style": row['style']
-                },
-                "structure": json.loads(row['structure']) if isinstance(row['structure'], str) else row['structure']
-            }
-            
-    except HTTPException as he:
-        raise he
+        analysis = await run_in_db(analysis_repository.get_analysis, id)
     except Exception as e:
         logger.error(f"Error fetching analysis {id}: {e}")
         raise HTTPException(status_code=500, detail="Database error")
-    finally:
-        conn.close()
+
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    
+    return analysis
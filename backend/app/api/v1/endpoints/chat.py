@@ -1,162 +1,159 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Header, UploadFile, File
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Header, UploadFile, File, Query, Response
 from app.schemas.schemas import ChatRequest, Message, ChatSession
+from app.core.config import settings
 from app.core.logger import logger
-from app.core.database import get_db_connection
-from app.services.ai_service import ai_service
+from app.core.database import run_in_db
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.websocket import CoalescingSender
+from app.repositories import chat_repository
+from app.services.ai_service import EXTRACTOR_VERSIONS, FALLBACK_TEXTS, ai_service
+from app.services.audio_normalize import TARGET_RATE, AudioFormat, AudioFormatError, StreamNormalizer
+from app.services.extraction_cache import extraction_cache
+from app.services.local_extractors import local_extractor
+from app.services.message_writer import message_writer
+from app.services.chat_cache import chat_history_cache
+from app.services.title_worker import title_worker
 import json
 import asyncio
-import uuid
+import functools
+import hashlib
 import os
 import tempfile
-from typing import List, Optional
+import uuid
+from datetime import datetime
+from typing import List, Literal, Optional
 
 router = APIRouter()
 
-def get_user_id(x_user_id: Optional[str] = Header(None)) -> str:
+async def get_user_id(x_user_id: Optional[str] = Header(None)) -> str:
     if x_user_id:
         return x_user_id
-    
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT id FROM users LIMIT 1")
-            row = cursor.fetchone()
-            if row:
-                return row['id']
-            user_id = str(uuid.uuid4())
-            cursor.execute("INSERT INTO users (id, username, password_hash) VALUES (%s, 'default_user', 'default')", (user_id,))
-            conn.commit()
-            return user_id
-    finally:
-        conn.close()
-
-def get_chat_history(chat_id: str, user_id: str, limit: int = 50) -> list:
-    conn = get_db_connection()
-    history = []
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT id FROM chats WHERE id = %s AND user_id = %s", (chat_id, user_id))
-            if not cursor.fetchone():
-                return []
-            
-            cursor.execute("""
-                SELECT role, content, model, thinking, created_at
-                FROM messages 
-                WHERE chat_id = %s 
-                ORDER BY created_at ASC 
-                LIMIT %s
-            """, (chat_id, limit))
-            for row in cursor.fetchall():
-                history.append({
-                    "role": row['role'], 
-                    "content": row['content'],
-                    "model": row.get('model'),
-                    "thinking": row.get('thinking'),
-                    "created_at": str(row['created_at'])
-                })
-    finally:
-        conn.close()
-    return history
-
-def get_user_chats(user_id: str, days: int = 3) -> List[ChatSession]:
-    conn = get_db_connection()
-    chats = []
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT id, title, created_at
-                FROM chats
-                WHERE user_id = %s AND created_at >= NOW() - INTERVAL %s DAY
-                ORDER BY created_at DESC
-            """, (user_id, days))
-            for row in cursor.fetchall():
-                chats.append(ChatSession(
-                    id=row['id'],
-                    title=row['title'] or "New Chat",
-                    created_at=str(row['created_at'])
-                ))
-    finally:
-        conn.close()
-    return chats
+    return await run_in_db(chat_repository.get_or_create_default_user)
 
 @router.get("/history", response_model=List[ChatSession])
-async def get_history(days: int = 3, x_user_id: Optional[str] = Header(None)):
-    return get_user_chats(get_user_id(x_user_id), days)
+async def get_history(
+    response: Response,
+    days: int = 3,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    x_user_id: Optional[str] = Header(None)
+):
+    """
+    List the user's recent chats newest first. When more chats exist, the
+    X-Next-Cursor response header carries the cursor for the next page.
+    """
+    user_id = await get_user_id(x_user_id)
+    try:
+        chats, next_cursor = await run_in_db(chat_repository.get_user_chats, user_id, days, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [ChatSession(**chat) for chat in chats]
 
 @router.delete("/{chat_id}")
 async def delete_chat(chat_id: str, x_user_id: Optional[str] = Header(None)):
-    user_id = get_user_id(x_user_id)
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("DELETE FROM messages WHERE chat_id = %s", (chat_id,))
-            cursor.execute("DELETE FROM chats WHERE id = %s AND user_id = %s", (chat_id, user_id))
-            conn.commit()
-            if cursor.rowcount == 0:
-                raise HTTPException(status_code=404, detail="Chat not found")
-            return {"message": "Chat deleted successfully"}
-    finally:
-        conn.close()
+    user_id = await get_user_id(x_user_id)
+    # Queued writes for this chat would otherwise land after the delete
+    await message_writer.wait_for_chat(chat_id)
+    chat_history_cache.invalidate(chat_id)
+    if not await run_in_db(chat_repository.delete_chat, chat_id, user_id):
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return {"message": "Chat deleted successfully"}
 
 @router.get("/{chat_id}/messages", response_model=List[Message])
-async def get_messages(chat_id: str, x_user_id: Optional[str] = Header(None)):
-    user_id = get_user_id(x_user_id)
-    history = get_chat_history(chat_id, user_id, limit=100)
-    return [Message(**msg, chat_id=chat_id) for msg in history]
-
-def save_message(chat_id: str, role: str, content: str, model: str = None, thinking: str = None):
-    conn = get_db_connection()
+async def get_messages(
+    chat_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    order: Literal["latest", "oldest"] = "latest",
+    x_user_id: Optional[str] = Header(None)
+):
+    """
+    A page of messages in chronological order. order=latest (default) returns the
+    newest messages and X-Next-Cursor scrolls back in time; order=oldest pages
+    forward from the start of the chat.
+    """
+    user_id = await get_user_id(x_user_id)
+    await message_writer.wait_for_chat(chat_id)
     try:
-        with conn.cursor() as cursor:
-            msg_id = str(uuid.uuid4())
-            cursor.execute("""
-                INSERT INTO messages (id, chat_id, role, content, model, thinking)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (msg_id, chat_id, role, content, model, thinking))
-        conn.commit()
-    finally:
-        conn.close()
+        messages, next_cursor = await run_in_db(
+            chat_repository.get_messages_page, chat_id, user_id, limit, cursor, order
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [Message(**msg, chat_id=chat_id) for msg in messages or []]
+
+async def load_chat_history(chat_id: str, user_id: str, limit: int = 20) -> list:
+    """
+    Read-through access to a chat's recent messages: served from the in-process
+    cache when possible, otherwise loaded from the database and cached.
+    """
+    history = chat_history_cache.get(chat_id, user_id, limit)
+    if history is not None:
+        return history
 
-def update_chat_title(chat_id: str, title: str):
-    conn = get_db_connection()
+    # A message saved while the read is in flight may be missing from it; the fill is then not cached
+    generation = chat_history_cache.begin_fill(chat_id)
+    history = None
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("UPDATE chats SET title = %s WHERE id = %s", (title, chat_id))
-        conn.commit()
+        # Make the previous turn's queued writes visible before reading
+        await message_writer.wait_for_chat(chat_id)
+        history = await run_in_db(
+            chat_repository.get_chat_history, chat_id, user_id, limit=chat_history_cache.max_messages
+        )
     finally:
-        conn.close()
+        chat_history_cache.end_fill(chat_id, generation, user_id, history)
+    if history is None:
+        # Unknown chat or not owned by this user
+        return []
+    return history[-limit:]
 
-def create_chat_session(title: str = "New Chat", user_id: str = None) -> str:
-    if not user_id:
-        raise ValueError("User ID is required")
-        
-    conn = get_db_connection()
-    chat_id = str(uuid.uuid4())
+async def load_history_before(chat_id: str, user_id: str, message_id: str, limit: int = 20) -> list:
+    """The chat's recent messages without the current turn's user message, which is queued already."""
+    history = await load_chat_history(chat_id, user_id, limit=limit + 1)
+    return [message for message in history if message.get("id") != message_id][-limit:]
+
+async def wait_for_saved(chat_id: str, *futures) -> bool:
+    """Wait for queued message writes; a lost write is logged and reported as False."""
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("INSERT INTO chats (id, user_id, title) VALUES (%s, %s, %s)", (chat_id, user_id, title))
-        conn.commit()
-        return chat_id
-    finally:
-        conn.close()
+        await asyncio.gather(*futures)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to persist chat turn for {chat_id}: {e}")
+        return False
 
 @router.post("/upload_file")
 async def upload_file(
     file: UploadFile = File(...), 
     x_user_id: Optional[str] = Header(None)
 ):
-    user_id = get_user_id(x_user_id)
+    user_id = await get_user_id(x_user_id)
     logger.info(f"Uploading file for chat: {file.filename}, user: {user_id}")
     
     file_ext = os.path.splitext(file.filename)[1]
+    digest = hashlib.sha256()
     with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp:
-        content = await file.read()
-        tmp.write(content)
+        while block := await file.read(1024 * 1024):
+            digest.update(block)
+            tmp.write(block)
         tmp_path = tmp.name
         
     try:
-        # Use ai_service to extract content
-        content, file_id = await ai_service.get_document_content(tmp_path)
+        # Parse locally when the format allows, otherwise extract remotely; a file already
+        # extracted (here or in the knowledge base) is reused
+        file_id = None
+        content = await local_extractor.extract_cached(tmp_path, digest.hexdigest())
+        if content is None:
+            extractor = "kimi-file-extract"
+            content, file_id = await extraction_cache.get_or_extract(
+                digest.hexdigest(), extractor, EXTRACTOR_VERSIONS[extractor],
+                lambda: ai_service.get_document_content(tmp_path),
+                is_failure=FALLBACK_TEXTS.__contains__,
+            )
         
         return {
             "filename": file.filename,
@@ -173,43 +170,52 @@ async def upload_file(
 
 @router.post("", response_model=Message)
 async def chat(request: ChatRequest, x_user_id: Optional[str] = Header(None)):
-    user_id = get_user_id(x_user_id)
+    user_id = await get_user_id(x_user_id)
     chat_id = request.chat_id
     
     if not chat_id:
         try:
             title = request.content[:20] if request.content else "新对话"
-            chat_id = create_chat_session(title=title, user_id=user_id)
+            chat_id = await run_in_db(chat_repository.create_chat_session, title=title, user_id=user_id)
         except Exception as e:
             logger.error(f"Failed to create chat session: {e}")
             chat_id = None
     
-    if chat_id and request.content:
-        save_message(chat_id, "user", request.content)
-        
     if not request.content:
         return Message(role="assistant", content="", chat_id=chat_id)
 
+    # Queued as the turn starts, so the question is kept even if answering fails
+    user_saved = None
+    if chat_id:
+        user_saved = message_writer.save_turn(chat_id, [
+            {"role": "user", "content": request.content, "created_at": datetime.now()}
+        ])
+
     try:
         history = request.history
         result = await ai_service.process_chat_full(request.content, history, user_id=user_id)
-        
-        response = Message(
-            role=result["role"],
-            content=result["content"],
-            model=result.get("model"),
-            thinking=result.get("thinking"),
-            chat_id=chat_id
-        )
-        
-        if chat_id:
-            save_message(chat_id, "assistant", response.content, response.model, response.thinking)
-            
-        return response
     except Exception as e:
         logger.error(f"Error in REST chat: {e}")
+        if user_saved:
+            await wait_for_saved(chat_id, user_saved)
         return Message(role="assistant", content="抱歉，服务器暂时遇到问题，请稍后再试。", chat_id=chat_id)
 
+    response = Message(
+        role=result["role"],
+        content=result["content"],
+        model=result.get("model"),
+        thinking=result.get("thinking"),
+        chat_id=chat_id
+    )
+    
+    if chat_id:
+        assistant_saved = message_writer.save_message(
+            chat_id, "assistant", response.content, model=response.model, thinking=response.thinking
+        )
+        await wait_for_saved(chat_id, user_saved, assistant_saved)
+        
+    return response
+
 try:
     import dashscope
     from dashscope.audio.asr import Recognition, RecognitionCallback, RecognitionResult
@@ -217,8 +223,8 @@ except ImportError:
     dashscope = None
 
 class WebSocketASRCallback(RecognitionCallback):
-    def __init__(self, websocket: WebSocket, loop):
-        self.websocket = websocket
+    def __init__(self, sender: CoalescingSender, loop):
+        self.sender = sender
         self.loop = loop
         self.transcribed_text = ""
 
@@ -227,115 +233,106 @@ class WebSocketASRCallback(RecognitionCallback):
         if 'text' in sentence:
             text = sentence['text']
             asyncio.run_coroutine_threadsafe(
-                self.websocket.send_json({"type": "asr_partial", "content": text}),
+                self.sender.send({"type": "asr_partial", "content": text}),
                 self.loop
             )
             if result.is_sentence_end(sentence):
                 self.transcribed_text += text
                 asyncio.run_coroutine_threadsafe(
-                    self.websocket.send_json({"type": "asr_final", "content": text}),
+                    self.sender.send({"type": "asr_final", "content": text}),
                     self.loop
                 )
 
     def on_error(self, result: RecognitionResult) -> None:
         asyncio.run_coroutine_threadsafe(
-             self.websocket.send_json({"type": "error", "content": str(result)}),
+             self.sender.send({"type": "error", "content": str(result)}),
              self.loop
         )
 
-async def process_llm_request(websocket: WebSocket, text: str, chat_id: str = None, user_id: str = None):
+async def process_llm_request(sender: CoalescingSender, text: str, chat_id: str = None, user_id: str = None):
     if not user_id:
-        user_id = get_user_id(None)
+        user_id = await get_user_id(None)
     
-    await websocket.send_json({"type": "llm_start", "content": ""})
+    await sender.send({"type": "llm_start", "content": ""})
     
+    new_chat = not chat_id
     if not chat_id:
         try:
-            chat_id = create_chat_session(title=text[:20], user_id=user_id)
-            await websocket.send_json({"type": "chat_info", "chat_id": chat_id})
+            chat_id = await run_in_db(chat_repository.create_chat_session, title=text[:20], user_id=user_id)
+            # A brand-new chat has no history; seed the cache so no read is needed
+            chat_history_cache.put(chat_id, user_id, [])
+            await sender.send({"type": "chat_info", "chat_id": chat_id})
         except Exception as e:
             logger.error(f"Failed to create chat session: {e}")
             
-    if chat_id:
-        save_message(chat_id, "user", text)
+    # Queued as the turn starts, so the question is kept even if the stream fails or the client leaves
+    user_message_id = str(uuid.uuid4())
+    user_saved = None
 
-    history = []
+    # History is loaded by stream_chat, concurrently with intent detection and retrieval
+    history_loader = None
     if chat_id:
-        full_history = get_chat_history(chat_id, user_id, limit=20)
-        logger.info(f"Full history length: {len(full_history)}")
-        if full_history:
-            logger.info(f"Last message in history: {full_history[-1]['content'][:20]}...")
-            logger.info(f"Current text: {text[:20]}...")
-            
-        if full_history and full_history[-1]['content'] == text:
-             history = full_history[:-1]
-             logger.info("Matched last message, using previous history.")
-        else:
-             history = full_history
-             logger.info("Did not match last message or history empty.")
-             
-    logger.info(f"Final history length for LLM: {len(history)}")
+        user_saved = message_writer.save_turn(chat_id, [
+            {"id": user_message_id, "role": "user", "content": text, "created_at": datetime.now()}
+        ])
+        history_loader = functools.partial(load_history_before, chat_id, user_id, user_message_id, limit=20)
 
     full_response = ""
     full_thinking = ""
     current_model = "unknown"
 
-    async def safe_send(data: dict) -> bool:
-        try:
-            await websocket.send_json(data)
-            return True
-        except Exception:
-            return False
-
+    turn_completed = False
     try:
-        async for event in ai_service.stream_chat(text, history, user_id=user_id):
+        async for event in ai_service.stream_chat(text, [], user_id=user_id, history_loader=history_loader):
             if event["type"] == "llm_chunk":
                 if event["content"]:
                     full_response += event["content"]
-                    if not await safe_send(event):
+                    if not await sender.send(event):
                         break
                 if "model" in event:
                     current_model = event["model"]
             elif event["type"] == "thinking_chunk":
                 full_thinking += event["content"]
-                if not await safe_send(event):
+                if not await sender.send(event):
                     break
             elif event["type"] == "thinking_done":
                 pass
             else:
-                if not await safe_send(event):
+                if not await sender.send(event):
                     break
-        
-        if chat_id:
-            save_message(chat_id, "assistant", full_response, current_model, full_thinking)
-            logger.info(f"Saved assistant message. Checking if title update is needed. History length: {len(history)}")
-            
-            # Generate dynamic title for EVERY turn to keep it updated
-            logger.info("Generating title for chat...")
-            try:
-                # Use user input text AND assistant response to generate title
-                new_title = await ai_service.generate_title(text, full_response)
-                logger.info(f"Generated raw title: {new_title}")
-                
-                if new_title and new_title != "新对话":
-                    logger.info(f"Updating chat {chat_id} title to: {new_title}")
-                    update_chat_title(chat_id, new_title)
-                    await safe_send({"type": "chat_info", "chat_id": chat_id, "title": new_title})
-                else:
-                    logger.warning(f"Generated title was empty or default: {new_title}")
-            except Exception as e:
-                logger.error(f"Failed to update title: {e}")
-            
+        turn_completed = True
     except Exception as e:
         logger.error(f"Error in WebSocket LLM process: {e}")
+    finally:
+        # The sender outlives the turn; only the pending frame is pushed out here
+        await sender.flush()
+
+    if not chat_id:
+        return
+
+    saved = [user_saved]
+    if turn_completed or full_response:
+        saved.append(message_writer.save_message(
+            chat_id, "assistant", full_response, model=current_model, thinking=full_thinking
+        ))
+    if not await wait_for_saved(chat_id, *saved) or not turn_completed:
+        return
+
+    # Titling runs in the background and pushes chat_info through the connection's sender,
+    # so it is serialised with later turns and dropped once the socket is gone
+    title_worker.request(chat_id, text, full_response, first_turn=new_chat, notify=sender.send)
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     loop = asyncio.get_event_loop()
+    # One sender per connection: every frame, including background title and ASR pushes,
+    # goes through its lock. Streamed chunks are merged; other events are sent immediately
+    sender = CoalescingSender(websocket)
     
     recognition = None
     callback = None
+    normalizer = None
     
     try:
         while True:
@@ -349,7 +346,8 @@ async def websocket_endpoint(websocket: WebSocket):
             if "bytes" in message:
                 if recognition:
                     try:
-                        recognition.send_audio_frame(message["bytes"])
+                        for frame in normalizer.feed(message["bytes"]):
+                            recognition.send_audio_frame(frame)
                     except Exception as e:
                         logger.error(f"ASR send frame error: {e}")
             
@@ -360,28 +358,41 @@ async def websocket_endpoint(websocket: WebSocket):
                     
                     if msg_type == "start_recording":
                         if dashscope:
-                            callback = WebSocketASRCallback(websocket, loop)
+                            # Clients may stream PCM in their native format; it is normalized to 16 kHz mono
+                            try:
+                                normalizer = StreamNormalizer(AudioFormat(
+                                    int(data.get("sample_rate", TARGET_RATE)),
+                                    int(data.get("channels", 1)),
+                                    4 if data.get("encoding") == "f32le" else 2,
+                                    data.get("encoding") == "f32le",
+                                ))
+                            except (AudioFormatError, TypeError, ValueError) as e:
+                                await sender.send({"type": "error", "content": f"Unsupported audio format: {e}"})
+                                continue
+                            callback = WebSocketASRCallback(sender, loop)
                             recognition = Recognition(
-                                model='paraformer-realtime-v1',
+                                model=settings.ASR_MODEL,
                                 format='pcm',
-                                sample_rate=16000,
+                                sample_rate=TARGET_RATE,
                                 callback=callback
                             )
                             recognition.start()
                         else:
-                            await websocket.send_json({"type": "error", "content": "ASR not configured"})
+                            await sender.send({"type": "error", "content": "ASR not configured"})
                             
                     elif msg_type == "stop_recording":
                         if recognition:
+                            for frame in normalizer.flush():
+                                recognition.send_audio_frame(frame)
                             recognition.stop()
                             final_text = callback.transcribed_text
                             recognition = None
-                            await websocket.send_json({"type": "asr_stopped", "content": final_text})
+                            await sender.send({"type": "asr_stopped", "content": final_text})
                                 
                     elif msg_type == "text_message":
                         chat_id = data.get("chat_id")
-                        user_id = data.get("user_id") or get_user_id(None)
-                        await process_llm_request(websocket, data.get("content"), chat_id, user_id)
+                        user_id = data.get("user_id") or await get_user_id(None)
+                        await process_llm_request(sender, data.get("content"), chat_id, user_id)
                         
                 except json.JSONDecodeError:
                     pass
@@ -392,3 +403,5 @@ async def websocket_endpoint(websocket: WebSocket):
                 recognition.stop()
             except:
                 pass
+    finally:
+        await sender.close()
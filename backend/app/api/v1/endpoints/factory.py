@@ -1,7 +1,8 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
 from app.schemas.schemas import GenerateRequest, GeneratedContent
 from app.core.logger import logger
-from app.core.database import get_db_connection
+from app.core.database import run_in_db
+from app.repositories import analysis_repository
 import json
 import asyncio
 import uuid
@@ -18,44 +19,33 @@ async def generate_content(request: GenerateRequest):
     lesson_plan = "## Lesson Plan\n\n1. Introduction\n2. Main Content\n3. Summary"
     games = [{"name": "Interactive Quiz", "type": "quiz"}]
     
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cursor:
-            # Verify analysis_id exists to satisfy FK constraint
-            cursor.execute("SELECT id FROM analysis_results WHERE id = %s", (request.analysisId,))
-            if not cursor.fetchone():
-                # If not found, we can't insert due to FK.
-                # For dev convenience, if analysis doesn't exist, we might want to fail or create a dummy one?
-                # Failing is better to enforce consistency.
-                raise HTTPException(status_code=404, detail="Analysis ID not found")
-
-            sql = """
-                INSERT INTO generated_contents (id, analysis_id, slides, lesson_plan, games)
-                VALUES (%s, %s, %s, %s, %s)
-            """
-            cursor.execute(sql, (
-                gen_id,
-                request.analysisId,
-                json.dumps(slides, ensure_ascii=False),
-                lesson_plan,
-                json.dumps(games, ensure_ascii=False)
-            ))
-        conn.commit()
-        logger.info(f"Generation completed and saved: {gen_id}")
-        
-        return {
-            "id": gen_id,
-            "slides": slides,
-            "lessonPlan": lesson_plan,
-            "games": games
-        }
-    except HTTPException as he:
-        raise he
+        # Verify analysis_id exists to satisfy FK constraint
+        saved = await run_in_db(
+            analysis_repository.insert_generated_content,
+            gen_id,
+            request.analysisId,
+            slides,
+            lesson_plan,
+            games
+        )
     except Exception as e:
         logger.error(f"Error generating content: {e}")
         raise HTTPException(status_code=500, detail="Generation failed")
-    finally:
-        conn.close()
+
+    if not saved:
+        # If not found, we can't insert due to FK.
+        # Failing is better to enforce consistency.
+        raise HTTPException(status_code=404, detail="Analysis ID not found")
+
+    logger.info(f"Generation completed and saved: {gen_id}")
+    
+    return {
+        "id": gen_id,
+        "slides": slides,
+        "lessonPlan": lesson_plan,
+        "games": games
+    }
 
 @router.websocket("/ws")
 async def websocket_generate(websocket: WebSocket):
@@ -102,31 +92,21 @@ async def websocket_generate(websocket: WebSocket):
         games = [{"name": "Streamed Game", "type": "interactive"}]
         
         # Save to DB
-        conn = get_db_connection()
         try:
-            with conn.cursor() as cursor:
-                 # Verify analysis_id exists
-                cursor.execute("SELECT id FROM analysis_results WHERE id = %s", (analysis_id,))
-                if cursor.fetchone():
-                    sql = """
-                        INSERT INTO generated_contents (id, analysis_id, slides, lesson_plan, games)
-                        VALUES (%s, %s, %s, %s, %s)
-                    """
-                    cursor.execute(sql, (
-                        gen_id,
-                        analysis_id,
-                        json.dumps(slides, ensure_ascii=False),
-                        lesson_plan,
-                        json.dumps(games, ensure_ascii=False)
-                    ))
-                    conn.commit()
-                    logger.info(f"WebSocket generation saved to DB: {gen_id}")
-                else:
-                    logger.warning(f"Analysis ID {analysis_id} not found, skipping DB save for WebSocket gen")
+            saved = await run_in_db(
+                analysis_repository.insert_generated_content,
+                gen_id,
+                analysis_id,
+                slides,
+                lesson_plan,
+                games
+            )
+            if saved:
+                logger.info(f"WebSocket generation saved to DB: {gen_id}")
+            else:
+                logger.warning(f"Analysis ID {analysis_id} not found, skipping DB save for WebSocket gen")
         except Exception as e:
             logger.error(f"Error saving WebSocket generation to DB: {e}")
-        finally:
-            conn.close()
 
         # Send final result
         final_result = {
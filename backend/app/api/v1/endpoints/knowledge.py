@@ -1,7 +1,9 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Header
+from fastapi import APIRouter, File, UploadFile, HTTPException, Header, Query, Response
 from typing import List, Optional
 from app.schemas.schemas import KnowledgeItem
 from app.core.logger import logger
+from app.core.database import run_in_db
+from app.core.pagination import NEXT_CURSOR_HEADER
 from app.services.knowledge_service import knowledge_service
 
 router = APIRouter()
@@ -11,14 +13,27 @@ def get_user_id_or_default(x_user_id: Optional[str] = Header(None)) -> Optional[
     return x_user_id
 
 @router.get("", response_model=List[KnowledgeItem])
-async def get_knowledge(x_user_id: Optional[str] = Header(None)):
+async def get_knowledge(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    x_user_id: Optional[str] = Header(None)
+):
+    """
+    List the user's knowledge items newest first. When more items exist, the
+    X-Next-Cursor response header carries the cursor for the next page.
+    """
     logger.info(f"Fetching knowledge base list for user: {x_user_id}")
     try:
-        items = knowledge_service.get_all_items(x_user_id)
-        return items
+        items, next_cursor = await run_in_db(knowledge_service.get_items_page, x_user_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching knowledge: {e}")
         return []
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return items
 
 @router.post("/upload", response_model=KnowledgeItem)
 async def upload_knowledge(file: UploadFile = File(...), x_user_id: Optional[str] = Header(None)):
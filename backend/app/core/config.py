@@ -13,6 +13,26 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: Optional[str] = None
     DEEPSEEK_API_KEY: Optional[str] = None
     MOONSHOT_API_KEY: Optional[str] = None
+
+    # LLM HTTP transport (shared by the Kimi and DeepSeek clients)
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY: float = 120.0  # seconds an idle connection stays in the pool
+    LLM_HTTP2: bool = True  # used when the 'h2' package is installed
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_READ_TIMEOUT: float = 60.0  # streaming calls: max gap between chunks
+    LLM_SHORT_READ_TIMEOUT: float = 15.0  # small non-streaming calls (intent, title)
+    LLM_PREWARM_CONNECTIONS: int = 2  # connections opened per provider at startup
+
+    # Provider gateway: concurrency, retries and circuit breaking per provider
+    KIMI_MAX_CONCURRENCY: int = 32
+    DEEPSEEK_MAX_CONCURRENCY: int = 16
+    PROVIDER_QUEUE_TIMEOUT: float = 10.0  # seconds to wait for a concurrency slot
+    PROVIDER_MAX_RETRIES: int = 3  # on 429/5xx/connection errors
+    PROVIDER_BACKOFF_BASE: float = 0.5  # seconds; doubled per attempt, fully jittered
+    PROVIDER_BACKOFF_MAX: float = 8.0
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # consecutive failures before the circuit opens
+    CIRCUIT_RESET_TIMEOUT: float = 30.0  # seconds before a trial call is let through
     
     # Database
     DB_HOST: str = "localhost"
@@ -20,6 +40,90 @@ class Settings(BaseSettings):
     DB_USER: str = "root"
     DB_PASSWORD: str = ""
     DB_NAME: str = "edumind"
+    DB_POOL_MIN_SIZE: int = 2
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_MAX_LIFETIME: int = 3600  # seconds before a connection is recycled
+    DB_POOL_TIMEOUT: float = 10.0  # seconds to wait for a free connection
+
+    # Write-behind chat persistence
+    MESSAGE_WRITE_BATCH_SIZE: int = 200  # flush as soon as this many rows are queued
+    MESSAGE_WRITE_FLUSH_INTERVAL: float = 0.05  # seconds a write may wait before being flushed
+
+    # In-process chat history cache
+    CHAT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CHAT_CACHE_MAX_MESSAGES: int = 50  # most recent messages kept per chat
+
+    # Local intent classifier (fast path in front of the LLM intent check)
+    INTENT_LOCAL_ENABLED: bool = True
+    INTENT_MODEL_PATH: str = "models/intent_classifier.npz"  # trained by scripts/eval_intent.py
+    INTENT_CONFIDENT_LOW: float = 0.15  # at or below: answer FALSE locally
+    INTENT_CONFIDENT_HIGH: float = 0.85  # at or above: answer TRUE locally
+    INTENT_MEMO_SIZE: int = 4096
+    # Start the Kimi answer while the intent verdict is pending; cancelled if it routes to DeepSeek
+    SPECULATIVE_GENERATION: bool = False
+
+    # Semantic cache of first-turn answers, scoped per user
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_THRESHOLD: float = 0.92  # minimum cosine similarity for a hit
+    RESPONSE_CACHE_TTL: int = 86400  # seconds
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2000
+    RESPONSE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+
+    # Knowledge base ingestion
+    CHUNK_SIZE: int = 800  # characters per retrieval chunk
+    CHUNK_OVERLAP: int = 120  # characters repeated between consecutive chunks of a long section
+    EMBED_BATCH_SIZE: int = 64  # chunks embedded per ChromaDB add
+
+    # Document extraction jobs (Kimi file-extract)
+    EXTRACTION_MAX_CONCURRENCY: int = 4  # documents extracting at once; the rest wait as pending
+    EXTRACTION_DEADLINE: float = 180.0  # seconds from submission to extracted text
+    EXTRACTION_POLL_INITIAL: float = 0.25  # first poll delay, grown per attempt
+    EXTRACTION_POLL_MAX: float = 5.0
+
+    # Extraction results cached on disk by content hash, shared by knowledge uploads and chat attachments
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_DIR: str = "cache/extractions"
+    EXTRACTION_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Local document extraction (TXT/MD/CSV/DOCX/PPTX/text-layer PDF) in a process pool
+    LOCAL_EXTRACT_WORKERS: int = 2
+    LOCAL_EXTRACT_TIMEOUT: float = 60.0  # seconds per file before falling back to remote extraction
+    LOCAL_EXTRACT_TASKS_PER_WORKER: int = 50  # workers are recycled to bound parser memory growth
+    LOCAL_PDF_MIN_CHARS_PER_PAGE: int = 20  # below this a PDF is treated as scanned and extracted remotely
+
+    # Image preprocessing before vision calls
+    IMAGE_MAX_SIDE: int = 1920  # longest side sent to the vision model, in pixels
+    IMAGE_JPEG_QUALITY: int = 85
+    IMAGE_PASSTHROUGH_BYTES: int = 512 * 1024  # smaller images already within IMAGE_MAX_SIDE are sent unchanged
+    IMAGE_WORKERS: int = 2
+
+    # Batch transcription of uploaded audio: split on silence, segments transcribed concurrently
+    ASR_MODEL: str = "paraformer-realtime-v1"
+    ASR_MAX_CONCURRENCY: int = 4  # segments in flight at once, across all uploads
+    ASR_SEGMENT_MIN_SECONDS: float = 20.0  # a segment ends at the first pause after this
+    ASR_SEGMENT_MAX_SECONDS: float = 60.0  # and is cut at the quietest point if no pause comes
+    ASR_MIN_SILENCE_MS: int = 300  # shortest pause that counts as a boundary
+
+    # Prompt context packing (estimated tokens)
+    RAG_CANDIDATES: int = 8  # chunks retrieved before ranking and trimming
+    CONTEXT_BUDGET_KIMI: int = 8000
+    CONTEXT_BUDGET_DEEPSEEK: int = 6000
+    CONTEXT_KNOWLEDGE_SHARE: float = 0.6  # most of the budget passages may take; history gets the rest
+    CONTEXT_PASSAGE_MAX_TOKENS: int = 600
+
+    # Background chat title generation
+    TITLE_RATE_LIMIT: float = 2.0  # title generations per second, across all chats
+    TITLE_RATE_BURST: int = 5
+    TITLE_CONCURRENCY: int = 2
+    TITLE_DRIFT_THRESHOLD: float = 0.5  # retitle when a turn's similarity to the title's topic drops below this
+
+    # Websocket chunk coalescing
+    WS_COALESCE_WINDOW_MS: int = 30  # max time a streamed chunk waits to be merged; 0 sends every chunk as-is
+    WS_COALESCE_MAX_CHARS: int = 2048  # flush a merged frame early once its content reaches this size
+
+    # Reasoning mode: DeepSeek's answer streams directly, Kimi adds teaching advice after it
+    REASONING_TEACHING_ADVICE: bool = True
+    REASONING_ADVICE_MAX_TOKENS: int = 800  # reasoning excerpt passed to the advice call
     
     class Config:
         env_file = ".env"
@@ -1,3 +1,11 @@
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import pymysql
 from app.core.config import settings
 from app.core.logger import logger
@@ -6,10 +14,11 @@ def get_db_connection(db_name: str = None):
     """
     Get a connection to the MySQL database.
     If db_name is not provided, uses the default database from settings.
+    Opens a brand-new connection; request handlers should use db_connection() instead.
     """
     if db_name is None:
         db_name = settings.DB_NAME
-        
+
     return pymysql.connect(
         host=settings.DB_HOST,
         port=settings.DB_PORT,
@@ -19,3 +28,238 @@ def get_db_connection(db_name: str = None):
         charset='utf8mb4',
         cursorclass=pymysql.cursors.DictCursor
     )
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the pool timeout."""
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+class ConnectionPool:
+    """
+    Thread-safe pool of pymysql connections.
+    Connections are health-checked (ping) on checkout and recycled once they
+    exceed max_lifetime, so a dropped or stale connection is never handed out.
+    """
+
+    def __init__(self, min_size: int = 2, max_size: int = 10, max_lifetime: float = 3600,
+                 timeout: float = 10.0, connect=get_db_connection):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size: require 0 <= min_size <= max_size and max_size >= 1")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self._connect = connect
+        self._idle = deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._filled = False
+
+        # Metrics
+        self._created = 0
+        self._discarded = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _open(self) -> _PooledConnection:
+        conn = self._connect()
+        with self._cond:
+            self._created += 1
+        return _PooledConnection(conn)
+
+    def _discard(self, pooled: _PooledConnection):
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, pooled: _PooledConnection) -> bool:
+        return self.max_lifetime > 0 and time.monotonic() - pooled.created_at > self.max_lifetime
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        try:
+            pooled.conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _fill(self):
+        """Open min_size connections on first use so the first requests skip the handshake."""
+        self._filled = True
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                pooled = self._open()
+            except Exception as e:
+                with self._cond:
+                    self._size -= 1
+                logger.error(f"Failed to pre-open pooled DB connection: {e}")
+                return
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    def acquire(self):
+        """
+        Check out a connection, opening a new one if the pool is below max_size.
+        Blocks up to `timeout` seconds when the pool is exhausted.
+        """
+        if not self._filled:
+            self._fill()
+
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            pooled = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed")
+                    if self._idle:
+                        pooled = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(f"Timed out after {self.timeout}s waiting for a DB connection")
+                    self._cond.wait(remaining)
+
+            if pooled is None:
+                try:
+                    pooled = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif self._is_expired(pooled) or not self._is_healthy(pooled):
+                self._discard(pooled)
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._in_use += 1
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            return pooled
+
+    def release(self, pooled: _PooledConnection, discard: bool = False):
+        """
+        Return a connection to the pool. Any open transaction is rolled back first
+        so the next borrower never sees a stale REPEATABLE READ snapshot.
+        """
+        with self._cond:
+            self._in_use -= 1
+
+        if not discard:
+            try:
+                pooled.conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or self._closed or self._is_expired(pooled):
+            self._discard(pooled)
+            return
+
+        pooled.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a `with` block.
+        Callers commit explicitly; uncommitted work is rolled back on exit.
+        """
+        pooled = self.acquire()
+        discard = False
+        try:
+            yield pooled.conn
+        except pymysql.err.OperationalError:
+            # Connection-level failure: do not hand this connection out again
+            discard = True
+            raise
+        finally:
+            self.release(pooled, discard=discard)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for pooled in idle:
+            self._discard(pooled)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "max_size": self.max_size,
+                "created": self._created,
+                "discarded": self._discarded,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_time_total": round(self._wait_total, 6),
+                "wait_time_max": round(self._wait_max, 6),
+                "wait_time_avg": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+            }
+
+db_pool = ConnectionPool(
+    min_size=settings.DB_POOL_MIN_SIZE,
+    max_size=settings.DB_POOL_MAX_SIZE,
+    max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+    timeout=settings.DB_POOL_TIMEOUT,
+)
+
+def db_connection():
+    """
+    Context manager yielding a pooled connection:
+
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                ...
+            conn.commit()
+    """
+    return db_pool.connection()
+
+# Dedicated executor for blocking DB work. It is sized to the pool so a worker
+# thread never has to wait for a connection, and it is kept separate from the
+# loop's default executor so slow queries cannot starve other offloaded work.
+_db_executor = ThreadPoolExecutor(max_workers=settings.DB_POOL_MAX_SIZE, thread_name_prefix="db")
+
+async def run_in_db(func, *args, **kwargs):
+    """
+    Run a blocking data-access function on the DB executor and await its result,
+    keeping the event loop free while the query is in flight.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(func, *args, **kwargs))
+
+def shutdown_db():
+    _db_executor.shutdown(wait=True)
+    db_pool.close()
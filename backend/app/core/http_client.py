@@ -0,0 +1,114 @@
+"""
+Shared HTTP transport for the LLM provider clients.
+
+One httpx.AsyncClient with explicit pool limits, keep-alive and timeouts is
+shared by the Kimi and DeepSeek AsyncOpenAI clients, so TLS connections are
+reused across calls instead of being negotiated per request.
+"""
+import asyncio
+from typing import Iterable
+
+import httpx
+from app.core.config import settings
+from app.core.logger import logger
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+class MeteredTransport(httpx.AsyncHTTPTransport):
+    """
+    AsyncHTTPTransport that counts, per host, how many requests were served by
+    a newly opened connection versus one already in the keep-alive pool.
+    """
+
+    def __init__(self, http2: bool = False, **kwargs):
+        super().__init__(http2=http2, **kwargs)
+        self.http2 = http2
+        self._stats = {}
+
+        # Counted where the pool opens a connection, against the origin it is opened for
+        create_connection = self._pool.create_connection
+
+        def _create_connection(origin):
+            self._host_stats(origin.host.decode("ascii"))["connections_opened"] += 1
+            return create_connection(origin)
+
+        self._pool.create_connection = _create_connection
+
+    def _host_stats(self, host: str) -> dict:
+        if host not in self._stats:
+            self._stats[host] = {"requests": 0, "connections_opened": 0, "errors": 0}
+        return self._stats[host]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self._host_stats(request.url.raw_host.decode("ascii"))
+        stats["requests"] += 1
+        try:
+            return await super().handle_async_request(request)
+        except Exception:
+            stats["errors"] += 1
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "http2": self.http2,
+            "open_connections": len(self._pool.connections),
+            "hosts": {
+                host: {
+                    **values,
+                    # Every successful request either opened a connection or reused a pooled one
+                    "connections_reused": max(0, values["requests"] - values["errors"] - values["connections_opened"]),
+                }
+                for host, values in self._stats.items()
+            },
+        }
+
+def _build_transport() -> MeteredTransport:
+    http2 = settings.LLM_HTTP2 and HTTP2_AVAILABLE
+    if settings.LLM_HTTP2 and not HTTP2_AVAILABLE:
+        logger.warning("LLM_HTTP2 is enabled but the 'h2' package is not installed; using HTTP/1.1")
+
+    limits = httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+    )
+    return MeteredTransport(http2=http2, limits=limits)
+
+def llm_timeout(read: float) -> httpx.Timeout:
+    """
+    Per-call timeout: a fixed connect budget plus a call-specific read budget.
+    For streams the read timeout bounds the gap between chunks, not the whole response.
+    """
+    return httpx.Timeout(
+        connect=settings.LLM_CONNECT_TIMEOUT,
+        read=read,
+        write=settings.LLM_CONNECT_TIMEOUT,
+        pool=settings.LLM_CONNECT_TIMEOUT,
+    )
+
+llm_transport = _build_transport()
+llm_http_client = httpx.AsyncClient(transport=llm_transport, timeout=llm_timeout(settings.LLM_READ_TIMEOUT))
+
+async def prewarm(base_urls: Iterable[str], connections: int = 1):
+    """
+    Open keep-alive connections to each provider ahead of the first user request.
+    Any HTTP status counts as success: only the TCP + TLS handshake matters here.
+    """
+    async def _touch(url: str):
+        try:
+            await llm_http_client.get(url, timeout=llm_timeout(settings.LLM_CONNECT_TIMEOUT))
+        except Exception as e:
+            logger.warning(f"Failed to pre-warm connection to {url}: {e}")
+
+    await asyncio.gather(*(_touch(url) for url in base_urls for _ in range(connections)))
+    logger.info(f"Pre-warmed LLM connections: {transport_stats()['hosts']}")
+
+def transport_stats() -> dict:
+    return llm_transport.stats()
+
+async def close_http_client():
+    await llm_http_client.aclose()
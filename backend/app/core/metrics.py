@@ -0,0 +1,91 @@
+"""
+Prometheus exposition of the components' stats() dictionaries.
+
+Each registered source is read on every scrape and flattened into gauges
+named edumind_<source>_<key>. Nested dictionaries with fixed keys extend the
+name. Nested dictionaries keyed by data (hosts, endpoints, modes) become a
+label instead. Booleans are exported as 0/1. Listed state keys become a
+`state` label with value 1. Other strings and None are skipped.
+"""
+import re
+from typing import Callable, Dict, Iterable, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+from app.core.logger import logger
+
+_INVALID = re.compile(r"[^a-zA-Z0-9_]")
+
+class _Source:
+    __slots__ = ("name", "stats", "labels", "nested", "root_label", "states")
+
+    def __init__(self, name: str, stats: Callable[[], dict], labels: Dict[str, str],
+                 nested: Dict[str, str], root_label: Optional[str], states: Iterable[str]):
+        self.name = name
+        self.stats = stats
+        self.labels = labels
+        self.nested = nested
+        self.root_label = root_label
+        self.states = set(states)
+
+class StatsCollector:
+    def __init__(self, prefix: str = "edumind"):
+        self.prefix = prefix
+        self._sources = []
+
+    def register(self, name: str, stats: Callable[[], dict], labels: Optional[Dict[str, str]] = None,
+                 nested: Optional[Dict[str, str]] = None, root_label: Optional[str] = None,
+                 states: Iterable[str] = ()):
+        """
+        `labels` are constant labels for the source. `nested` maps a key whose value
+        is keyed by data to the label for those keys. With `root_label`, the top-level
+        keys themselves are label values. Keys in `states` hold a state name.
+        """
+        self._sources.append(_Source(name, stats, labels or {}, nested or {}, root_label, states))
+
+    def _flatten(self, source: _Source, values: dict, name: str, labels: dict, samples: dict):
+        for key, value in values.items():
+            if isinstance(value, dict):
+                label = source.nested.get(key)
+                if label is None:
+                    self._flatten(source, value, f"{name}_{key}", labels, samples)
+                    continue
+                for item, item_values in value.items():
+                    if isinstance(item_values, dict):
+                        self._flatten(source, item_values, f"{name}_{key}", {**labels, label: str(item)}, samples)
+                continue
+            if key in source.states and isinstance(value, str):
+                samples.setdefault(f"{name}_{key}", []).append(({**labels, "state": value}, 1.0))
+            elif isinstance(value, (bool, int, float)):
+                samples.setdefault(f"{name}_{key}", []).append((labels, float(value)))
+
+    def collect(self):
+        # Sources may share a name (one per provider), so their samples are merged into one family
+        samples: Dict[str, list] = {}
+        for source in self._sources:
+            try:
+                values = source.stats()
+            except Exception as e:
+                logger.warning(f"Failed to collect {source.name} stats: {e}")
+                continue
+            name = f"{self.prefix}_{source.name}"
+            if source.root_label:
+                for item, item_values in values.items():
+                    self._flatten(source, item_values, name, {**source.labels, source.root_label: str(item)}, samples)
+            else:
+                self._flatten(source, values, name, dict(source.labels), samples)
+
+        for metric_name, points in samples.items():
+            label_names = sorted({label for labels, _ in points for label in labels})
+            family = GaugeMetricFamily(_INVALID.sub("_", metric_name), "Component stats", labels=label_names)
+            for labels, value in points:
+                family.add_metric([labels.get(label, "") for label in label_names], value)
+            yield family
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+def render_metrics() -> tuple:
+    """(body, content type) of the default registry in the Prometheus text format."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
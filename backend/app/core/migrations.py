@@ -0,0 +1,107 @@
+"""
+Versioned schema migrations.
+
+Migrations live in backend/migrations as NNNN_description.sql and are applied in
+version order. Applied versions are recorded in the schema_migrations table, so
+running the migrator against an existing database only applies what is missing.
+MySQL commits DDL implicitly, so each migration should be safe to re-run from the
+statement that failed (prefer one DDL change per statement).
+"""
+import os
+import re
+from typing import List, Optional
+
+from app.core.database import get_db_connection
+from app.core.logger import logger
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "migrations")
+
+_FILENAME_RE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+
+class Migration:
+    def __init__(self, version: int, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def statements(self) -> List[str]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = [line for line in f.read().splitlines() if not line.strip().startswith("--")]
+        return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+def discover_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME_RE.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+def _ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def applied_versions(conn) -> set:
+    with conn.cursor() as cursor:
+        _ensure_version_table(cursor)
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row['version'] for row in cursor.fetchall()}
+
+def migrate(conn=None, target: Optional[int] = None, directory: str = MIGRATIONS_DIR) -> List[int]:
+    """
+    Apply pending migrations up to and including `target` (all when None).
+    Returns the versions that were applied.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+
+    applied = []
+    try:
+        done = applied_versions(conn)
+        for migration in discover_migrations(directory):
+            if migration.version in done:
+                continue
+            if target is not None and migration.version > target:
+                break
+
+            logger.info(f"Applying migration {migration.version:04d}_{migration.name}...")
+            with conn.cursor() as cursor:
+                for statement in migration.statements():
+                    cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (migration.version, migration.name)
+                )
+            conn.commit()
+            applied.append(migration.version)
+
+        if not applied:
+            logger.info("Database schema is up to date.")
+        return applied
+    finally:
+        if own_conn:
+            conn.close()
+
+def status(conn=None, directory: str = MIGRATIONS_DIR) -> List[dict]:
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    try:
+        done = applied_versions(conn)
+        return [
+            {"version": m.version, "name": m.name, "applied": m.version in done}
+            for m in discover_migrations(directory)
+        ]
+    finally:
+        if own_conn:
+            conn.close()
@@ -0,0 +1,29 @@
+"""
+Opaque keyset cursors.
+
+A cursor encodes the (timestamp, id) of the last row of a page. The next page
+continues strictly after that pair in the listing's sort order, so page cost
+stays constant no matter how deep the client scrolls.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(timestamp, row_id: str) -> str:
+    value = timestamp.isoformat() if isinstance(timestamp, datetime) else str(timestamp)
+    raw = json.dumps([value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    """Decode a cursor produced by encode_cursor. Raises ValueError for malformed input."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        return datetime.fromisoformat(value), str(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,105 @@
+"""
+Per-connection websocket sender that coalesces streamed chunks into frames.
+
+Consecutive llm_chunk / thinking_chunk events of the same kind (same type and
+same fields apart from `content`) are merged and sent as one frame once the
+coalescing window elapses or the merged content reaches `max_chars`. Any other
+event flushes the pending frame first and is sent immediately, so event order
+and type boundaries are preserved for the client.
+"""
+import asyncio
+from typing import Optional
+
+from app.core.config import settings
+
+COALESCED_TYPES = frozenset({"llm_chunk", "thinking_chunk"})
+
+# Aggregated over all connections
+_totals = {"events": 0, "frames": 0, "coalesced_events": 0, "send_failures": 0}
+
+def _merge_key(event: dict) -> tuple:
+    return tuple(sorted((k, v) for k, v in event.items() if k != "content"))
+
+class CoalescingSender:
+    def __init__(self, websocket, window_ms: Optional[int] = None, max_chars: Optional[int] = None):
+        self.websocket = websocket
+        window_ms = settings.WS_COALESCE_WINDOW_MS if window_ms is None else window_ms
+        self.window = max(window_ms, 0) / 1000
+        self.max_chars = max_chars or settings.WS_COALESCE_MAX_CHARS
+        self._pending: Optional[dict] = None
+        self._pending_key: Optional[tuple] = None
+        self._timer: Optional[asyncio.Task] = None
+        # Serialises frames so a timer flush can never overtake a later event
+        self._lock = asyncio.Lock()
+        self._failed = False
+        self._closed = False
+
+    async def send(self, event: dict) -> bool:
+        """Queue or send one event. Returns False once the connection has failed or closed."""
+        if self._failed or self._closed:
+            return False
+        _totals["events"] += 1
+
+        if self.window > 0 and event.get("type") in COALESCED_TYPES:
+            key = _merge_key(event)
+            if self._pending is not None and self._pending_key == key:
+                self._pending["content"] += event.get("content") or ""
+                _totals["coalesced_events"] += 1
+            else:
+                if self._pending is not None and not await self.flush():
+                    return False
+                self._pending = {**event, "content": event.get("content") or ""}
+                self._pending_key = key
+                self._schedule_flush()
+            if len(self._pending["content"]) >= self.max_chars:
+                return await self.flush()
+            return True
+
+        # Status, llm_end, chat_info, errors: end the current frame and go out now
+        if not await self.flush():
+            return False
+        return await self._write(event)
+
+    async def flush(self) -> bool:
+        pending, self._pending, self._pending_key = self._pending, None, None
+        if pending is None:
+            return not self._failed
+        return await self._write(pending)
+
+    async def close(self) -> bool:
+        """Flush what is pending and stop the window timer; later sends are dropped."""
+        sent = await self.flush()
+        self._closed = True
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        self._timer = None
+        return sent
+
+    def _schedule_flush(self):
+        # The window bounds how long a chunk may wait, counted from the oldest pending chunk
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        await self.flush()
+
+    async def _write(self, event: dict) -> bool:
+        async with self._lock:
+            if self._failed:
+                return False
+            try:
+                await self.websocket.send_json(event)
+            except Exception:
+                self._failed = True
+                _totals["send_failures"] += 1
+                return False
+            _totals["frames"] += 1
+            return True
+
+def coalescing_stats() -> dict:
+    events, frames = _totals["events"], _totals["frames"]
+    return {
+        **_totals,
+        "events_per_frame": round(events / frames, 2) if frames else 0.0,
+    }
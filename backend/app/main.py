@@ -1,8 +1,17 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from app.api.metrics import router as metrics_router
 from app.api.v1.api import api_router
 from app.core.logger import setup_logging
+from app.core.database import shutdown_db
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.http_client import close_http_client
+from app.core.logger import logger
+from app.services.ai_service import ai_service
+from app.services.local_extractors import local_extractor
+from app.services.message_writer import message_writer
+from app.services.title_worker import title_worker
 import os
 
 # Setup logging
@@ -21,9 +30,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=[NEXT_CURSOR_HEADER],  # Pagination cursor for list endpoints
 )
 
 app.include_router(api_router, prefix="/api/v1")
+# Prometheus scrape endpoint, outside the versioned API
+app.include_router(metrics_router)
+
+@app.on_event("startup")
+async def start_background_writers():
+    await message_writer.start()
+    await title_worker.start()
+
+@app.on_event("startup")
+async def prewarm_llm_connections():
+    try:
+        await ai_service.prewarm()
+    except Exception as e:
+        logger.warning(f"LLM connection pre-warm failed: {e}")
+
+@app.on_event("shutdown")
+async def close_db():
+    # Titles persist through the message writer, so stop them first
+    await title_worker.stop()
+    # Drain queued chat writes before the pool goes away
+    await message_writer.stop()
+    shutdown_db()
+
+@app.on_event("shutdown")
+async def close_llm_transport():
+    await close_http_client()
+
+@app.on_event("shutdown")
+def stop_extraction_workers():
+    local_extractor.shutdown()
 
 @app.get("/")
 def root():
@@ -0,0 +1,95 @@
+"""
+Blocking data access for analysis_results and generated_contents.
+Async callers run these through app.core.database.run_in_db.
+"""
+import json
+import uuid
+from typing import Optional
+
+from app.core.database import db_connection
+
+def _row_to_analysis(row: dict) -> dict:
+    return {
+        "intent": {
+            "topic": row['topic'],
+            "audience": row['audience'],
+            "duration": row['duration'],
+            "style": row['style']
+        },
+        "structure": json.loads(row['structure']) if isinstance(row['structure'], str) else row['structure']
+    }
+
+def create_analysis(analysis_id: str, topic: str, audience: str, duration: int, style: str, structure: list):
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            # Get default user
+            cursor.execute("SELECT id FROM users LIMIT 1")
+            user_row = cursor.fetchone()
+            if not user_row:
+                # Fallback to create a user if strictly needed, or error
+                # For now, let's assume one exists or create a dummy
+                user_id = str(uuid.uuid4())
+                cursor.execute("INSERT INTO users (id, username, password_hash) VALUES (%s, 'admin', 'hash')", (user_id,))
+            else:
+                user_id = user_row['id']
+
+            cursor.execute("""
+                INSERT INTO analysis_results (id, user_id, topic, audience, duration, style, structure)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (
+                analysis_id,
+                user_id,
+                topic,
+                audience,
+                duration,
+                style,
+                json.dumps(structure, ensure_ascii=False)
+            ))
+        conn.commit()
+
+def get_latest_analysis() -> Optional[dict]:
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT topic, audience, duration, style, structure
+                FROM analysis_results
+                ORDER BY created_at DESC
+                LIMIT 1
+            """)
+            row = cursor.fetchone()
+    return _row_to_analysis(row) if row else None
+
+def get_analysis(analysis_id: str) -> Optional[dict]:
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT topic, audience, duration, style, structure
+                FROM analysis_results
+                WHERE id = %s
+            """, (analysis_id,))
+            row = cursor.fetchone()
+    return _row_to_analysis(row) if row else None
+
+def insert_generated_content(gen_id: str, analysis_id: str, slides: list, lesson_plan: str, games: list) -> bool:
+    """
+    Store generated content for an analysis.
+    Returns False without writing if the analysis does not exist (FK constraint).
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM analysis_results WHERE id = %s", (analysis_id,))
+            if not cursor.fetchone():
+                return False
+
+            cursor.execute("""
+                INSERT INTO generated_contents (id, analysis_id, slides, lesson_plan, games)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (
+                gen_id,
+                analysis_id,
+                json.dumps(slides, ensure_ascii=False),
+                lesson_plan,
+                json.dumps(games, ensure_ascii=False)
+            ))
+        conn.commit()
+    return True
@@ -0,0 +1,57 @@
+"""
+Blocking data access for the blobs reference-count table.
+Async callers run these through app.core.database.run_in_db.
+"""
+from typing import Callable, Dict, Optional
+
+from app.core.database import db_connection
+
+def acquire_blob(sha256: str, path: str, size: int, on_acquired: Callable[[str, bool], None]) -> str:
+    """
+    Add a reference to a blob, creating its row with `path` on first use. Returns
+    the blob's stored path. `on_acquired(path, created)` runs while the row is
+    locked, so a concurrent release cannot remove the file in between.
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO blobs (sha256, path, size, ref_count) VALUES (%s, %s, %s, 1)
+                ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+            """, (sha256, path, size))
+            # 1 row affected for an insert, 2 for an update
+            created = cursor.rowcount == 1
+            cursor.execute("SELECT path FROM blobs WHERE sha256 = %s", (sha256,))
+            stored_path = cursor.fetchone()['path']
+            on_acquired(stored_path, created)
+        conn.commit()
+        return stored_path
+
+def release_blob(sha256: str, on_unreferenced: Callable[[str], None]) -> Optional[int]:
+    """
+    Drop a reference. When none remain, `on_unreferenced(path)` runs under the row
+    lock and the row is deleted. Returns the remaining count, or None for an unknown blob.
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT path, ref_count FROM blobs WHERE sha256 = %s FOR UPDATE", (sha256,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            remaining = max(row['ref_count'] - 1, 0)
+            if remaining:
+                cursor.execute("UPDATE blobs SET ref_count = %s WHERE sha256 = %s", (remaining, sha256))
+            else:
+                on_unreferenced(row['path'])
+                cursor.execute("DELETE FROM blobs WHERE sha256 = %s", (sha256,))
+        conn.commit()
+        return remaining
+
+def set_ref_counts(blobs: Dict[str, tuple]):
+    """Set absolute reference counts: {sha256: (path, size, ref_count)}. Used by the dedupe tool."""
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.executemany("""
+                INSERT INTO blobs (sha256, path, size, ref_count) VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE ref_count = VALUES(ref_count)
+            """, [(sha256, path, size, count) for sha256, (path, size, count) in blobs.items()])
+        conn.commit()
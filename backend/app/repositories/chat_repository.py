@@ -0,0 +1,155 @@
+"""
+Blocking data access for chats and messages.
+Async callers run these through app.core.database.run_in_db.
+"""
+import uuid
+from typing import List, Optional, Tuple
+
+from app.core.database import db_connection
+from app.core.pagination import decode_cursor, encode_cursor
+
+def get_or_create_default_user() -> str:
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM users LIMIT 1")
+            row = cursor.fetchone()
+            if row:
+                return row['id']
+            user_id = str(uuid.uuid4())
+            cursor.execute("INSERT INTO users (id, username, password_hash) VALUES (%s, 'default_user', 'default')", (user_id,))
+            conn.commit()
+            return user_id
+
+def _message_from_row(row: dict) -> dict:
+    return {
+        "id": row['id'],
+        "role": row['role'],
+        "content": row['content'],
+        "model": row.get('model'),
+        "thinking": row.get('thinking'),
+        "created_at": str(row['created_at'])
+    }
+
+def _keyset_clause(column: str, position, descending: bool) -> Tuple[str, list]:
+    if not position:
+        return "", []
+    timestamp, row_id = position
+    op = "<" if descending else ">"
+    return f" AND ({column} {op} %s OR ({column} = %s AND id {op} %s))", [timestamp, timestamp, row_id]
+
+def get_messages_page(chat_id: str, user_id: str, limit: int = 50, cursor: Optional[str] = None,
+                      order: str = "latest") -> Tuple[list, Optional[str]]:
+    """
+    One page of a chat's messages, always returned in chronological order.
+    order="latest" starts from the newest messages and the cursor scrolls back in time;
+    order="oldest" starts from the beginning and the cursor pages forward.
+    Returns (messages, next_cursor); next_cursor is None on the last page, and messages
+    is None when the chat does not exist or belongs to another user.
+    Raises ValueError for a malformed cursor.
+    """
+    position = decode_cursor(cursor)
+    descending = order == "latest"
+    direction = "DESC" if descending else "ASC"
+    keyset, keyset_params = _keyset_clause("created_at", position, descending)
+
+    with db_connection() as conn:
+        with conn.cursor() as cursor_:
+            cursor_.execute("SELECT id FROM chats WHERE id = %s AND user_id = %s", (chat_id, user_id))
+            if not cursor_.fetchone():
+                return None, None
+
+            cursor_.execute(f"""
+                SELECT id, role, content, model, thinking, created_at
+                FROM messages
+                WHERE chat_id = %s{keyset}
+                ORDER BY created_at {direction}, id {direction}
+                LIMIT %s
+            """, [chat_id, *keyset_params, limit + 1])
+            rows = cursor_.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    if descending:
+        rows.reverse()
+    return [_message_from_row(row) for row in rows], next_cursor
+
+def get_chat_history(chat_id: str, user_id: str, limit: int = 50) -> Optional[list]:
+    """
+    The most recent `limit` messages of a chat, oldest first.
+    Returns None when the chat does not exist or belongs to another user.
+    """
+    messages, _ = get_messages_page(chat_id, user_id, limit=limit)
+    return messages
+
+def get_user_chats(user_id: str, days: int = 3, limit: int = 50,
+                   cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    A page of the user's chats from the last `days` days, newest first.
+    Returns (chats, next_cursor). Raises ValueError for a malformed cursor.
+    """
+    keyset, keyset_params = _keyset_clause("created_at", decode_cursor(cursor), descending=True)
+    with db_connection() as conn:
+        with conn.cursor() as cursor_:
+            cursor_.execute(f"""
+                SELECT id, title, created_at
+                FROM chats
+                WHERE user_id = %s AND created_at >= NOW() - INTERVAL %s DAY{keyset}
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
+            """, [user_id, days, *keyset_params, limit + 1])
+            rows = cursor_.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    chats = [
+        {
+            "id": row['id'],
+            "title": row['title'] or "New Chat",
+            "created_at": str(row['created_at'])
+        }
+        for row in rows
+    ]
+    return chats, next_cursor
+
+def delete_chat(chat_id: str, user_id: str) -> bool:
+    """Delete a chat and its messages. Returns False if the chat does not belong to the user."""
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM messages WHERE chat_id = %s", (chat_id,))
+            cursor.execute("DELETE FROM chats WHERE id = %s AND user_id = %s", (chat_id, user_id))
+            deleted = cursor.rowcount > 0
+        if deleted:
+            conn.commit()
+        return deleted
+
+def write_batch(messages: List[tuple], titles: List[tuple]):
+    """
+    Persist queued writes in a single transaction.
+    messages: (id, chat_id, role, content, model, thinking, created_at) rows, sent as one multi-row INSERT.
+    titles: (title, chat_id) pairs.
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            if messages:
+                cursor.executemany("""
+                    INSERT INTO messages (id, chat_id, role, content, model, thinking, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, messages)
+            if titles:
+                cursor.executemany("UPDATE chats SET title = %s WHERE id = %s", titles)
+        conn.commit()
+
+def create_chat_session(title: str = "New Chat", user_id: Optional[str] = None) -> str:
+    if not user_id:
+        raise ValueError("User ID is required")
+
+    chat_id = str(uuid.uuid4())
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("INSERT INTO chats (id, user_id, title) VALUES (%s, %s, %s)", (chat_id, user_id, title))
+        conn.commit()
+    return chat_id
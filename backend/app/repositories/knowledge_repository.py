@@ -0,0 +1,129 @@
+"""
+Blocking data access for the knowledge_base table.
+Async callers run these through app.core.database.run_in_db.
+"""
+import hashlib
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from app.core.database import db_connection
+from app.core.pagination import decode_cursor, encode_cursor
+
+def get_or_create_default_user(cursor) -> str:
+    """
+    Get the default admin user ID, or create it if not exists.
+    """
+    username = "admin"
+    cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
+    result = cursor.fetchone()
+
+    if result:
+        return result['id']
+
+    # Create default user
+    user_id = str(uuid.uuid4())
+    password_hash = hashlib.sha256("admin".encode()).hexdigest()
+    avatar_url = f"https://api.dicebear.com/7.x/avataaars/svg?seed={username}"
+
+    cursor.execute(
+        "INSERT INTO users (id, username, password_hash, avatar_url) VALUES (%s, %s, %s, %s)",
+        (user_id, username, password_hash, avatar_url)
+    )
+    return user_id
+
+def insert_item(item_id: str, user_id: str, title: str, item_type: str, url: str,
+                status: str, summary: str, upload_date: str, blob_sha256: Optional[str] = None) -> str:
+    """Insert a knowledge item, falling back to the default user. Returns the owning user id."""
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            final_user_id = user_id or get_or_create_default_user(cursor)
+            cursor.execute("""
+                INSERT INTO knowledge_base (id, user_id, title, type, url, status, summary, upload_date, blob_sha256)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (item_id, final_user_id, title, item_type, url, status, summary, upload_date, blob_sha256))
+        conn.commit()
+    return final_user_id
+
+def update_status(item_id: str, status: str, summary: Optional[str] = None):
+    """Record an item's processing status (pending/extracting/ready/failed) and, once known, its summary."""
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            if summary is None:
+                cursor.execute("UPDATE knowledge_base SET status = %s WHERE id = %s", (status, item_id))
+            else:
+                cursor.execute(
+                    "UPDATE knowledge_base SET status = %s, summary = %s WHERE id = %s",
+                    (status, summary, item_id)
+                )
+        conn.commit()
+
+def list_items(user_id: str, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    A page of the user's knowledge items, newest upload first.
+    Returns (items, next_cursor). Raises ValueError for a malformed cursor.
+    """
+    position = decode_cursor(cursor)
+    keyset, params = "", [user_id]
+    if position:
+        keyset = " AND (upload_date < %s OR (upload_date = %s AND id < %s))"
+        params += [position[0], position[0], position[1]]
+
+    with db_connection() as conn:
+        with conn.cursor() as cursor_:
+            cursor_.execute(f"""
+                SELECT id, title, type, url, status, summary, upload_date
+                FROM knowledge_base
+                WHERE user_id = %s{keyset}
+                ORDER BY upload_date DESC, id DESC
+                LIMIT %s
+            """, [*params, limit + 1])
+            rows = cursor_.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['upload_date'], rows[-1]['id'])
+    items = [
+        {
+            "id": row['id'],
+            "title": row['title'],
+            "type": row['type'],
+            "url": row['url'],
+            "status": row['status'],
+            "summary": row['summary'],
+            "uploadDate": row['upload_date'].isoformat() if isinstance(row['upload_date'], datetime) else str(row['upload_date'])
+        }
+        for row in rows
+    ]
+    return items, next_cursor
+
+def item_belongs_to_user(item_id: str, user_id: str) -> bool:
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM knowledge_base WHERE id = %s AND user_id = %s", (item_id, user_id))
+            return cursor.fetchone() is not None
+
+def get_blob_hash(item_id: str) -> Optional[str]:
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT blob_sha256 FROM knowledge_base WHERE id = %s", (item_id,))
+            row = cursor.fetchone()
+            return row['blob_sha256'] if row else None
+
+def set_blob_hashes(urls: dict) -> int:
+    """Link legacy items to their blobs: {url: sha256}. Returns the number of rows updated."""
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            updated = cursor.executemany(
+                "UPDATE knowledge_base SET blob_sha256 = %s WHERE url = %s",
+                [(sha256, url) for url, sha256 in urls.items()]
+            )
+        conn.commit()
+    return updated or 0
+
+def delete_item(item_id: str):
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM knowledge_base WHERE id = %s", (item_id,))
+        conn.commit()
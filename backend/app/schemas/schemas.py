@@ -18,6 +18,7 @@ class ChatRequest(BaseModel):
     chat_id: Optional[str] = None
 
 class Message(BaseModel):
+    id: Optional[str] = None
     role: str
     content: str
     model: Optional[str] = None
@@ -1,69 +1,109 @@
 import os
 import base64
 import asyncio
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
 from openai import AsyncOpenAI
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.http_client import llm_http_client, llm_timeout, prewarm
+from app.services.context_packer import context_packer
+from app.services.image_preprocess import preprocess_image
+from app.services.intent_classifier import intent_classifier
+from app.services.llm_metrics import PATH_NORMAL, PATH_REASONING, StreamTimer, timed_stage
+from app.services.provider_gateway import deepseek_gateway, kimi_gateway
+from app.services.response_cache import response_cache
+from app.services.speculation import SpeculativeStream, speculation_stats
+from app.services.transcription import transcriber
+from app.services.turn_metrics import turn_metrics
 
 try:
     import dashscope
-    from dashscope.audio.asr import Recognition, RecognitionCallback, RecognitionResult
 except ImportError:
     dashscope = None
 
+# Extractor versions for the extraction cache; bump one when its output changes
+EXTRACTOR_VERSIONS = {
+    "kimi-file-extract": 1,
+    "kimi-image-description": 2,  # 2: downsized single-payload images
+    "kimi-video-description": 1,
+    "dashscope-asr": 3,  # 2: segmented, with timestamps; 3: resampled to 16 kHz mono
+}
+
+# Texts returned in place of content when extraction fails; never cached
+FALLBACK_TEXTS = frozenset({
+    "无法描述图片内容。", "无法描述视频内容。", "无法提取文件内容。",
+    "ASR Service not available.", "ASR API Key not set.", "无法识别音频内容。", "语音识别失败。",
+})
+
 class AIService:
     def __init__(self):
+        # Both clients share one pooled HTTP transport so connections are reused across calls
         self.kimi_client = AsyncOpenAI(
             api_key=settings.MOONSHOT_API_KEY or "placeholder",
             base_url="https://api.moonshot.cn/v1",
+            http_client=llm_http_client,
+            # Retries are owned by the provider gateway
+            max_retries=0,
         )
         
         self.deepseek_client = AsyncOpenAI(
             api_key=settings.DEEPSEEK_API_KEY or "placeholder",
             base_url="https://api.deepseek.com/v1",
+            http_client=llm_http_client,
+            max_retries=0,
         )
         
         self.kimi_model = "kimi-k2.5"
         self.deepseek_model = "deepseek-reasoner"
 
+        # Per-call timeouts: short for small classification/titling calls, longer for streams
+        self.short_timeout = llm_timeout(settings.LLM_SHORT_READ_TIMEOUT)
+        self.stream_timeout = llm_timeout(settings.LLM_READ_TIMEOUT)
+
+    async def prewarm(self):
+        """Open pooled connections to both providers before the first user request."""
+        await prewarm(
+            [str(self.kimi_client.base_url), str(self.deepseek_client.base_url)],
+            connections=settings.LLM_PREWARM_CONNECTIONS,
+        )
+
     async def get_image_description(self, file_path: str) -> tuple[str, str | None]:
+        """
+        Describe an image. The image is downsized and re-encoded once, then sent
+        inline; nothing is stored on Kimi, so no file id is returned.
+        """
         try:
-            with open(file_path, "rb") as f:
-                file_content = f.read()
-                
-            file_object = await self.kimi_client.files.create(
-                file=(os.path.basename(file_path), file_content),
-                purpose="image"
-            )
-            file_id = file_object.id
-            
-            with open(file_path, "rb") as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+            image = await preprocess_image(file_path)
+            base64_image = base64.b64encode(image.data).decode('utf-8')
+            logger.info(f"Prepared image {os.path.basename(file_path)}: {image.original_size} -> {len(image.data)} bytes, "
+                        f"{image.width}x{image.height} {image.mime_type}")
 
-            response = await self.kimi_client.chat.completions.create(
+            response = await kimi_gateway.call("chat.completions", lambda: self.kimi_client.chat.completions.create(
                 model=self.kimi_model,
                 messages=[
                     {
                         "role": "user",
                         "content": [
                             {"type": "text", "text": "这张图片里有什么？请详细描述。"},
-                            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+                            {"type": "image_url", "image_url": {"url": f"data:{image.mime_type};base64,{base64_image}"}}
                         ],
                     }
                 ],
-            )
-            return response.choices[0].message.content, file_id
+            ))
+            return response.choices[0].message.content, None
         except Exception as e:
             logger.error(f"Error describing image: {e}")
             return "无法描述图片内容。", None
 
     async def get_video_description(self, file_path: str) -> tuple[str, str | None]:
         try:
-            with open(file_path, "rb") as f:
-                 file_object = await self.kimi_client.files.create(
-                    file=f,
-                    purpose="video"
-                 )
+            # A path (not an open handle) so that a retried upload re-reads the file
+            file_object = await kimi_gateway.call("files.create", lambda: self.kimi_client.files.create(
+                file=Path(file_path),
+                purpose="video"
+            ))
             file_id = file_object.id
             
             content_list = [
@@ -71,43 +111,44 @@ class AIService:
                 {"type": "text", "text": "请描述这个视频的内容。"}
             ]
             
-            response = await self.kimi_client.chat.completions.create(
+            response = await kimi_gateway.call("chat.completions", lambda: self.kimi_client.chat.completions.create(
                 model=self.kimi_model,
                 messages=[{"role": "user", "content": content_list}],
-            )
+            ))
             return response.choices[0].message.content, file_id
         except Exception as e:
             logger.error(f"Error describing video: {e}")
             return "无法描述视频内容。", None
 
     async def get_document_content(self, file_path: str) -> tuple[str, str | None]:
+        """Extract a document through an extraction job and wait for it."""
+        # Local import to avoid circular dependency
+        from app.services.extraction_jobs import ExtractionError, extraction_jobs
         try:
-            with open(file_path, "rb") as f:
-                file_object = await self.kimi_client.files.create(
-                    file=f,
-                    purpose="file-extract"
-                )
-            file_id = file_object.id
-            
-            content = ""
-            for _ in range(5):
-                try:
-                    file_content = await self.kimi_client.files.content(file_id)
-                    content = file_content.text
-                    if content:
-                        break
-                except Exception:
-                    await asyncio.sleep(1)
-            
-            if not content:
-                return "无法提取文件内容。", file_id
-            
-            return content, file_id
-        except Exception as e:
+            return await extraction_jobs.submit(file_path).wait()
+        except ExtractionError as e:
             logger.error(f"Error extracting document: {e}")
             return "无法提取文件内容。", None
 
-    async def get_audio_text(self, file_path: str) -> str:
+    async def upload_for_extraction(self, file_path: str) -> str:
+        """Upload a document to Kimi for server-side text extraction. Returns the Kimi file id."""
+        # A path (not an open handle) so that a retried upload re-reads the file
+        file_object = await kimi_gateway.call("files.create", lambda: self.kimi_client.files.create(
+            file=Path(file_path),
+            purpose="file-extract"
+        ))
+        return file_object.id
+
+    async def fetch_extracted_content(self, file_id: str) -> str:
+        """Extracted text of an uploaded document; raises or returns "" while it is still being processed."""
+        file_content = await kimi_gateway.call("files.content", lambda: self.kimi_client.files.content(file_id))
+        return file_content.text
+
+    async def get_audio_text(self, file_path: str, on_progress=None) -> str:
+        """
+        Transcript of an audio file with a start time per segment. `on_progress(done, total, segment)`
+        is awaited as segments finish.
+        """
         if not dashscope:
             return "ASR Service not available."
             
@@ -116,64 +157,40 @@ class AIService:
             return "ASR API Key not set."
             
         dashscope.api_key = api_key
-        
-        loop = asyncio.get_running_loop()
-        
-        def _run_asr():
-            result_text = []
-            
-            class SimpleCallback(RecognitionCallback):
-                def on_event(self, result: RecognitionResult) -> None:
-                    sentence = result.get_sentence()
-                    if 'text' in sentence and result.is_sentence_end(sentence):
-                        result_text.append(sentence['text'])
-                
-                def on_complete(self) -> None:
-                    pass
-                def on_error(self, result: RecognitionResult) -> None:
-                    logger.error(f"ASR Error: {result}")
-
-            callback = SimpleCallback()
-            recognition = Recognition(
-                model='paraformer-realtime-v1',
-                format='pcm',
-                sample_rate=16000,
-                callback=callback
-            )
-            
-            recognition.start()
-            
-            try:
-                with open(file_path, 'rb') as f:
-                    while True:
-                        data = f.read(3200)
-                        if not data:
-                            break
-                        recognition.send_audio_frame(data)
-                        import time
-                        time.sleep(0.005)
-            except Exception as e:
-                logger.error(f"Error reading audio file: {e}")
-            
-            recognition.stop()
-            return "".join(result_text)
 
         try:
-            text = await loop.run_in_executor(None, _run_asr)
+            transcript = await transcriber.transcribe_file(file_path, on_progress)
+            if transcript.failed:
+                logger.warning(f"ASR: {transcript.failed}/{len(transcript.segments)} segments failed for {file_path}")
+            text = transcript.text
             return text if text else "无法识别音频内容。"
         except Exception as e:
             logger.error(f"ASR failed: {e}")
             return "语音识别失败。"
 
     async def check_intent(self, content: str) -> bool:
-        try:
-            response = await self.kimi_client.chat.completions.create(
-                model=self.kimi_model,
-                messages=[
-                    {"role": "system", "content": "你是一个意图分类助手。请判断用户的输入是否属于'复杂逻辑推理'、'数学解题'、'物理推导'或'代码算法'类问题。如果是，请返回 TRUE；否则返回 FALSE。只返回 TRUE 或 FALSE。"},
-                    {"role": "user", "content": content}
-                ],
+        """
+        Whether the request needs the reasoning model. The local classifier
+        answers confident cases; the LLM is asked only in the uncertain band.
+        """
+        with timed_stage("intent-classifier", "intent"):
+            return await intent_classifier.classify(
+                content,
+                lambda: self.check_intent_llm(content),
+                query=self._clean_user_content(content),
             )
+
+    async def check_intent_llm(self, content: str) -> bool:
+        try:
+            with timed_stage(self.kimi_model, "intent_llm"):
+                response = await kimi_gateway.call("chat.completions", lambda: self.kimi_client.chat.completions.create(
+                    model=self.kimi_model,
+                    messages=[
+                        {"role": "system", "content": "你是一个意图分类助手。请判断用户的输入是否属于'复杂逻辑推理'、'数学解题'、'物理推导'或'代码算法'类问题。如果是，请返回 TRUE；否则返回 FALSE。只返回 TRUE 或 FALSE。"},
+                        {"role": "user", "content": content}
+                    ],
+                    timeout=self.short_timeout,
+                ))
             
             result = response.choices[0].message.content.strip().upper()
             return "TRUE" in result
@@ -182,142 +199,328 @@ class AIService:
             logger.error(f"Error in intent detection: {e}")
             return False
 
-    async def stream_deepseek_reasoning(self, content: str):
+    async def stream_deepseek_reasoning(self, content: str, path: str = PATH_REASONING):
+        timer = StreamTimer(self.deepseek_model, "reasoning", path)
         try:
-            stream = await self.deepseek_client.chat.completions.create(
+            stream = deepseek_gateway.stream("chat.completions.stream", lambda: self.deepseek_client.chat.completions.create(
                 model=self.deepseek_model,
                 messages=[{"role": "user", "content": content}],
-                stream=True
-            )
+                stream=True,
+                timeout=self.stream_timeout,
+            ))
             
             async for chunk in stream:
                 delta = chunk.choices[0].delta
                 
                 if hasattr(delta, 'reasoning_content') and delta.reasoning_content:
+                    timer.chunk()
                     yield {"type": "reasoning", "content": delta.reasoning_content}
                 
                 if delta.content:
+                    timer.chunk()
                     yield {"type": "content", "content": delta.content}
+            timer.finish()
                     
         except Exception as e:
+            timer.fail(e)
             logger.error(f"Error streaming DeepSeek: {e}")
             raise e
 
-    async def stream_kimi_response(self, content: str, history: list = []):
+    async def stream_kimi_response(self, content: str, history: list = [], path: str = PATH_NORMAL):
+        timer = StreamTimer(self.kimi_model, "answer", path)
         try:
             messages = [{"role": "system", "content": "你是 EduMind 智能教研助手，专门辅助教师进行教学工作。你的职责是协助教师设计课程、优化教案、解答教学难题以及提供创新的教学思路。你的回答应当专业、高效、具有建设性，并视用户为教育领域的同行专家。"}]
             
-            # Filter out messages with empty content to avoid API errors
+            # History arrives already fitted to the token budget; still filter empty content to avoid API errors
             valid_history = [
                 {"role": msg["role"], "content": msg["content"]} 
-                for msg in history[-10:] 
+                for msg in history 
                 if msg.get("content") and str(msg.get("content")).strip()
             ]
             messages.extend(valid_history)
             
             messages.append({"role": "user", "content": content})
             
-            response = await self.kimi_client.chat.completions.create(
+            response = kimi_gateway.stream("chat.completions.stream", lambda: self.kimi_client.chat.completions.create(
                 model=self.kimi_model,
                 messages=messages,
                 temperature=0.6,
                 stream=True, 
-                extra_body={"thinking": {"type": "disabled"}}
-            )
+                extra_body={"thinking": {"type": "disabled"}},
+                timeout=self.stream_timeout,
+            ))
             
             async for chunk in response:
                 delta = chunk.choices[0].delta
                 if delta.content:
+                    timer.chunk()
                     yield delta.content
+            timer.finish()
             
         except Exception as e:
+            timer.fail(e)
             logger.error(f"Error calling Kimi: {e}")
             raise e
 
-    async def stream_summarize_with_kimi(self, user_query: str, reasoning: str, answer: str):
-        prompt = f"用户的问题是：'{user_query}'\n\nDeepSeek 的推理过程如下：{reasoning}\n\nDeepSeek 的最终答案是：{answer}\n\n请作为教研顾问，为教师提供专业的教学建议。"
-        
+    async def stream_teaching_advice(self, user_query: str, reasoning: str):
+        """
+        Teaching advice that follows a reasoning answer. Only an excerpt of the
+        reasoning is sent so the call can start while the answer is still streaming.
+        """
+        timer = StreamTimer(self.kimi_model, "teaching_advice", PATH_REASONING)
         try:
             prompt = (
                 f"用户的问题是：'{user_query}'\n\n"
-                f"DeepSeek 的推理过程如下：\n{reasoning}\n\n"
-                f"DeepSeek 的最终答案是：\n{answer}\n\n"
-                "请作为一名资深的教研顾问，综合以上信息，为教师提供专业的分析与建议。请重点阐述如何将这些推理逻辑应用到实际教学中，或者如何引导学生理解这些概念。你的目标是帮助教师更好地进行教学设计。"
+                f"DeepSeek 的推理要点如下：\n{reasoning}\n\n"
+                "答案已经单独给出，请不要重复解题过程。请作为一名资深的教研顾问，简明地为教师提供教学建议：如何将这些推理逻辑应用到实际教学中，学生可能遇到的难点，以及如何引导学生理解这些概念。"
             )
             
-            response = await self.kimi_client.chat.completions.create(
+            response = kimi_gateway.stream("chat.completions.stream", lambda: self.kimi_client.chat.completions.create(
                 model=self.kimi_model,
                 messages=[{"role": "user", "content": prompt}],
                 stream=True,
-                extra_body={"thinking": {"type": "disabled"}}
-            )
+                extra_body={"thinking": {"type": "disabled"}},
+                timeout=self.stream_timeout,
+            ))
             
             async for chunk in response:
                 delta = chunk.choices[0].delta
                 if delta.content:
+                    timer.chunk()
                     yield delta.content
+            timer.finish()
         except Exception as e:
-            logger.error(f"Error summarizing with Kimi: {e}")
-            yield answer
+            # The answer is already complete without it
+            timer.fail(e)
+            logger.error(f"Error generating teaching advice with Kimi: {e}")
 
-    async def stream_chat(self, content: str, history: list, user_id: str = None):
-        # 1. Analyze Intent
-        yield {"type": "status", "content": "analyzing_intent"}
-        needs_reasoning = await self.check_intent(content)
+    @staticmethod
+    def _build_rag_content(content: str, passages: list) -> str:
+        if not passages:
+            return content
+        context_str = "\n\n".join(passages)
+        return f"基于以下参考资料回答问题。如果参考资料不包含答案，请根据你的知识回答，但优先使用参考资料。\n\n参考资料：\n{context_str}\n\n用户问题：{content}"
 
-        # 2. RAG Retrieval
-        yield {"type": "status", "content": "retrieving_knowledge"}
-        
+    async def _run_pre_generation_stages(self, stages: dict):
+        """
+        Run independent pre-generation stages concurrently.
+        Yields (name, result, elapsed_ms) as each stage finishes; if any stage
+        raises, the others are cancelled and the error propagates.
+        """
+        started = time.perf_counter()
+        tasks = {asyncio.ensure_future(coro): name for name, coro in stages.items()}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+                    yield tasks[task], task.result(), elapsed_ms
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream_chat(self, content: str, history: list, user_id: str = None,
+                          history_loader: Optional[Callable[[], Awaitable[list]]] = None):
+        """
+        `history_loader`, if given, is awaited concurrently with intent detection
+        and retrieval and replaces `history`.
+        """
         # Local import to avoid circular dependency
         from app.services.knowledge_service import knowledge_service
-        
-        # Run synchronous vector search in a separate thread to avoid blocking the event loop
+        started = time.perf_counter()
+
+        # 1. Intent, RAG retrieval and history loading are independent: run them together
+        yield {"type": "status", "content": "analyzing_intent"}
+        yield {"type": "status", "content": "retrieving_knowledge"}
+
+        def retrieve():
+            with timed_stage("chromadb", "retrieval"):
+                return knowledge_service.query_knowledge(content, n_results=settings.RAG_CANDIDATES, user_id=user_id)
+
         loop = asyncio.get_running_loop()
-        relevant_docs = await loop.run_in_executor(
-            None, 
-            lambda: knowledge_service.query_knowledge(content, n_results=3, user_id=user_id)
+        stages = {
+            "intent": self.check_intent(content),
+            # Synchronous vector search runs in a separate thread to avoid blocking the event loop
+            "retrieval": loop.run_in_executor(None, retrieve),
+        }
+        if history_loader is not None:
+            stages["history"] = history_loader()
+        # Only first-turn questions without an attached file are answered from the cache
+        cacheable = response_cache.enabled and content == self._clean_user_content(content) and (
+            history_loader is not None or not history
         )
-        
-        rag_content = content
-        if relevant_docs:
-            context_str = "\n\n".join(relevant_docs)
-            rag_content = f"基于以下参考资料回答问题。如果参考资料不包含答案，请根据你的知识回答，但优先使用参考资料。\n\n参考资料：\n{context_str}\n\n用户问题：{content}"
+        if cacheable:
+            stages["cache"] = response_cache.lookup(user_id, content)
+
+        results, timings = {}, {}
+        speculative = None
+        stage_results = self._run_pre_generation_stages(stages)
+        try:
+            async for stage, result, elapsed_ms in stage_results:
+                results[stage] = result
+                timings[stage] = elapsed_ms
+                yield {"type": "status", "content": f"{stage}_done", "elapsed_ms": elapsed_ms}
+
+                history_ready = history_loader is None or "history" in results
+                cached = results.get("cache")
+                if cached is not None and cached.events is not None and history_ready and not results.get("history", history):
+                    if speculative is not None:
+                        await speculative.cancel()
+                    yield {"type": "status", "content": "cache_hit", "similarity": round(cached.similarity, 4)}
+                    replayed_at = time.perf_counter() - started
+                    for event in cached.events:
+                        yield event
+                    turn_metrics.record("cache", replayed_at, replayed_at, time.perf_counter() - started)
+                    yield {"type": "llm_end", "content": ""}
+                    return
+
+                # Context is ready but the verdict is not: start the likely Kimi answer now
+                context_ready = "retrieval" in results and history_ready
+                if (settings.SPECULATIVE_GENERATION and speculative is None and context_ready
+                        and "intent" not in results and kimi_gateway.available):
+                    packed = context_packer.pack(content, results["retrieval"], results.get("history", history), "kimi")
+                    speculative = SpeculativeStream(self.stream_kimi_response(
+                        self._build_rag_content(content, packed.passages), packed.history
+                    ), stats=speculation_stats)
+        except BaseException:
+            if speculative is not None:
+                await speculative.cancel()
+            raise
+        finally:
+            # Cancels stages still pending after an early return
+            await stage_results.aclose()
+        verdict_at = time.perf_counter()
+
+        needs_reasoning = results["intent"]
+        relevant_docs = results["retrieval"]
+        if history_loader is not None:
+            history = results["history"]
+        # The stages overlap, so the slowest one is the critical path
+        yield {"type": "status", "content": "context_ready", "timings": timings, "elapsed_ms": max(timings.values())}
+        logger.info(f"Pre-generation stages (ms): {timings}, history length: {len(history)}")
+
+        # Rank, trim and de-duplicate passages and fit history to the routed model's budget
+        packed = context_packer.pack(content, relevant_docs, history, "deepseek" if needs_reasoning else "kimi")
+        history = packed.history
+        rag_content = self._build_rag_content(content, packed.passages)
+        yield {"type": "status", "content": "context_packed", **packed.report()}
+        logger.info(f"Packed context: {packed.report()}")
+        if packed.passages:
             yield {"type": "status", "content": "knowledge_found"}
 
-        # 3. Reasoning or Generating
+        # 2. Reasoning or Generating, recording the answer for the cache
+        cache_lookup = results.get("cache")
+        answer_events = [] if cache_lookup is not None and not history else None
+        ttft = first_output = None
+        async for event in self._generate_answer(content, rag_content, history, needs_reasoning,
+                                                 speculative, verdict_at):
+            if event["type"] in ("thinking_chunk", "llm_chunk") and first_output is None:
+                first_output = time.perf_counter() - started
+            if event["type"] == "llm_chunk" and ttft is None:
+                ttft = time.perf_counter() - started
+            if answer_events is not None and event["type"] in ("thinking_chunk", "thinking_done", "llm_chunk"):
+                if event.get("model", "").endswith("-fallback"):
+                    # Degraded answers are not worth replaying
+                    answer_events = None
+                else:
+                    answer_events.append(event)
+            yield event
+
+        if answer_events:
+            response_cache.put(user_id, content, cache_lookup, answer_events)
+        total = time.perf_counter() - started
+        mode = "reasoning" if needs_reasoning else "normal"
+        turn_metrics.record(mode, ttft, first_output, total)
+        ttft_ms = round(ttft * 1000) if ttft is not None else None
+        logger.info(f"Turn latency ({mode}): ttft={ttft_ms}ms, total={round(total * 1000)}ms")
+        yield {"type": "llm_end", "content": ""}
+
+    async def _generate_answer(self, content: str, rag_content: str, history: list, needs_reasoning: bool,
+                               speculative: Optional[SpeculativeStream], verdict_at: float):
+        """Answer events for one turn, excluding the final llm_end."""
+        if speculative is not None:
+            if needs_reasoning:
+                await speculative.cancel()
+            else:
+                speculative.release(verdict_at)
+                yield {"type": "status", "content": "generating"}
+                try:
+                    async for chunk in speculative.drain():
+                        yield {"type": "llm_chunk", "content": chunk, "model": "kimi-k2.5"}
+                finally:
+                    # Stops the background stream if the consumer goes away mid-answer
+                    await speculative.cancel()
+                return
+
         if needs_reasoning:
-            yield {"type": "status", "content": "reasoning"}
-            
-            full_reasoning = ""
-            full_answer = ""
-            
+            async for event in self._generate_reasoning_answer(content, rag_content, history):
+                yield event
+        elif not kimi_gateway.available:
+            # Kimi is failing: answer with DeepSeek instead of waiting on it
+            yield {"type": "status", "content": "fallback_generating"}
+            async for chunk in self.stream_deepseek_reasoning(rag_content, path=PATH_NORMAL):
+                if chunk["type"] == "reasoning":
+                    yield {"type": "thinking_chunk", "content": chunk["content"]}
+                else:
+                    yield {"type": "llm_chunk", "content": chunk["content"], "model": "deepseek-reasoner-fallback"}
+        else:
+            yield {"type": "status", "content": "generating"}
+            async for chunk in self.stream_kimi_response(rag_content, history):
+                yield {"type": "llm_chunk", "content": chunk, "model": "kimi-k2.5"}
+
+    async def _generate_reasoning_answer(self, content: str, rag_content: str, history: list):
+        """
+        DeepSeek's reasoning streams as thinking chunks and its answer as llm
+        chunks the moment they arrive. Teaching advice is generated by Kimi from
+        a reasoning excerpt, starting with the answer and appended after it.
+        """
+        yield {"type": "status", "content": "reasoning"}
+
+        full_reasoning = ""
+        answering = False
+        advice = None
+        try:
             try:
                 async for chunk in self.stream_deepseek_reasoning(rag_content):
                     if chunk["type"] == "reasoning":
                         full_reasoning += chunk["content"]
                         yield {"type": "thinking_chunk", "content": chunk["content"]}
-                    elif chunk["type"] == "content":
-                        full_answer += chunk["content"]
+                        continue
+                    if not answering:
+                        answering = True
+                        yield {"type": "thinking_done", "content": ""}
+                        yield {"type": "status", "content": "generating"}
+                        if settings.REASONING_TEACHING_ADVICE and kimi_gateway.available:
+                            excerpt = context_packer.condense(content, full_reasoning, settings.REASONING_ADVICE_MAX_TOKENS)
+                            advice = SpeculativeStream(self.stream_teaching_advice(content, excerpt))
+                    yield {"type": "llm_chunk", "content": chunk["content"], "model": "deepseek-v3-reasoner"}
             except Exception as e:
+                if answering:
+                    # Part of the answer has reached the client; another model cannot resume it
+                    raise
                 logger.error(f"DeepSeek stream failed: {e}")
                 yield {"type": "status", "content": "fallback_generating"}
-                async for chunk in self.stream_kimi_response(rag_content, history):
+                async for chunk in self.stream_kimi_response(rag_content, history, path=PATH_REASONING):
                     yield {"type": "llm_chunk", "content": chunk, "model": "kimi-k2.5-fallback"}
-                yield {"type": "llm_end", "content": ""}
                 return
 
-            yield {"type": "thinking_done", "content": ""}
-            
-            yield {"type": "status", "content": "summarizing"}
-            async for chunk in self.stream_summarize_with_kimi(content, full_reasoning, full_answer):
+            if not answering:
+                yield {"type": "thinking_done", "content": ""}
+            if advice is None:
+                return
+
+            header_sent = False
+            async for chunk in advice.drain():
+                if not header_sent:
+                    header_sent = True
+                    yield {"type": "status", "content": "teaching_advice"}
+                    yield {"type": "llm_chunk", "content": "\n\n---\n\n### 教学建议\n\n", "model": "deepseek-v3-reasoner"}
                 yield {"type": "llm_chunk", "content": chunk, "model": "deepseek-v3-reasoner"}
-                
-        else:
-            yield {"type": "status", "content": "generating"}
-            async for chunk in self.stream_kimi_response(rag_content, history):
-                yield {"type": "llm_chunk", "content": chunk, "model": "kimi-k2.5"}
-        
-        yield {"type": "llm_end", "content": ""}
+        finally:
+            # Also stops the advice call if the consumer goes away mid-answer
+            if advice is not None:
+                await advice.cancel()
 
     async def process_chat_full(self, content: str, history: list, user_id: str = None) -> dict:
         full_content = ""
@@ -344,7 +547,7 @@ class AIService:
         Delete file from Kimi (Moonshot).
         """
         try:
-            await self.kimi_client.files.delete(file_id)
+            await kimi_gateway.call("files.delete", lambda: self.kimi_client.files.delete(file_id))
             return True
         except Exception as e:
             logger.error(f"Error deleting file from Kimi {file_id}: {e}")
@@ -395,15 +598,17 @@ class AIService:
             
             prompt_content = f"用户问题：\n{truncated_content}\n\nAI回复：\n{truncated_answer}"
             
-            response = await self.kimi_client.chat.completions.create(
-                model=self.kimi_model,
-                messages=[
-                    {"role": "system", "content": "你是一个有创意的总结专家，擅长将长段段话用精炼的语言进行总结。请根据用户的输入和assistant的输出，生成一个简短的对话标题用来描述当前的对话内容（不超过15个字）。不要使用引号，直接返回标题内容。"},
-                    {"role": "user", "content": f"请为以下对话生成一个标题：\n{prompt_content}"}
-                ],
-                max_tokens=20,
-                temperature=1.0
-            )
+            with timed_stage(self.kimi_model, "title"):
+                response = await kimi_gateway.call("chat.completions", lambda: self.kimi_client.chat.completions.create(
+                    model=self.kimi_model,
+                    messages=[
+                        {"role": "system", "content": "你是一个有创意的总结专家，擅长将长段段话用精炼的语言进行总结。请根据用户的输入和assistant的输出，生成一个简短的对话标题用来描述当前的对话内容（不超过15个字）。不要使用引号，直接返回标题内容。"},
+                        {"role": "user", "content": f"请为以下对话生成一个标题：\n{prompt_content}"}
+                    ],
+                    max_tokens=20,
+                    temperature=1.0,
+                    timeout=self.short_timeout,
+                ))
             title = response.choices[0].message.content.strip()
             # Clean up title
             title = title.replace('"', '').replace("'", "").replace("标题：", "")
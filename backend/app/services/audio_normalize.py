@@ -0,0 +1,258 @@
+"""
+Audio normalization for ASR: any input becomes 16 kHz mono 16-bit PCM.
+
+WAV files are parsed directly. That covers 8/16/24/32-bit integer and 32/64-bit
+float samples, including WAVE_FORMAT_EXTENSIBLE. Other containers (MP3, M4A,
+FLAC, OGG, WebM) are decoded with ffmpeg when it is installed. Anything else
+is passed through as raw 16 kHz PCM, which is what the recognizer assumed
+before.
+
+Channels are averaged to mono. Resampling uses a windowed-sinc low-pass and
+linear interpolation, vectorized with NumPy. Both run incrementally, so a
+live websocket stream is converted block by block into fixed-size frames.
+normalize_file reads a WAV in blocks too, so the raw input is never held at
+once, but it returns the whole 16 kHz output (about 1.9 MB per minute),
+because segmented transcription splits the recording as a whole.
+"""
+import os
+import shutil
+import struct
+import subprocess
+import threading
+from typing import BinaryIO, Iterator, List, Optional
+
+import numpy as np
+
+from app.core.logger import logger
+
+TARGET_RATE = 16000
+FRAME_BYTES = 3200  # 100 ms of 16 kHz 16-bit mono
+_READ_SIZE = 1024 * 1024
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+class AudioFormatError(Exception):
+    pass
+
+class AudioFormat:
+    __slots__ = ("sample_rate", "channels", "sample_width", "is_float")
+
+    def __init__(self, sample_rate: int, channels: int = 1, sample_width: int = 2, is_float: bool = False):
+        if not 4000 <= sample_rate <= 384000:
+            raise AudioFormatError(f"Unsupported sample rate: {sample_rate}")
+        if not 1 <= channels <= 32:
+            raise AudioFormatError(f"Unsupported channel count: {channels}")
+        if (sample_width not in (4, 8)) if is_float else (sample_width not in (1, 2, 3, 4)):
+            raise AudioFormatError(f"Unsupported sample width: {sample_width * 8} bits")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.is_float = is_float
+
+    @property
+    def is_target(self) -> bool:
+        return (self.sample_rate == TARGET_RATE and self.channels == 1
+                and self.sample_width == 2 and not self.is_float)
+
+def decode_samples(data: bytes, fmt: AudioFormat) -> np.ndarray:
+    """Interleaved little-endian samples -> float32 array of shape (frames, channels) in [-1, 1]."""
+    if fmt.is_float:
+        samples = np.frombuffer(data, dtype="<f4" if fmt.sample_width == 4 else "<f8").astype(np.float32)
+    elif fmt.sample_width == 1:
+        # 8-bit WAV is unsigned
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif fmt.sample_width == 2:
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768
+    elif fmt.sample_width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = (np.where(values & 0x800000, values - 0x1000000, values)).astype(np.float32) / 8388608
+    else:
+        samples = np.frombuffer(data, dtype="<i4").astype(np.float32) / 2147483648
+    return samples.reshape(-1, fmt.channels)
+
+class Resampler:
+    """Streaming sample-rate converter for mono float32 audio."""
+
+    def __init__(self, source_rate: int, target_rate: int = TARGET_RATE):
+        self.step = source_rate / target_rate
+        if self.step > 1:
+            # Low-pass just under the target's Nyquist frequency so downsampling does not alias
+            taps = 16 * int(np.ceil(self.step)) + 1
+            cutoff = 0.45 / self.step
+            n = np.arange(taps) - (taps - 1) / 2
+            self.kernel = (2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)).astype(np.float32)
+            self.kernel /= self.kernel.sum()
+        else:
+            self.kernel = np.ones(1, dtype=np.float32)
+        # The previous block's last samples, so filter windows span block boundaries
+        self._history = np.zeros(len(self.kernel), dtype=np.float32)
+        self._position = 0.0  # next output position, in input samples from the start of the next block
+        self._consumed = 0
+        self._produced = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        count = len(samples)
+        buffer = np.concatenate([self._history, samples])
+        self._history = buffer[-len(self.kernel):]
+        self._consumed += count
+        # Interpolation reads filtered samples floor(p) and floor(p) + 1, both in this block (or -1)
+        positions = np.arange(self._position, count - 1, self.step)
+        if len(positions):
+            self._position = positions[-1] + self.step - count
+        else:
+            self._position -= count
+        if not len(positions):
+            return np.zeros(0, dtype=np.float32)
+
+        # Filtered sample j is the kernel applied to buffer[j + 1 : j + 1 + taps]; only the needed ones are computed
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, len(self.kernel))
+        low = np.floor(positions).astype(np.int64)
+        fraction = (positions - low).astype(np.float32)
+        output = windows[low + 1] @ self.kernel
+        if fraction.any():
+            output += fraction * (windows[low + 2] @ self.kernel - output)
+        self._produced += len(output)
+        return output
+
+    def flush(self) -> np.ndarray:
+        """Output for the samples still held back, up to the exact expected length."""
+        expected = int(self._consumed / self.step)
+        padding = np.zeros(len(self.kernel) + int(np.ceil(self.step)) + 2, dtype=np.float32)
+        tail = self.process(padding)
+        self._consumed -= len(padding)
+        return tail[:max(expected - (self._produced - len(tail)), 0)]
+
+class StreamNormalizer:
+    """
+    Converts a byte stream in `fmt` to 16 kHz mono 16-bit PCM, returned in
+    fixed frames of `frame_bytes` (the last one from `flush` may be shorter).
+    """
+
+    def __init__(self, fmt: AudioFormat, frame_bytes: int = FRAME_BYTES):
+        self.fmt = fmt
+        self.frame_bytes = frame_bytes
+        self._resampler = Resampler(fmt.sample_rate) if fmt.sample_rate != TARGET_RATE else None
+        self._pending_in = b""
+        self._pending_out = bytearray()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _convert(self, samples: np.ndarray):
+        mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+        if self._resampler is not None:
+            mono = self._resampler.process(mono)
+        self._pending_out += np.clip(mono * 32768, -32768, 32767).astype("<i2").tobytes()
+
+    def _frames(self, final: bool = False) -> List[bytes]:
+        cut = len(self._pending_out) if final else len(self._pending_out) - len(self._pending_out) % self.frame_bytes
+        frames = [bytes(self._pending_out[i:i + self.frame_bytes]) for i in range(0, cut, self.frame_bytes)]
+        del self._pending_out[:cut]
+        self.bytes_out += cut
+        _record(0, cut)
+        return frames
+
+    def feed(self, data: bytes) -> List[bytes]:
+        self.bytes_in += len(data)
+        _record(len(data), 0)
+        if self.fmt.is_target:
+            self._pending_out += data
+            return self._frames()
+        data = self._pending_in + data
+        usable = len(data) - len(data) % (self.fmt.channels * self.fmt.sample_width)
+        self._pending_in = data[usable:]
+        if usable:
+            self._convert(decode_samples(data[:usable], self.fmt))
+        return self._frames()
+
+    def flush(self) -> List[bytes]:
+        if self._resampler is not None:
+            tail = self._resampler.flush()
+            self._pending_out += np.clip(tail * 32768, -32768, 32767).astype("<i2").tobytes()
+        return self._frames(final=True)
+
+def read_wav_header(f: BinaryIO) -> Optional[tuple]:
+    """(AudioFormat, data length or None if unknown) with `f` at the first sample, or None if not a WAV file."""
+    header = f.read(12)
+    if len(header) < 12 or header[:4] not in (b"RIFF", b"RF64") or header[8:12] != b"WAVE":
+        return None
+    fmt = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            raise AudioFormatError("WAV file has no data chunk")
+        chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"fmt ":
+            body = f.read(size + size % 2)
+            tag, channels, sample_rate = struct.unpack("<HHI", body[:8])
+            bits = struct.unpack("<H", body[14:16])[0]
+            if tag == _WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                tag = struct.unpack("<H", body[24:26])[0]
+            if tag not in (_WAVE_FORMAT_PCM, _WAVE_FORMAT_IEEE_FLOAT):
+                raise AudioFormatError(f"Unsupported WAV encoding: 0x{tag:04x}")
+            fmt = AudioFormat(sample_rate, channels, (bits + 7) // 8, tag == _WAVE_FORMAT_IEEE_FLOAT)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioFormatError("WAV data chunk before fmt chunk")
+            # Streamed and RF64 files leave the size as a placeholder
+            return fmt, None if size in (0, 0xFFFFFFFF) else size
+        else:
+            f.seek(size + size % 2, 1)
+
+def _decode_with_ffmpeg(file_path: str) -> bytes:
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-v", "error", "-i", file_path, "-f", "s16le", "-ac", "1", "-ar", str(TARGET_RATE), "-"],
+        capture_output=True, check=False,
+    )
+    if result.returncode != 0:
+        raise AudioFormatError(f"ffmpeg could not decode the file: {result.stderr.decode(errors='replace')[:200]}")
+    _record(os.path.getsize(file_path), len(result.stdout))
+    return result.stdout
+
+def normalize_file(file_path: str) -> bytes:
+    """Whole file as 16 kHz mono 16-bit PCM, returned in memory."""
+    with open(file_path, "rb") as f:
+        wav = read_wav_header(f)
+        if wav is not None:
+            fmt, remaining = wav
+            normalizer = StreamNormalizer(fmt)
+            output = bytearray()
+            while remaining is None or remaining > 0:
+                block = f.read(_READ_SIZE if remaining is None else min(_READ_SIZE, remaining))
+                if not block:
+                    break
+                if remaining is not None:
+                    remaining -= len(block)
+                output += b"".join(normalizer.feed(block))
+            output += b"".join(normalizer.flush())
+            if not fmt.is_target:
+                logger.info(f"Normalized {fmt.sample_rate} Hz x{fmt.channels} audio: "
+                            f"{normalizer.bytes_in} -> {normalizer.bytes_out} bytes")
+            return bytes(output)
+
+    if shutil.which("ffmpeg"):
+        return _decode_with_ffmpeg(file_path)
+    logger.warning(f"{file_path} is not WAV and ffmpeg is unavailable; treating it as raw 16 kHz PCM")
+    with open(file_path, "rb") as f:
+        return f.read()
+
+def iter_frames(pcm: bytes, frame_bytes: int = FRAME_BYTES) -> Iterator[bytes]:
+    for offset in range(0, len(pcm), frame_bytes):
+        yield pcm[offset:offset + frame_bytes]
+
+_lock = threading.Lock()
+_totals = {"bytes_in": 0, "bytes_out": 0}
+
+def _record(bytes_in: int, bytes_out: int):
+    with _lock:
+        _totals["bytes_in"] += bytes_in
+        _totals["bytes_out"] += bytes_out
+
+def normalization_stats() -> dict:
+    with _lock:
+        return {
+            **_totals,
+            "ratio": round(_totals["bytes_in"] / _totals["bytes_out"], 2) if _totals["bytes_out"] else 0.0,
+        }
@@ -0,0 +1,137 @@
+"""
+Content-addressed storage for uploaded files.
+
+Uploads are hashed (SHA-256) while they are streamed to a temporary file, then
+moved to upload/blobs/<aa>/<bb>/<sha256><ext>. Identical files are stored once;
+the blobs table counts references so a blob is removed only when its last
+knowledge item is deleted. Blobs live under the /static mount like the legacy
+per-category directories, so URLs of both kinds resolve.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from typing import BinaryIO, Optional
+
+from app.core.database import run_in_db
+from app.core.logger import logger
+from app.repositories import blob_repository
+
+UPLOAD_DIR = "upload"
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+_TMP_DIR = os.path.join(BLOB_DIR, "tmp")
+_READ_SIZE = 1024 * 1024
+
+class Blob:
+    __slots__ = ("sha256", "path", "size", "deduplicated")
+
+    def __init__(self, sha256: str, path: str, size: int, deduplicated: bool):
+        self.sha256 = sha256
+        self.path = path
+        self.size = size
+        self.deduplicated = deduplicated
+
+    @property
+    def url(self) -> str:
+        return f"/static/{os.path.relpath(self.path, UPLOAD_DIR).replace(os.sep, '/')}"
+
+def blob_path(sha256: str, ext: str = "", root: str = BLOB_DIR) -> str:
+    """Two levels of fan-out keep every directory small."""
+    return os.path.join(root, sha256[:2], sha256[2:4], f"{sha256}{ext.lower()}")
+
+def is_blob_path(path: str) -> bool:
+    return os.path.abspath(path).startswith(os.path.abspath(BLOB_DIR) + os.sep)
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class BlobStore:
+    def __init__(self, root: str = BLOB_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._stats = {"stored": 0, "deduplicated": 0, "bytes_saved": 0, "released": 0, "removed": 0}
+
+    def _write_temp(self, source: BinaryIO) -> tuple:
+        """Stream `source` to a temporary file, hashing as it goes. Returns (tmp_path, sha256, size)."""
+        os.makedirs(_TMP_DIR, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=_TMP_DIR)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for block in iter(lambda: source.read(_READ_SIZE), b""):
+                    digest.update(block)
+                    out.write(block)
+                    size += len(block)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path, digest.hexdigest(), size
+
+    @staticmethod
+    def _place(tmp_path: str, path: str) -> bool:
+        """Move the temporary file into place unless the blob already exists. Returns True if moved."""
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return True
+
+    async def store(self, source: BinaryIO, ext: str = "") -> Blob:
+        """Store a stream and add one reference to its blob."""
+        loop = asyncio.get_running_loop()
+        tmp_path, sha256, size = await loop.run_in_executor(None, self._write_temp, source)
+        path = blob_path(sha256, ext, self.root)
+
+        placed = []
+        try:
+            # The file is placed under the row lock, after any concurrent release has finished
+            path = await run_in_db(
+                blob_repository.acquire_blob, sha256, path, size,
+                lambda stored_path, created: placed.append(self._place(tmp_path, stored_path)),
+            )
+        except Exception as e:
+            # Never lose an upload over bookkeeping; the dedupe tool can recount references
+            logger.error(f"Failed to record blob reference for {sha256}: {e}")
+            if not placed:
+                placed.append(await loop.run_in_executor(None, self._place, tmp_path, path))
+
+        deduplicated = not placed[0]
+        with self._lock:
+            self._stats["stored"] += 1
+            if deduplicated:
+                self._stats["deduplicated"] += 1
+                self._stats["bytes_saved"] += size
+        if deduplicated:
+            logger.info(f"Upload matches existing blob {sha256} ({size} bytes)")
+        return Blob(sha256, path, size, deduplicated)
+
+    async def release(self, sha256: str) -> Optional[int]:
+        """Drop one reference; the file is deleted with the last one. Returns the remaining count."""
+        def _remove(path: str):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            with self._lock:
+                self._stats["removed"] += 1
+            logger.info(f"Deleted unreferenced blob: {path}")
+
+        remaining = await run_in_db(blob_repository.release_blob, sha256, _remove)
+        with self._lock:
+            self._stats["released"] += 1
+        return remaining
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+blob_store = BlobStore()
@@ -0,0 +1,160 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+def _message_size(message: dict) -> int:
+    size = 64  # dict and small-field overhead
+    for key in ("content", "thinking"):
+        value = message.get(key)
+        if value:
+            size += len(value.encode("utf-8"))
+    return size
+
+class _Entry:
+    __slots__ = ("user_id", "messages", "size")
+
+    def __init__(self, user_id: str, messages: List[dict]):
+        self.user_id = user_id
+        self.messages = messages
+        self.size = sum(_message_size(m) for m in messages)
+
+class ChatHistoryCache:
+    """
+    In-process cache of each chat's most recent messages, keyed by chat_id.
+
+    Entries always hold the true tail of the conversation: they are filled from
+    the database on a miss, appended to whenever a message is queued for saving,
+    and dropped when the chat is deleted or a write fails. Memory is bounded by
+    total message bytes with least-recently-used eviction.
+
+    A fill from the database brackets its read with begin_fill/end_fill. Appends
+    and invalidations in between bump the chat's generation, and the rows read,
+    which may predate them, are then not cached.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_messages: int = 50):
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # chat_id -> [generation, fills in flight]; only chats being filled are tracked
+        self._fills: Dict[str, List[int]] = {}
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._stale_fills = 0
+
+    def get(self, chat_id: str, user_id: str, limit: Optional[int] = None) -> Optional[List[dict]]:
+        """Return the last `limit` cached messages, or None on a miss (or a different owner)."""
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None or entry.user_id != user_id:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(chat_id)
+            self._hits += 1
+            messages = entry.messages if limit is None else entry.messages[-limit:]
+            return list(messages)
+
+    def put(self, chat_id: str, user_id: str, messages: List[dict]):
+        """Store the tail of a chat whose ownership has been verified."""
+        with self._lock:
+            self._store(chat_id, user_id, messages)
+
+    def begin_fill(self, chat_id: str) -> int:
+        """Start reading a chat from the database. Returns the generation to pass to end_fill."""
+        with self._lock:
+            fill = self._fills.setdefault(chat_id, [0, 0])
+            fill[1] += 1
+            return fill[0]
+
+    def end_fill(self, chat_id: str, generation: int, user_id: str, messages: Optional[List[dict]]) -> bool:
+        """
+        Finish a fill started with begin_fill; `messages` is None when the read failed.
+        The messages are stored only if the chat did not change during the read.
+        """
+        with self._lock:
+            fill = self._fills[chat_id]
+            fill[1] -= 1
+            if not fill[1]:
+                del self._fills[chat_id]
+            if messages is None:
+                return False
+            if fill[0] != generation:
+                self._stale_fills += 1
+                return False
+            self._store(chat_id, user_id, messages)
+            return True
+
+    def _store(self, chat_id: str, user_id: str, messages: List[dict]):
+        self._remove(chat_id)
+        entry = _Entry(user_id, list(messages[-self.max_messages:]))
+        self._entries[chat_id] = entry
+        self._bytes += entry.size
+        self._evict()
+
+    def _changed(self, chat_id: str):
+        fill = self._fills.get(chat_id)
+        if fill is not None:
+            fill[0] += 1
+
+    def append(self, chat_id: str, messages: List[dict]):
+        """Append newly saved messages to a cached chat. Uncached chats are left alone."""
+        with self._lock:
+            self._changed(chat_id)
+            entry = self._entries.get(chat_id)
+            if entry is None:
+                return
+            for message in messages:
+                entry.messages.append(message)
+                size = _message_size(message)
+                entry.size += size
+                self._bytes += size
+            overflow = len(entry.messages) - self.max_messages
+            if overflow > 0:
+                dropped = sum(_message_size(m) for m in entry.messages[:overflow])
+                del entry.messages[:overflow]
+                entry.size -= dropped
+                self._bytes -= dropped
+            self._entries.move_to_end(chat_id)
+            self._evict()
+
+    def invalidate(self, chat_id: str):
+        with self._lock:
+            self._changed(chat_id)
+            self._remove(chat_id)
+
+    def _remove(self, chat_id: str):
+        entry = self._entries.pop(chat_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self._evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "stale_fills": self._stale_fills,
+            }
+
+chat_history_cache = ChatHistoryCache(
+    max_bytes=settings.CHAT_CACHE_MAX_BYTES,
+    max_messages=settings.CHAT_CACHE_MAX_MESSAGES,
+)
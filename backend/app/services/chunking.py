@@ -0,0 +1,137 @@
+"""
+Structure-aware splitting of extracted documents into retrieval chunks.
+
+Text is first cut into sections at markdown headings, form feeds (PDF page
+breaks) and page/slide markers, then sections are packed into chunks of at
+most `chunk_size` characters. Oversized sections are split at paragraph,
+then sentence boundaries, with `overlap` characters repeated between
+consecutive pieces so a passage cut at a boundary is still retrievable.
+"""
+import re
+from typing import List, Optional
+
+from app.core.config import settings
+
+# Page/slide markers are a whole line: the marker alone, or followed by a separator and a short
+# title without sentence punctuation. Body lines such as "Page 3 says..." or "第3节课我们..." are not markers.
+_MARKER_TAIL = r"(?:\s*[:：.、|\-—–]\s*[^。！？!?；;，,]{0,60})?"
+_NUMBER = r"(?:\d+|[一二三四五六七八九十百零两]+)"
+
+# Lines that start a new section
+_SECTION_START = re.compile(
+    r"^(#{1,6}\s+\S.*"
+    rf"|(?:slide|page)\s*\d+{_MARKER_TAIL}"
+    rf"|第\s*{_NUMBER}\s*(?:页|张|章|节|部分){_MARKER_TAIL}"
+    rf"|幻灯片\s*\d+{_MARKER_TAIL}"
+    r"|[=\-]{3,}\s*(?:slide|page|幻灯片|第)\s*.*)$",
+    re.IGNORECASE,
+)
+_SENTENCE_END = re.compile(r"(?<=[。！？；.!?;])")
+
+class Chunk:
+    __slots__ = ("index", "text", "heading")
+
+    def __init__(self, index: int, text: str, heading: Optional[str]):
+        self.index = index
+        self.text = text
+        self.heading = heading
+
+def split_sections(text: str) -> List[tuple]:
+    """Split text into (heading, body) sections; heading is None before the first marker."""
+    sections = []
+    heading, lines = None, []
+    for page in text.split("\f"):
+        for line in page.splitlines():
+            stripped = line.strip()
+            if _SECTION_START.match(stripped):
+                if any(l.strip() for l in lines):
+                    sections.append((heading, "\n".join(lines).strip()))
+                heading, lines = stripped.lstrip("#").strip(), [line]
+            else:
+                lines.append(line)
+        # A page break always ends a section
+        if any(l.strip() for l in lines):
+            sections.append((heading, "\n".join(lines).strip()))
+        lines = []
+    return sections
+
+def _split_long(text: str, size: int) -> List[str]:
+    """Cut text into pieces of at most `size` characters at the coarsest boundary available."""
+    if len(text) <= size:
+        return [text]
+    for pattern in (r"\n\s*\n", r"\n", None):
+        units = re.split(pattern, text) if pattern else _SENTENCE_END.split(text)
+        units = [u for u in units if u.strip()]
+        if len(units) > 1:
+            break
+    else:
+        # No boundary at all: hard cut
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    separator = "\n\n" if pattern == r"\n\s*\n" else "\n" if pattern else ""
+    pieces, current = [], ""
+    for unit in units:
+        candidate = f"{current}{separator}{unit}" if current else unit
+        if len(candidate) <= size:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        if len(unit) > size:
+            pieces.extend(_split_long(unit, size))
+            current = ""
+        else:
+            current = unit
+    if current:
+        pieces.append(current)
+    return pieces
+
+def _with_overlap(pieces: List[str], overlap: int) -> List[str]:
+    if overlap <= 0 or len(pieces) < 2:
+        return pieces
+    result = [pieces[0]]
+    for previous, piece in zip(pieces, pieces[1:]):
+        result.append(f"{previous[-overlap:]}{piece}")
+    return result
+
+def chunk_text(text: str, chunk_size: Optional[int] = None, overlap: Optional[int] = None) -> List[Chunk]:
+    chunk_size = chunk_size or settings.CHUNK_SIZE
+    overlap = settings.CHUNK_OVERLAP if overlap is None else overlap
+    overlap = min(overlap, chunk_size // 2)
+
+    chunks: List[Chunk] = []
+    pending, pending_heading = "", None
+
+    def emit(body: str, heading: Optional[str]):
+        chunks.append(Chunk(len(chunks), body, heading))
+
+    for heading, body in split_sections(text or ""):
+        if len(body) > chunk_size:
+            if pending:
+                emit(pending, pending_heading)
+                pending = ""
+            # Every piece of a long section repeats its heading line for context, capped so the
+            # heading, the overlap and the piece together stay within chunk_size
+            head_line, rest = "", body
+            if heading is not None:
+                head_line, _, rest = body.partition("\n")
+                head_cap = chunk_size // 4
+                if len(head_line) > head_cap:
+                    # The full line stays in the body so nothing is lost
+                    rest = f"{head_line}\n{rest}"
+                    head_line = head_line[:head_cap - 1] + "…"
+                head_line += "\n"
+            piece_size = chunk_size - overlap - len(head_line)
+            for piece in _with_overlap(_split_long(rest.strip(), piece_size), overlap):
+                emit(f"{head_line}{piece}", heading)
+            continue
+        # Small neighbouring sections share a chunk
+        if pending and len(pending) + 2 + len(body) <= chunk_size:
+            pending = f"{pending}\n\n{body}"
+        else:
+            if pending:
+                emit(pending, pending_heading)
+            pending, pending_heading = body, heading
+    if pending:
+        emit(pending, pending_heading)
+    return chunks
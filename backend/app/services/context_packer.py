@@ -0,0 +1,192 @@
+"""
+Token-budgeted packing of retrieved passages and chat history into a prompt.
+
+Token counts are estimated locally (CJK characters count as one token each,
+other text as one token per four characters), which tracks the providers'
+tokenizers closely enough for budgeting without a tokenizer dependency.
+"""
+import math
+import re
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+_CJK = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+_SENTENCE = re.compile(r"(?<=[。！？；.!?;\n])")
+_WORD = re.compile(r"[a-z0-9]+")
+_GAP = "……"  # marks sentences left out of a snippet
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+def _terms(text: str) -> set:
+    """Latin words plus CJK character bigrams: enough to score lexical overlap for both scripts."""
+    text = text.lower()
+    terms = set(_WORD.findall(text))
+    cjk = "".join(_CJK.findall(text))
+    terms.update(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return terms
+
+def _shingles(text: str, size: int = 3) -> set:
+    text = re.sub(r"\s+", "", text)
+    return {text[i:i + size] for i in range(max(len(text) - size + 1, 1))}
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class PackedContext:
+    __slots__ = ("passages", "history", "tokens", "dropped_passages", "dropped_messages")
+
+    def __init__(self, passages: List[str], history: List[dict], tokens: Dict[str, int],
+                 dropped_passages: int, dropped_messages: int):
+        self.passages = passages
+        self.history = history
+        self.tokens = tokens
+        self.dropped_passages = dropped_passages
+        self.dropped_messages = dropped_messages
+
+    def report(self) -> dict:
+        return {
+            "tokens": self.tokens,
+            "passages": len(self.passages),
+            "dropped_passages": self.dropped_passages,
+            "history_messages": len(self.history),
+            "dropped_messages": self.dropped_messages,
+        }
+
+class ContextPacker:
+    def __init__(self, budgets: Dict[str, int], knowledge_share: float = 0.6,
+                 passage_max_tokens: int = 600, duplicate_threshold: float = 0.8, reserve_tokens: int = 300):
+        self.budgets = budgets
+        self.knowledge_share = knowledge_share
+        self.passage_max_tokens = passage_max_tokens
+        self.duplicate_threshold = duplicate_threshold
+        # System prompt and template text around the packed context
+        self.reserve_tokens = reserve_tokens
+
+    def pack(self, query: str, passages: List[str], history: List[dict], model: str) -> PackedContext:
+        """
+        Fit passages and history into the model's budget. Passages are given up to
+        knowledge_share of what the query leaves; history gets everything they do
+        not use, so a turn without retrieved passages keeps more history.
+        """
+        budget = self.budgets.get(model, min(self.budgets.values()))
+        query_tokens = count_tokens(query)
+        available = max(budget - self.reserve_tokens - query_tokens, 0)
+
+        knowledge_cap = int(available * self.knowledge_share)
+        packed_passages, knowledge_tokens = self.select_passages(query, passages, knowledge_cap)
+        packed_history, history_tokens = self.fit_history(history, available - knowledge_tokens)
+
+        return PackedContext(
+            packed_passages,
+            packed_history,
+            {
+                "query": query_tokens,
+                "knowledge": knowledge_tokens,
+                "history": history_tokens,
+                "total": query_tokens + knowledge_tokens + history_tokens,
+                "budget": budget,
+            },
+            dropped_passages=len(passages) - len(packed_passages),
+            dropped_messages=len(history) - len(packed_history),
+        )
+
+    def fit_history(self, history: List[dict], budget: int) -> tuple:
+        """Keep the newest non-empty messages that fit in `budget` tokens. Returns (messages, tokens)."""
+        kept, used = [], 0
+        for message in reversed(history):
+            content = str(message.get("content") or "").strip()
+            if not content:
+                continue
+            tokens = count_tokens(content) + 4  # role and message framing
+            if used + tokens > budget:
+                break
+            kept.append(message)
+            used += tokens
+        kept.reverse()
+        return kept, used
+
+    def select_passages(self, query: str, passages: List[str], budget: int) -> tuple:
+        """
+        Rank passages by retrieval order and lexical overlap with the query, trim
+        each to its query-relevant snippet, drop near-duplicates, and fill `budget`.
+        Returns (passages, tokens).
+        """
+        query_terms = _terms(query)
+        ranked = sorted(
+            enumerate(passages),
+            key=lambda item: -(1.0 / (1 + item[0]) + _similarity(query_terms, _terms(item[1])) * 2),
+        )
+
+        selected, selected_shingles, used = [], [], 0
+        for _, passage in ranked:
+            snippet = self.extract_snippet(passage, query_terms, min(self.passage_max_tokens, budget - used))
+            if not snippet:
+                continue
+            shingles = _shingles(snippet)
+            if any(_similarity(shingles, seen) >= self.duplicate_threshold for seen in selected_shingles):
+                continue
+            tokens = count_tokens(snippet)
+            if used + tokens > budget:
+                continue
+            selected.append(snippet)
+            selected_shingles.append(shingles)
+            used += tokens
+        return selected, used
+
+    def condense(self, query: str, text: str, max_tokens: int) -> str:
+        """`text` cut down to its sentences most relevant to `query`, within `max_tokens`."""
+        return self.extract_snippet(text, _terms(query), max_tokens) or ""
+
+    def extract_snippet(self, passage: str, query_terms: set, max_tokens: int) -> Optional[str]:
+        """
+        The passage itself if it fits, otherwise its highest-scoring sentences in
+        their original order. A leading "Filename:" line is always kept.
+        """
+        if max_tokens <= 0:
+            return None
+        if count_tokens(passage) <= max_tokens:
+            return passage
+
+        header = ""
+        if passage.startswith("Filename:"):
+            header, _, passage = passage.partition("\n")
+            header = header + "\n"
+        sentences = [s for s in _SENTENCE.split(passage) if s.strip()]
+        scored = sorted(range(len(sentences)), key=lambda i: (-len(query_terms & _terms(sentences[i])), i))
+
+        # The gap markers between kept sentences count against the budget too
+        keep, used, gap_tokens = set(), count_tokens(header), count_tokens(_GAP)
+        for i in scored:
+            candidate = sorted(keep | {i})
+            gaps = sum(1 for a, b in zip(candidate, candidate[1:]) if b != a + 1)
+            tokens = count_tokens(sentences[i])
+            if used + tokens + gaps * gap_tokens > max_tokens:
+                continue
+            keep.add(i)
+            used += tokens
+        if not keep:
+            return None
+
+        parts, previous = [], None
+        for i in sorted(keep):
+            if previous is not None and i != previous + 1:
+                parts.append(_GAP)
+            parts.append(sentences[i])
+            previous = i
+        return header + "".join(parts).strip()
+
+context_packer = ContextPacker(
+    budgets={
+        "kimi": settings.CONTEXT_BUDGET_KIMI,
+        "deepseek": settings.CONTEXT_BUDGET_DEEPSEEK,
+    },
+    knowledge_share=settings.CONTEXT_KNOWLEDGE_SHARE,
+    passage_max_tokens=settings.CONTEXT_PASSAGE_MAX_TOKENS,
+)
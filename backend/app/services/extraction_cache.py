@@ -0,0 +1,193 @@
+"""
+On-disk cache of extraction results (document text, image/video descriptions,
+transcripts), shared by knowledge uploads and chat attachments.
+
+Entries are keyed by the file's SHA-256 plus the extractor's name and version,
+so changing an extractor only needs a version bump. Each entry stores the text
+and the remote (Kimi) file id so a repeat upload of the same file reuses both.
+The cache is bounded by total size with least-recently-used eviction, and
+concurrent extractions of the same file share one run.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+class CachedExtraction:
+    __slots__ = ("text", "file_id")
+
+    def __init__(self, text: str, file_id: Optional[str]):
+        self.text = text
+        self.file_id = file_id
+
+class ExtractionCache:
+    def __init__(self, directory: str, max_bytes: int, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # Entry filename -> size, least recently used first; loaded from disk on first use
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._bytes = 0
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+        # Metrics
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "stored": 0, "evictions": 0, "discarded": 0}
+
+    @staticmethod
+    def _key(sha256: str, extractor: str, version: int) -> str:
+        return f"{sha256}.{extractor}.v{version}.json"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _ensure_index(self):
+        """Build the LRU index from disk, oldest access first. Call with the lock held."""
+        if self._index is not None:
+            return
+        entries = []
+        for directory, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(".json"):
+                    stat = os.stat(os.path.join(directory, filename))
+                    entries.append((stat.st_mtime, filename, stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((filename, size) for _, filename, size in entries)
+        self._bytes = sum(self._index.values())
+
+    def get(self, sha256: str, extractor: str, version: int) -> Optional[CachedExtraction]:
+        key = self._key(sha256, extractor, version)
+        with self._lock:
+            self._ensure_index()
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            # mtime doubles as the last access time across restarts
+            os.utime(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable extraction cache entry {key}: {e}")
+            self._remove(key)
+            return None
+        return CachedExtraction(entry["text"], entry.get("file_id"))
+
+    def put(self, sha256: str, extractor: str, version: int, text: str, file_id: Optional[str]):
+        key = self._key(sha256, extractor, version)
+        path = self._path(key)
+        data = json.dumps({"text": text, "file_id": file_id, "created_at": time.time()}, ensure_ascii=False)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        with self._lock:
+            self._ensure_index()
+            self._bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+            self._stats["stored"] += 1
+            evicted = []
+            while self._bytes > self.max_bytes and len(self._index) > 1:
+                old_key, old_size = self._index.popitem(last=False)
+                self._bytes -= old_size
+                evicted.append(old_key)
+            self._stats["evictions"] += len(evicted)
+        for old_key in evicted:
+            self._unlink(old_key)
+
+    def discard(self, sha256: str):
+        """Drop every extractor's entry for a file, e.g. once its remote copy is deleted."""
+        with self._lock:
+            self._ensure_index()
+            keys = [key for key in self._index if key.startswith(f"{sha256}.")]
+        for key in keys:
+            self._remove(key)
+        with self._lock:
+            self._stats["discarded"] += len(keys)
+
+    def _remove(self, key: str):
+        with self._lock:
+            if self._index is not None and key in self._index:
+                self._bytes -= self._index.pop(key)
+        self._unlink(key)
+
+    def _unlink(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    async def get_or_extract(self, sha256: Optional[str], extractor: str, version: int,
+                             extract: Callable[[], Awaitable[tuple]],
+                             is_failure: Optional[Callable[[str], bool]] = None) -> tuple:
+        """
+        (text, file_id) from the cache, or from `extract()`, whose result is stored
+        unless it raises or `is_failure(text)` says it is a fallback message.
+        """
+        if not self.enabled or not sha256:
+            return await extract()
+
+        loop = asyncio.get_running_loop()
+        key = self._key(sha256, extractor, version)
+        cached = await loop.run_in_executor(None, self.get, sha256, extractor, version)
+        if cached is not None:
+            self._stats["hits"] += 1
+            logger.info(f"Extraction cache hit: {key}")
+            return cached.text, cached.file_id
+
+        running = self._in_flight.get(key)
+        if running is not None:
+            # Same file being extracted for another request
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(running)
+
+        self._stats["misses"] += 1
+        future = loop.create_future()
+        self._in_flight[key] = future
+        try:
+            result = await extract()
+        except asyncio.CancelledError:
+            # Requests sharing this run see the cancellation too
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Nobody may be waiting; mark it retrieved
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+        future.set_result(result)
+
+        text, file_id = result
+        if text and not (is_failure and is_failure(text)):
+            try:
+                await loop.run_in_executor(None, self.put, sha256, extractor, version, text, file_id)
+            except OSError as e:
+                logger.warning(f"Failed to store extraction cache entry {key}: {e}")
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._index) if self._index is not None else 0,
+                "bytes": self._bytes,
+            }
+
+extraction_cache = ExtractionCache(
+    directory=settings.EXTRACTION_CACHE_DIR,
+    max_bytes=settings.EXTRACTION_CACHE_MAX_BYTES,
+    enabled=settings.EXTRACTION_CACHE_ENABLED,
+)
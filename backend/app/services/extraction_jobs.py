@@ -0,0 +1,218 @@
+"""
+Tracked document extraction jobs.
+
+A job uploads a document to Kimi's file-extract endpoint and polls for the
+extracted text with exponential backoff (short first delays so small files
+return quickly, longer ones so large PDFs are not hammered), under a total
+deadline. Provider errors that polling cannot fix (a non-retryable 4xx such as
+an unknown file or a parse failure) fail the job at once. The number of jobs
+extracting at once is capped; the rest wait as "pending". Callers either
+await a job's result or subscribe to its status changes, e.g. to persist them
+to knowledge_base.status.
+"""
+import asyncio
+import random
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional
+
+import openai
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.ai_service import ai_service
+from app.services.provider_gateway import is_retryable
+
+PENDING = "pending"
+EXTRACTING = "extracting"
+READY = "ready"
+FAILED = "failed"
+
+class ExtractionError(Exception):
+    """The document could not be extracted, or not before the deadline."""
+
+class ExtractionJob:
+    def __init__(self, job_id: str, file_path: str):
+        self.id = job_id
+        self.file_path = file_path
+        self.status = PENDING
+        self.content: Optional[str] = None
+        self.file_id: Optional[str] = None
+        self.error: Optional[str] = None
+        self.polls = 0
+        self.created_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = asyncio.get_running_loop().create_future()
+        self._subscribers: List[asyncio.Queue] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (READY, FAILED)
+
+    def _set_status(self, status: str):
+        self.status = status
+        for queue in self._subscribers:
+            queue.put_nowait(status)
+        if self.finished and not self._done.done():
+            self.finished_at = time.monotonic()
+            self._done.set_result(None)
+
+    async def wait(self) -> tuple[str, str]:
+        """Wait for the job. Returns (content, kimi_file_id); raises ExtractionError if it failed."""
+        # Shielded so that a caller giving up does not cancel the job for other waiters
+        await asyncio.shield(self._done)
+        if self.status == FAILED:
+            raise ExtractionError(self.error or "extraction failed")
+        return self.content, self.file_id
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        """Yield the current status, then each change, ending after ready/failed."""
+        queue: asyncio.Queue = asyncio.Queue()
+        queue.put_nowait(self.status)
+        self._subscribers.append(queue)
+        try:
+            while True:
+                status = await queue.get()
+                yield status
+                if status in (READY, FAILED):
+                    return
+        finally:
+            self._subscribers.remove(queue)
+
+class ExtractionJobManager:
+    def __init__(self, max_concurrency: int = 4, deadline: float = 180.0, poll_initial: float = 0.25,
+                 poll_max: float = 5.0, poll_factor: float = 1.6, max_finished: int = 256):
+        self.max_concurrency = max_concurrency
+        self.deadline = deadline
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.poll_factor = poll_factor
+        self.max_finished = max_finished
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._jobs: "OrderedDict[str, ExtractionJob]" = OrderedDict()
+        self._tasks = set()
+
+        # Metrics
+        self._stats = {"submitted": 0, "ready": 0, "failed": 0, "polls": 0, "extract_seconds_total": 0.0}
+
+    def submit(self, file_path: str, job_id: Optional[str] = None) -> ExtractionJob:
+        """Start extracting `file_path` in the background and return its job."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        job = ExtractionJob(job_id or str(uuid.uuid4()), file_path)
+        self._jobs[job.id] = job
+        self._stats["submitted"] += 1
+        self._spawn(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[ExtractionJob]:
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: ExtractionJob):
+        deadline = job.created_at + self.deadline
+        try:
+            # Time spent queued for a slot counts against the deadline
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.deadline)
+            try:
+                job.started_at = time.monotonic()
+                job._set_status(EXTRACTING)
+                job.file_id = await self._upload(job, deadline)
+                job.content = await self._poll(job, deadline)
+            finally:
+                self._slots.release()
+        except asyncio.CancelledError:
+            job.error = "cancelled"
+            if job.file_id:
+                self._spawn(ai_service.delete_file(job.file_id))
+                job.file_id = None
+            self._stats["failed"] += 1
+            job._set_status(FAILED)
+            raise
+        except Exception as e:
+            job.error = "deadline exceeded" if isinstance(e, asyncio.TimeoutError) else str(e)
+            logger.error(f"Extraction job {job.id} for {job.file_path} failed: {job.error}")
+            if job.file_id:
+                # Nothing will reference the remote file
+                await ai_service.delete_file(job.file_id)
+                job.file_id = None
+            self._stats["failed"] += 1
+            job._set_status(FAILED)
+        else:
+            self._stats["ready"] += 1
+            self._stats["extract_seconds_total"] += time.monotonic() - job.started_at
+            logger.info(f"Extraction job {job.id} ready after {job.polls} poll(s), "
+                        f"{time.monotonic() - job.created_at:.2f}s")
+            job._set_status(READY)
+        finally:
+            self._forget_finished()
+
+    async def _upload(self, job: ExtractionJob, deadline: float) -> str:
+        # Shielded: the provider may accept the upload after the deadline, and that file must not leak
+        upload = asyncio.ensure_future(ai_service.upload_for_extraction(job.file_path))
+        try:
+            return await asyncio.wait_for(asyncio.shield(upload), timeout=deadline - time.monotonic())
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            upload.add_done_callback(self._delete_late_upload)
+            raise
+
+    def _delete_late_upload(self, upload: asyncio.Future):
+        if upload.cancelled() or upload.exception() is not None:
+            return
+        logger.info(f"Deleting Kimi file {upload.result()} uploaded after its job gave up")
+        self._spawn(ai_service.delete_file(upload.result()))
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _poll(self, job: ExtractionJob, deadline: float) -> str:
+        delay = self.poll_initial
+        while True:
+            job.polls += 1
+            self._stats["polls"] += 1
+            try:
+                content = await ai_service.fetch_extracted_content(job.file_id)
+                if content:
+                    return content
+            except openai.APIStatusError as e:
+                # 400/404/422 (unknown file, parse failure) and auth errors will not clear up by polling
+                if not is_retryable(e):
+                    raise
+                logger.debug(f"Extraction job {job.id} not ready: {e}")
+            except Exception as e:
+                # Still processing on the provider side
+                logger.debug(f"Extraction job {job.id} not ready: {e}")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            await asyncio.sleep(min(delay * random.uniform(0.8, 1.2), remaining))
+            delay = min(delay * self.poll_factor, self.poll_max)
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        ready = self._stats["ready"]
+        statuses: Dict[str, int] = {PENDING: 0, EXTRACTING: 0}
+        for job in self._jobs.values():
+            if job.status in statuses:
+                statuses[job.status] += 1
+        return {
+            **self._stats,
+            "extract_seconds_total": round(self._stats["extract_seconds_total"], 3),
+            "extract_seconds_avg": round(self._stats["extract_seconds_total"] / ready, 3) if ready else 0.0,
+            **statuses,
+        }
+
+extraction_jobs = ExtractionJobManager(
+    max_concurrency=settings.EXTRACTION_MAX_CONCURRENCY,
+    deadline=settings.EXTRACTION_DEADLINE,
+    poll_initial=settings.EXTRACTION_POLL_INITIAL,
+    poll_max=settings.EXTRACTION_POLL_MAX,
+)
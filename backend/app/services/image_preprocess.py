@@ -0,0 +1,95 @@
+"""
+Image preprocessing for the vision model.
+
+An image is decoded once, downsized so its longest side is at most
+IMAGE_MAX_SIDE (larger images cost upload time and tokens without helping the
+model), and re-encoded compactly: JPEG for opaque photos, PNG for images with
+transparency and for graphics such as screenshots. The original bytes are kept
+when they are already small enough and in a format the model accepts. Work
+runs in a dedicated thread pool; Pillow releases the GIL while decoding,
+resizing and encoding.
+"""
+import asyncio
+import io
+import math
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.core.logger import logger
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Formats the vision endpoint accepts as-is
+_PASSTHROUGH_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+class PreparedImage:
+    __slots__ = ("data", "mime_type", "width", "height", "original_size")
+
+    def __init__(self, data: bytes, mime_type: str, width: int, height: int, original_size: int):
+        self.data = data
+        self.mime_type = mime_type
+        self.width = width
+        self.height = height
+        self.original_size = original_size
+
+def _raw(data: bytes, file_path: str) -> PreparedImage:
+    mime_type = mimetypes.guess_type(file_path)[0] or "image/jpeg"
+    return PreparedImage(data, mime_type, 0, 0, len(data))
+
+def prepare_image_bytes(data: bytes, file_path: str = "", max_side: int = None, quality: int = None) -> PreparedImage:
+    """Downsize and re-encode one image. Undecodable input is passed through with a guessed MIME type."""
+    max_side = max_side or settings.IMAGE_MAX_SIDE
+    quality = quality or settings.IMAGE_JPEG_QUALITY
+    if Image is None:
+        return _raw(data, file_path)
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        source_format = image.format
+        width, height = image.size
+        oversized = max(width, height) > max_side
+        if oversized:
+            # JPEG can decode straight to a reduced scale, which is much cheaper than a full decode
+            scale = max_side / max(width, height)
+            image.draft("RGB", (math.ceil(width * scale), math.ceil(height * scale)))
+        ImageOps.exif_transpose(image, in_place=True)
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    except Exception as e:
+        logger.warning(f"Could not decode image {file_path}: {e}")
+        return _raw(data, file_path)
+
+    if not oversized and source_format in _PASSTHROUGH_FORMATS and len(data) <= settings.IMAGE_PASSTHROUGH_BYTES:
+        return PreparedImage(data, _PASSTHROUGH_FORMATS[source_format], image.width, image.height, len(data))
+
+    buffer = io.BytesIO()
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    # Losslessly stored images that compress very well are graphics (screenshots, diagrams): JPEG would blur and bloat them
+    graphic = source_format in ("PNG", "GIF") and len(data) < 0.5 * width * height
+    if has_alpha or graphic:
+        image.save(buffer, format="PNG", optimize=True)
+        mime_type = "image/png"
+    else:
+        image.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True)
+        mime_type = "image/jpeg"
+    encoded = buffer.getvalue()
+
+    # Re-encoding a small, already-compressed file can make it larger
+    if source_format in _PASSTHROUGH_FORMATS and not oversized and len(data) <= len(encoded):
+        return PreparedImage(data, _PASSTHROUGH_FORMATS[source_format], image.width, image.height, len(data))
+    return PreparedImage(encoded, mime_type, image.width, image.height, len(data))
+
+def prepare_image(file_path: str, max_side: int = None, quality: int = None) -> PreparedImage:
+    with open(file_path, "rb") as f:
+        data = f.read()
+    return prepare_image_bytes(data, file_path, max_side, quality)
+
+_image_executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix="image")
+
+async def preprocess_image(file_path: str) -> PreparedImage:
+    """Read and prepare an image in the image worker pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_image_executor, prepare_image, file_path)
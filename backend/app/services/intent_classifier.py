@@ -0,0 +1,216 @@
+"""
+Local fast path for reasoning-intent detection.
+
+Two local tiers run before the LLM classifier:
+
+1. Keyword/regex features combined into a logistic score (microseconds).
+2. Optionally, a logistic-regression head over the MiniLM sentence embeddings
+   the knowledge base already uses, trained offline by scripts/eval_intent.py.
+
+A tier answers only when its probability falls outside the uncertain band;
+otherwise the caller-supplied LLM classifier decides. Final verdicts are
+memoized by normalized text.
+"""
+import asyncio
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# A single-letter variable, not part of a word
+_VAR = r"(?<![a-z])[xyzabn](?![a-z])"
+
+# (weight, pattern). Positive weights push towards the reasoning model.
+_FEATURES: List[Tuple[float, re.Pattern]] = [(w, re.compile(p, re.IGNORECASE)) for w, p in [
+    # Worked maths: equations, expressions with a variable, and typical task verbs
+    (2.5, rf"(?:\d|{_VAR}|\))\s*[=<>≤≥]\s*(?:-?\d|{_VAR}|\()"
+          rf"|{_VAR}\s*[\+\-\*/×÷^]\s*(?:\d|{_VAR}|\()|(?:\d|\))\s*[\+\-\*/×÷^]\s*(?:{_VAR}|\()"),
+    # Bare arithmetic is weaker evidence: "2024-2025" and "9/1" are years and dates, so "-" and "/"
+    # only count with spaces around them, and one match alone stays in the uncertain band
+    (1.5, r"\d\s*[\+\*×÷^]\s*\d|\d\s+[-/]\s+\d"),
+    (2.5, r"[√∫∑∏∞≠≈π]|\b(sin|cos|tan|log|ln|lim)\b"),
+    (2.0, r"求解|解方程|方程组?|证明|推导|化简|因式分解|求导|导数|积分|极限|概率|不等式|数列|矩阵|函数的?(最值|单调|零点)|几何证明|求.{0,6}(值|面积|体积|长度|角度|周长)"),
+    # Physics derivations
+    (2.0, r"受力分析|加速度|动量|能量守恒|电路|电阻|电场|磁场|牛顿(第.定律)?|自由落体|摩擦力|抛物运动|圆周运动"),
+    # Code and algorithms
+    (2.0, r"代码|算法|编程|时间复杂度|递归|动态规划|排序算法|二分|链表|python|java(script)?|c\+\+|\bdef\s|\bfunction\b|报错|debug"),
+    # Logic puzzles
+    (2.0, r"逻辑推理|推理题|谁在说谎|悖论|真假话"),
+    # Teaching design and general assistance: the non-reasoning path
+    (-2.5, r"教案|教学设计|课件|课程设计|教学目标|教学重难点|导入环节|课堂活动|活动设计|说课|班会|家长|评语|作文|怎么讲|如何讲解?|如何教|怎样教|教学方法|教学建议|学生兴趣|板书"),
+    (-2.5, r"^(你好|您好|hi|hello|谢谢|多谢|好的|ok)\b"),
+    (-1.5, r"翻译|润色|总结一下|写一(篇|份|段)|生成.{0,4}(标题|大纲|计划)"),
+]]
+# Near zero so a query with no evidence either way stays in the uncertain band and reaches the LLM;
+# a single strong feature (or two weaker ones) is needed to answer locally
+_BIAS = -0.5
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return re.sub(r"\s+", " ", text).strip()
+
+def _sigmoid(x: float) -> float:
+    return 1.0 / (1.0 + math.exp(-x))
+
+def rule_probability(text: str) -> float:
+    """Probability that `text` needs the reasoning model, from keyword/regex features alone."""
+    score = _BIAS
+    for weight, pattern in _FEATURES:
+        if pattern.search(text):
+            score += weight
+    return _sigmoid(score)
+
+class IntentClassifier:
+    def __init__(self, model_path: Optional[str] = None, low: float = 0.15, high: float = 0.85,
+                 memo_size: int = 4096, enabled: bool = True):
+        self.low = low
+        self.high = high
+        self.memo_size = memo_size
+        self.enabled = enabled
+        self._memo: "OrderedDict[str, bool]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._weights = None
+        self._bias = 0.0
+        if model_path:
+            self.load_model(model_path)
+
+        # Metrics
+        self._stats = {"memo_hits": 0, "rule_decisions": 0, "model_decisions": 0, "llm_fallbacks": 0}
+        self._local_seconds = 0.0
+
+    # --- embedding model -------------------------------------------------
+
+    def load_model(self, path: str) -> bool:
+        if np is None or not os.path.exists(path):
+            return False
+        try:
+            data = np.load(path)
+            self._weights = data["weights"].astype(np.float32)
+            self._bias = float(data["bias"])
+            logger.info(f"Loaded intent model from {path} ({self._weights.shape[0]} features)")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to load intent model {path}: {e}")
+            return False
+
+    @property
+    def has_model(self) -> bool:
+        return self._weights is not None
+
+    @staticmethod
+    def embed(texts: List[str]):
+        # Local import to avoid circular dependency; reuses the knowledge base's MiniLM model
+        from app.services.knowledge_service import knowledge_service
+        return np.asarray(knowledge_service.embed(texts), dtype=np.float32)
+
+    def model_probability(self, embedding) -> float:
+        return _sigmoid(float(embedding @ self._weights + self._bias))
+
+    @staticmethod
+    def train(embeddings, labels, epochs: int = 500, lr: float = 0.5, l2: float = 1e-3):
+        """Fit a logistic-regression head with full-batch gradient descent. Returns (weights, bias)."""
+        X = np.asarray(embeddings, dtype=np.float64)
+        y = np.asarray(labels, dtype=np.float64)
+        w = np.zeros(X.shape[1])
+        b = 0.0
+        for _ in range(epochs):
+            p = 1.0 / (1.0 + np.exp(-(X @ w + b)))
+            grad = p - y
+            w -= lr * (X.T @ grad / len(y) + l2 * w)
+            b -= lr * grad.mean()
+        return w.astype(np.float32), float(b)
+
+    @staticmethod
+    def save_model(path: str, weights, bias: float):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, weights=weights, bias=np.float32(bias))
+
+    # --- classification --------------------------------------------------
+
+    def _decided(self, probability: float) -> Optional[bool]:
+        if probability >= self.high:
+            return True
+        if probability <= self.low:
+            return False
+        return None
+
+    async def classify_local(self, query: str) -> Tuple[Optional[bool], str]:
+        """
+        Run the local tiers only. Returns (verdict, tier); verdict is None when
+        every local tier is uncertain.
+        """
+        text = normalize(query)
+        verdict = self._decided(rule_probability(text))
+        if verdict is not None:
+            return verdict, "rules"
+
+        if self.has_model and text:
+            loop = asyncio.get_running_loop()
+            embedding = (await loop.run_in_executor(None, self.embed, [text]))[0]
+            verdict = self._decided(self.model_probability(embedding))
+            if verdict is not None:
+                return verdict, "model"
+        return None, "uncertain"
+
+    async def classify(self, content: str, llm_fallback: Callable[[], Awaitable[bool]],
+                       query: Optional[str] = None) -> bool:
+        """
+        Decide whether `content` needs the reasoning model.
+        `query` is the text used for local features (defaults to `content`);
+        `llm_fallback` is awaited only when the local tiers are uncertain.
+        """
+        if not self.enabled:
+            return await llm_fallback()
+
+        key = normalize(content)
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self._stats["memo_hits"] += 1
+                return self._memo[key]
+
+        started = time.perf_counter()
+        verdict, tier = await self.classify_local(query if query is not None else content)
+        self._local_seconds += time.perf_counter() - started
+
+        if verdict is None:
+            self._stats["llm_fallbacks"] += 1
+            verdict = await llm_fallback()
+        else:
+            self._stats["rule_decisions" if tier == "rules" else "model_decisions"] += 1
+
+        with self._lock:
+            self._memo[key] = verdict
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return verdict
+
+    def stats(self) -> dict:
+        decided_locally = self._stats["rule_decisions"] + self._stats["model_decisions"]
+        total = decided_locally + self._stats["llm_fallbacks"] + self._stats["memo_hits"]
+        return {
+            **self._stats,
+            "has_model": self.has_model,
+            "local_rate": round((decided_locally + self._stats["memo_hits"]) / total, 4) if total else 0.0,
+            "local_seconds_total": round(self._local_seconds, 6),
+        }
+
+intent_classifier = IntentClassifier(
+    model_path=settings.INTENT_MODEL_PATH,
+    low=settings.INTENT_CONFIDENT_LOW,
+    high=settings.INTENT_CONFIDENT_HIGH,
+    memo_size=settings.INTENT_MEMO_SIZE,
+    enabled=settings.INTENT_LOCAL_ENABLED,
+)
@@ -1,18 +1,25 @@
 import os
-import shutil
+import asyncio
 import uuid
 import chromadb
 from datetime import datetime
 from fastapi import UploadFile
-from app.services.ai_service import ai_service
-from app.core.logger import logger
-import pymysql
+from app.services.ai_service import EXTRACTOR_VERSIONS, FALLBACK_TEXTS, ai_service
 from app.core.config import settings
-from app.core.database import get_db_connection
-import hashlib
+from app.core.logger import logger
+from app.core.database import run_in_db
+from app.core.pagination import decode_cursor, encode_cursor
+from app.repositories import knowledge_repository
+from app.services.blob_store import blob_store, is_blob_path
+from app.services.chunking import Chunk, chunk_text
+from app.services.extraction_cache import extraction_cache
+from app.services.extraction_jobs import EXTRACTING, FAILED, PENDING, READY, ExtractionError, extraction_jobs
+from app.services.local_extractors import local_extractor
+from app.services.response_cache import response_cache
 from typing import Optional
 
 UPLOAD_DIR = "upload"
+# Per-category directories of uploads stored before the blob store; still served under /static
 IMAGE_DIR = os.path.join(UPLOAD_DIR, "images")
 AUDIO_DIR = os.path.join(UPLOAD_DIR, "audios")
 VIDEO_DIR = os.path.join(UPLOAD_DIR, "videos")
@@ -50,27 +57,9 @@ class KnowledgeService:
             # For now, we'll log it.
             self.collection = None
 
-    def get_or_create_default_user(self, cursor) -> str:
-        """
-        Get the default admin user ID, or create it if not exists.
-        """
-        username = "admin"
-        cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
-        result = cursor.fetchone()
-        
-        if result:
-            return result['id']
-        
-        # Create default user
-        user_id = str(uuid.uuid4())
-        password_hash = hashlib.sha256("admin".encode()).hexdigest()
-        avatar_url = f"https://api.dicebear.com/7.x/avataaars/svg?seed={username}"
-        
-        cursor.execute(
-            "INSERT INTO users (id, username, password_hash, avatar_url) VALUES (%s, %s, %s, %s)",
-            (user_id, username, password_hash, avatar_url)
-        )
-        return user_id
+    def embed(self, texts: list[str]) -> list:
+        """Embed texts with the same model the collection uses."""
+        return self.embedding_fn(texts)
 
     async def process_upload(self, file: UploadFile, user_id: Optional[str] = None) -> dict:
         """
@@ -80,76 +69,81 @@ class KnowledgeService:
         filename = file.filename
         content_type = file.content_type
         
-        # Determine file category and save path
+        # Determine file category
         category = "document"
-        save_dir = DOC_DIR
-        
         if content_type.startswith("image/"):
             category = "image"
-            save_dir = IMAGE_DIR
         elif content_type.startswith("audio/"):
             category = "audio"
-            save_dir = AUDIO_DIR
         elif content_type.startswith("video/"):
             category = "video"
-            save_dir = VIDEO_DIR
             
-        # Generate safe filename with ID to avoid collisions but keep extension
+        # Keep the extension so the file is served with the right type
         ext = os.path.splitext(filename)[1]
         if not ext:
             if category == "image": ext = ".jpg"
             elif category == "audio": ext = ".wav"
             elif category == "video": ext = ".mp4"
             else: ext = ".txt"
-            
-        saved_filename = f"{category}-{file_id}{ext}"
-        file_path = os.path.join(save_dir, saved_filename)
         
-        # Save file to disk
+        # Save file to disk; identical files share one blob
         try:
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            blob = await blob_store.store(file.file, ext)
         except Exception as e:
             logger.error(f"Failed to save file: {e}")
             raise Exception("File save failed")
+        file_path = blob.path
+
+        db_id = f"{category}-{file_id}"
+        upload_date = datetime.now().isoformat()
+
+        url = blob.url
+
+        # Store in MySQL with user_id up front, so the item's progress is visible while it is processed
+        try:
+            # Use provided user_id, or fallback to default
+            final_user_id = await run_in_db(
+                knowledge_repository.insert_item,
+                db_id,
+                user_id,
+                filename,
+                category,
+                url,
+                PENDING,
+                "",
+                upload_date,
+                blob_sha256=blob.sha256
+            )
+            logger.info(f"Stored item in MySQL: {db_id} for user: {final_user_id}")
+        except Exception as e:
+            logger.error(f"Failed to store in MySQL: {e}")
+            # Without a row the item could never be deleted, so its blob reference would leak
+            await self._discard_upload(db_id, blob.sha256, stored=False)
+            raise Exception("Database storage failed")
 
         # Process content based on category
         extracted_text = ""
         kimi_file_id = None
+        status = READY
         
         try:
-            if category == "image":
-                extracted_text, kimi_file_id = await ai_service.get_image_description(file_path)
-            elif category == "video":
-                extracted_text, kimi_file_id = await ai_service.get_video_description(file_path)
-            elif category == "audio":
-                # Audio uses DashScope, so no Kimi file ID
-                extracted_text = await ai_service.get_audio_text(file_path)
-            else:
-                # Text or Document (PDF, etc.)
-                if content_type == "text/plain" or filename.endswith(".txt"):
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        extracted_text = f.read()
-                else:
-                    extracted_text, kimi_file_id = await ai_service.get_document_content(file_path)
+            extracted_text, kimi_file_id = await self._extract(db_id, category, filename, content_type, blob)
+        except ExtractionError as e:
+            logger.error(f"Document extraction failed for {filename}: {e}")
+            extracted_text, status = "无法提取文件内容。", FAILED
         except Exception as e:
             logger.error(f"AI processing failed for {filename}: {e}")
-            extracted_text = "Content extraction failed."
+            extracted_text, status = "Content extraction failed.", FAILED
 
         # Ensure extracted_text is not None
         if extracted_text is None:
-            extracted_text = "Content extraction failed."
-
-        # Add filename to the beginning of the text to improve retrieval
-        final_text = f"Filename: {filename}\n\n{extracted_text}"
+            extracted_text, status = "Content extraction failed.", FAILED
 
         # Store in ChromaDB
         if not self.collection:
             logger.error("ChromaDB collection not initialized")
+            await self._discard_upload(db_id, blob.sha256)
             raise Exception("Database not initialized")
-
-        db_id = f"{category}-{file_id}"
-        upload_date = datetime.now().isoformat()
         
         metadata = {
             "type": category,
@@ -157,7 +151,8 @@ class KnowledgeService:
             "path": file_path,
             "content_type": content_type,
             "upload_date": upload_date,
-            "user_id": user_id or "unknown"  # 添加用户ID到元数据
+            "user_id": user_id or "unknown",  # 添加用户ID到元数据
+            "sha256": blob.sha256
         }
         
         # Add Kimi file ID to metadata if available
@@ -165,92 +160,152 @@ class KnowledgeService:
             metadata["kimi_file_id"] = kimi_file_id
         
         try:
-            self.collection.add(
-                documents=[final_text],
-                metadatas=[metadata],
-                ids=[db_id]
+            # Embedding a long document takes a while; keep it off the event loop
+            loop = asyncio.get_running_loop()
+            chunk_count = await loop.run_in_executor(
+                None, self._add_chunks, db_id, filename, extracted_text, metadata
             )
+            logger.info(f"Stored {chunk_count} chunks for {db_id}")
         except Exception as e:
             logger.error(f"ChromaDB add failed: {e}")
+            await self._discard_upload(db_id, blob.sha256)
             raise Exception("Database storage failed")
 
-        # Generate URL relative to static mount
-        relative_path = os.path.relpath(file_path, UPLOAD_DIR)
-        url = f"/static/{relative_path}"
-        
-        # Store in MySQL with user_id
-        try:
-            conn = get_db_connection()
-            with conn.cursor() as cursor:
-                # Use provided user_id, or fallback to default
-                final_user_id = user_id
-                if not final_user_id:
-                    final_user_id = self.get_or_create_default_user(cursor)
-                
-                sql = """
-                    INSERT INTO knowledge_base (id, user_id, title, type, url, status, summary, upload_date)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(sql, (
-                    db_id,
-                    final_user_id,
-                    filename,
-                    category,
-                    url,
-                    "ready",
-                    extracted_text[:500], # Limit summary length
-                    upload_date
-                ))
-            conn.commit()
-            conn.close()
-            logger.info(f"Stored item in MySQL: {db_id} for user: {final_user_id}")
-        except Exception as e:
-            logger.error(f"Failed to store in MySQL: {e}")
-            # Don't fail the whole request if MySQL fails, as ChromaDB is primary for RAG?
-            # Or should we rollback? For now, just log error.
+        # Cached answers were generated without this document
+        response_cache.invalidate_user(user_id)
+
+        await self._set_status(db_id, status, extracted_text[:500])  # Limit summary length
 
         return {
             "id": db_id,
             "title": filename,
             "type": category,
             "url": url,
-            "status": "ready",
+            "status": status,
             "summary": extracted_text[:100] + "...",
             "uploadDate": upload_date
         }
 
-    def get_all_items(self, user_id: Optional[str] = None):
+    async def _extract(self, db_id: str, category: str, filename: str, content_type: str, blob) -> tuple:
+        """(text, kimi_file_id) for an upload, reusing a cached extraction of identical content."""
+        file_path = blob.path
+        if category == "document":
+            # Text, Office files and text-layer PDFs are parsed locally
+            if local_extractor.supports(file_path):
+                await self._set_status(db_id, EXTRACTING)
+                text = await local_extractor.extract_cached(file_path, blob.sha256)
+                if text is not None:
+                    return text, None
+
+            # Scanned PDFs and other formats: extracted remotely by a tracked job
+            extractor = "kimi-file-extract"
+
+            async def extract():
+                job = extraction_jobs.submit(file_path, job_id=db_id)
+                async for job_status in job.subscribe():
+                    if job_status not in (PENDING, READY, FAILED):
+                        await self._set_status(db_id, job_status)
+                return await job.wait()
+        else:
+            async def report(done: int, total: int, segment) -> None:
+                logger.info(f"Transcribed segment {done}/{total} of {db_id} ({segment.start:.0f}s-{segment.end:.0f}s)")
+
+            async def transcribe(path: str) -> tuple:
+                # Audio uses DashScope, so no Kimi file ID
+                return await ai_service.get_audio_text(path, on_progress=report), None
+
+            extractor, describe = {
+                "image": ("kimi-image-description", ai_service.get_image_description),
+                "video": ("kimi-video-description", ai_service.get_video_description),
+                "audio": ("dashscope-asr", transcribe),
+            }[category]
+
+            async def extract():
+                await self._set_status(db_id, EXTRACTING)
+                return await describe(file_path)
+
+        return await extraction_cache.get_or_extract(
+            blob.sha256, extractor, EXTRACTOR_VERSIONS[extractor], extract,
+            is_failure=FALLBACK_TEXTS.__contains__,
+        )
+
+    @staticmethod
+    async def _set_status(item_id: str, status: str, summary: Optional[str] = None):
+        try:
+            await run_in_db(knowledge_repository.update_status, item_id, status, summary)
+        except Exception as e:
+            logger.error(f"Failed to update status of {item_id} to {status}: {e}")
+
+    @staticmethod
+    async def _discard_upload(item_id: str, sha256: str, stored: bool = True):
+        """Undo a failed upload: drop its MySQL row and the blob reference it took."""
+        if stored:
+            try:
+                await run_in_db(knowledge_repository.delete_item, item_id)
+            except Exception as e:
+                logger.error(f"Failed to remove {item_id} after a failed upload: {e}")
+                # The row still points at the blob; deleting the item later releases it
+                return
+        try:
+            await blob_store.release(sha256)
+        except Exception as e:
+            logger.error(f"Error releasing blob {sha256}: {e}")
+
+    def _add_chunks(self, item_id: str, filename: str, text: str, metadata: dict) -> int:
         """
-        Get all items from MySQL (primary) or ChromaDB (fallback), filtered by user_id.
+        Split an item's text into chunks and add them in embedding batches.
+        Chunk ids are "<item_id>#<index>"; each chunk's metadata links back to the item.
+        On failure the chunks already added are removed so the item is all-or-nothing.
         """
-        items = []
-        
+        chunks = chunk_text(text) or [Chunk(0, text, None)]
+        ids, documents, metadatas = [], [], []
+        for chunk in chunks:
+            ids.append(f"{item_id}#{chunk.index}")
+            # Add filename to the beginning of each chunk to improve retrieval
+            documents.append(f"Filename: {filename}\n\n{chunk.text}")
+            metadatas.append({
+                **metadata,
+                "item_id": item_id,
+                "chunk_index": chunk.index,
+                "chunk_count": len(chunks),
+                "heading": chunk.heading or "",
+            })
+
+        batch_size = settings.EMBED_BATCH_SIZE
+        try:
+            for start in range(0, len(ids), batch_size):
+                end = start + batch_size
+                self.collection.add(ids=ids[start:end], documents=documents[start:end], metadatas=metadatas[start:end])
+        except Exception:
+            self.collection.delete(where={"item_id": item_id})
+            raise
+        return len(chunks)
+
+    def _get_item_record(self, item_id: str) -> dict:
+        """Metadata of one of the item's chunks (they share the item fields), or of a legacy single-record item."""
+        result = self.collection.get(where={"item_id": item_id}, limit=1)
+        if not result or not result['ids']:
+            result = self.collection.get(ids=[item_id])
+        return result
+
+    def get_items_page(self, user_id: Optional[str] = None, limit: int = 50,
+                       cursor: Optional[str] = None) -> tuple[list, Optional[str]]:
+        """
+        Get a page of items from MySQL (primary) or ChromaDB (fallback), filtered by user_id,
+        newest first. Returns (items, next_cursor). Raises ValueError for a malformed cursor.
+        """
+        if not user_id:
+            # If no user_id provided, return empty list for security
+            logger.warning("get_items_page called without user_id, returning empty list")
+            return [], None
+
+        position = decode_cursor(cursor)
+
         # Try fetching from MySQL first, filtered by user_id
         try:
-            conn = get_db_connection()
-            with conn.cursor() as cursor:
-                if user_id:
-                    sql = "SELECT id, title, type, url, status, summary, upload_date FROM knowledge_base WHERE user_id = %s ORDER BY upload_date DESC"
-                    cursor.execute(sql, (user_id,))
-                else:
-                    # If no user_id provided, return empty list for security
-                    logger.warning("get_all_items called without user_id, returning empty list")
-                    return []
-                
-                results = cursor.fetchall()
-                for row in results:
-                    items.append({
-                        "id": row['id'],
-                        "title": row['title'],
-                        "type": row['type'],
-                        "url": row['url'],
-                        "status": row['status'],
-                        "summary": row['summary'],
-                        "uploadDate": row['upload_date'].isoformat() if isinstance(row['upload_date'], datetime) else str(row['upload_date'])
-                    })
-            conn.close()
-            if items:
-                return items
+            items, next_cursor = knowledge_repository.list_items(user_id, limit=limit, cursor=cursor)
+            if items or position:
+                return items, next_cursor
         except Exception as e:
             logger.error(f"Error getting items from MySQL: {e}")
             # Fallback to ChromaDB below
@@ -258,16 +313,17 @@ class KnowledgeService:
         # Fallback to ChromaDB (with user_id filtering in metadata)
         try:
             # Query ChromaDB with user_id filter
-            if user_id:
-                result = self.collection.get(where={"user_id": user_id})
-            else:
-                result = self.collection.get()
+            result = self.collection.get(where={"user_id": user_id})
             
             items = []
             if result and result['ids']:
                 for i, doc_id in enumerate(result['ids']):
                     metadata = result['metadatas'][i] or {}
                     document = result['documents'][i] or ""
+                    # One entry per item: its first chunk (legacy items are a single record)
+                    if metadata.get("chunk_index", 0) != 0:
+                        continue
+                    doc_id = metadata.get("item_id", doc_id)
                     
                     file_path = metadata.get("path", "")
                     url = "#"
@@ -284,12 +340,19 @@ class KnowledgeService:
                         "summary": document[:100] + "..." if document else "No content",
                         "uploadDate": metadata.get("upload_date", datetime.now().isoformat())
                     })
-            # Sort by uploadDate descending
-            items.sort(key=lambda x: x["uploadDate"], reverse=True)
-            return items
+            # Sort by uploadDate descending, then apply the same keyset as MySQL
+            items.sort(key=lambda x: (x["uploadDate"], x["id"]), reverse=True)
+            if position:
+                after = (position[0].isoformat(), position[1])
+                items = [item for item in items if (item["uploadDate"], item["id"]) < after]
+            next_cursor = None
+            if len(items) > limit:
+                items = items[:limit]
+                next_cursor = encode_cursor(items[-1]["uploadDate"], items[-1]["id"])
+            return items, next_cursor
         except Exception as e:
             logger.error(f"Error getting items: {e}")
-            return []
+            return [], None
 
     def query_knowledge(self, query: str, n_results: int = 3, user_id: Optional[str] = None) -> list[str]:
         """
@@ -326,22 +389,16 @@ class KnowledgeService:
         Verifies that the item belongs to the user before deletion.
         """
         # First, verify ownership via MySQL
+        if not user_id:
+            # If no user_id, deny deletion for security
+            logger.warning(f"Delete attempted without user_id for item: {item_id}")
+            return False
+
         try:
-            conn = get_db_connection()
-            with conn.cursor() as cursor:
-                if user_id:
-                    cursor.execute("SELECT id FROM knowledge_base WHERE id = %s AND user_id = %s", (item_id, user_id))
-                else:
-                    # If no user_id, deny deletion for security
-                    logger.warning(f"Delete attempted without user_id for item: {item_id}")
-                    return False
-                    
-                result = cursor.fetchone()
-                if not result:
-                    logger.warning(f"Item {item_id} not found or does not belong to user {user_id}")
-                    conn.close()
-                    return False
-            conn.close()
+            if not await run_in_db(knowledge_repository.item_belongs_to_user, item_id, user_id):
+                logger.warning(f"Item {item_id} not found or does not belong to user {user_id}")
+                return False
+            blob_sha256 = await run_in_db(knowledge_repository.get_blob_hash, item_id)
         except Exception as e:
             logger.error(f"Error verifying item ownership: {e}")
             return False
@@ -349,11 +406,7 @@ class KnowledgeService:
         try:
             # 1. Delete from MySQL first (metadata)
             try:
-                conn = get_db_connection()
-                with conn.cursor() as cursor:
-                    cursor.execute("DELETE FROM knowledge_base WHERE id = %s", (item_id,))
-                conn.commit()
-                conn.close()
+                await run_in_db(knowledge_repository.delete_item, item_id)
                 logger.info(f"Deleted item from MySQL: {item_id}")
             except Exception as e:
                 logger.error(f"Error deleting from MySQL: {e}")
@@ -362,7 +415,7 @@ class KnowledgeService:
                 raise Exception("Database not initialized")
                 
             # 2. Get item metadata to find file path and potentially Kimi file ID
-            result = self.collection.get(ids=[item_id])
+            result = self._get_item_record(item_id)
             if not result or not result['ids']:
                 logger.warning(f"Item not found in ChromaDB: {item_id}")
                 # Even if not found in ChromaDB, we might have deleted from MySQL successfully
@@ -371,6 +424,11 @@ class KnowledgeService:
                 # Without Chroma metadata we don't know the file path easily unless we query MySQL first.
                 # But we already deleted from MySQL.
                 # Let's assume if it's gone from MySQL, it's "deleted" for the user.
+                if blob_sha256:
+                    try:
+                        await blob_store.release(blob_sha256)
+                    except Exception as e:
+                        logger.error(f"Error releasing blob {blob_sha256}: {e}")
                 return True
                 
             metadatas = result['metadatas']
@@ -380,21 +438,35 @@ class KnowledgeService:
             if metadatas and metadatas[0]:
                 file_path = metadatas[0].get("path")
                 kimi_file_id = metadatas[0].get("kimi_file_id") # We need to store this!
+                blob_sha256 = blob_sha256 or metadatas[0].get("sha256")
                 
-            # 2. Delete from Kimi if ID exists
-            if kimi_file_id:
-                await ai_service.delete_file(kimi_file_id)
-                
-            # 3. Delete file from disk
-            if file_path and os.path.exists(file_path):
+            # 2. Delete file from disk: a legacy path (a hard link to its blob once deduplicated)
+            # is removed directly, a blob only when this was its last reference
+            if file_path and not is_blob_path(file_path) and os.path.exists(file_path):
                 try:
                     os.remove(file_path)
                     logger.info(f"Deleted file: {file_path}")
                 except Exception as e:
                     logger.error(f"Error deleting file {file_path}: {e}")
+            remaining_refs = 0
+            if blob_sha256:
+                try:
+                    remaining_refs = await blob_store.release(blob_sha256) or 0
+                except Exception as e:
+                    logger.error(f"Error releasing blob {blob_sha256}: {e}")
+                    remaining_refs = 1  # Unknown: keep what other items may share
+
+            # 3. Delete from Kimi if ID exists. Identical uploads share the cached remote file,
+            # so it goes (with its cache entries) only with the last item holding this content
+            if kimi_file_id and not remaining_refs:
+                await ai_service.delete_file(kimi_file_id)
+                if blob_sha256:
+                    extraction_cache.discard(blob_sha256)
             
             # 4. Delete from ChromaDB
-            self.collection.delete(ids=[item_id])
+            self.collection.delete(where={"item_id": item_id})
+            self.collection.delete(ids=[item_id])  # Legacy single-record items
+            response_cache.invalidate_user(user_id)
             logger.info(f"Deleted item from ChromaDB: {item_id}")
             return True
             
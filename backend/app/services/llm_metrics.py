@@ -0,0 +1,84 @@
+"""
+Prometheus histograms for LLM calls and the chat stages around them.
+
+Every series is labeled by model, stage and path. The path is "reasoning" or
+"normal" once a turn is routed. Stages that run before routing (intent,
+retrieval) and calls outside a turn (titles) use "none". Streamed calls
+record time to first token, the gap between streamed chunks, total duration,
+output chunks and chunks per second (after the first chunk); failures are
+counted by exception type. A chunk is one streamed delta (a token or a few);
+streams carry no usage figures, so chunks rather than tokens are counted.
+"""
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram
+
+PATH_NORMAL = "normal"
+PATH_REASONING = "reasoning"
+PATH_NONE = "none"
+
+_LABELS = ("model", "stage", "path")
+
+TIME_TO_FIRST_TOKEN = Histogram(
+    "edumind_llm_time_to_first_token_seconds", "Time from request to first streamed token", _LABELS,
+    buckets=(0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 8, 13, 20, 30),
+)
+INTER_CHUNK_LATENCY = Histogram(
+    "edumind_llm_inter_chunk_latency_seconds", "Gap between consecutive streamed chunks", _LABELS,
+    buckets=(0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.2, 0.5, 1, 2.5),
+)
+STAGE_DURATION = Histogram(
+    "edumind_llm_stage_duration_seconds", "Total duration of a stage or LLM call", _LABELS,
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160),
+)
+CHUNKS_PER_SECOND = Histogram(
+    "edumind_llm_output_chunks_per_second", "Streamed chunks per second after the first chunk", _LABELS,
+    buckets=(5, 10, 20, 30, 45, 60, 80, 100, 150, 200, 300),
+)
+OUTPUT_CHUNKS = Counter("edumind_llm_output_chunks", "Streamed output chunks", _LABELS)
+STAGE_ERRORS = Counter("edumind_llm_stage_errors", "Failed stages and LLM calls", _LABELS + ("error",))
+
+class StreamTimer:
+    """Times one streamed call. Call `chunk` per chunk, then `finish` or `fail`."""
+    __slots__ = ("labels", "started", "first", "last", "chunks", "_ttft", "_gap")
+
+    def __init__(self, model: str, stage: str, path: str = PATH_NONE):
+        self.labels = (model, stage, path)
+        self.started = time.perf_counter()
+        self.first = self.last = None
+        self.chunks = 0
+        # Resolved once; chunks arrive many times per second
+        self._ttft = TIME_TO_FIRST_TOKEN.labels(*self.labels)
+        self._gap = INTER_CHUNK_LATENCY.labels(*self.labels)
+
+    def chunk(self):
+        now = time.perf_counter()
+        if self.first is None:
+            self.first = now
+            self._ttft.observe(now - self.started)
+        else:
+            self._gap.observe(now - self.last)
+        self.last = now
+        self.chunks += 1
+
+    def finish(self):
+        STAGE_DURATION.labels(*self.labels).observe(time.perf_counter() - self.started)
+        OUTPUT_CHUNKS.labels(*self.labels).inc(self.chunks)
+        if self.first is not None and self.last > self.first:
+            CHUNKS_PER_SECOND.labels(*self.labels).observe(self.chunks / (self.last - self.first))
+
+    def fail(self, error: BaseException):
+        STAGE_ERRORS.labels(*self.labels, type(error).__name__).inc()
+
+@contextmanager
+def timed_stage(model: str, stage: str, path: str = PATH_NONE):
+    """Duration and failures of a non-streamed stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        STAGE_ERRORS.labels(model, stage, path, type(e).__name__).inc()
+        raise
+    finally:
+        STAGE_DURATION.labels(model, stage, path).observe(time.perf_counter() - started)
@@ -0,0 +1,232 @@
+"""
+Local text extraction for common document formats.
+
+TXT/MD/CSV, DOCX, PPTX and PDFs with a text layer are parsed on this machine
+instead of being uploaded to Kimi's file-extract endpoint. Structure is kept
+as markdown headings ("## Slide 3: ...", "## Page 2", document headings) so the
+chunker splits along it. Parsing runs in a bounded process pool, so large
+files never hold the event loop or the GIL. Formats that cannot be parsed
+here (scanned PDFs, legacy binary Office files, anything else) return None
+and the caller falls back to the remote extractor.
+"""
+import asyncio
+import csv
+import io
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.extraction_cache import extraction_cache
+
+# Bump when the output of any extractor below changes
+LOCAL_EXTRACTOR_VERSION = 2  # 2: slide titles no longer repeated in the body
+
+_HEADING_RE = re.compile(r"^#{1,6} .*$", re.MULTILINE)
+
+def _read_text(path: str) -> str:
+    with open(path, "rb") as f:
+        data = f.read()
+    for encoding in ("utf-8-sig", "gb18030"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("utf-8", errors="replace")
+
+def extract_plain(path: str) -> str:
+    return _read_text(path)
+
+def extract_csv(path: str) -> str:
+    text = _read_text(path)
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096])
+    except csv.Error:
+        dialect = csv.excel
+    rows = [" | ".join(cell.strip() for cell in row) for row in csv.reader(io.StringIO(text), dialect)]
+    return "\n".join(row for row in rows if row.strip(" |"))
+
+def _table_rows(table) -> list:
+    rows = []
+    for row in table.rows:
+        cells = [cell.text.strip() for cell in row.cells]
+        if any(cells):
+            rows.append(" | ".join(cells))
+    return rows
+
+def extract_docx(path: str) -> str:
+    import docx
+    from docx.table import Table
+
+    document = docx.Document(path)
+    lines = []
+    for block in document.iter_inner_content():
+        if isinstance(block, Table):
+            lines.extend(_table_rows(block))
+            lines.append("")
+            continue
+        text = block.text.strip()
+        if not text:
+            continue
+        style = (block.style.name if block.style is not None else "") or ""
+        level = None
+        if style == "Title":
+            level = 1
+        elif style.startswith(("Heading", "标题")):
+            suffix = style.split()[-1]
+            level = min(int(suffix), 6) if suffix.isdigit() else 2
+        lines.append(f"{'#' * level} {text}" if level else text)
+        if level:
+            lines.append("")
+    return "\n".join(lines).strip()
+
+def _shape_lines(shape) -> list:
+    if getattr(shape, "shapes", None) is not None:
+        # Group shape
+        return [line for child in shape.shapes for line in _shape_lines(child)]
+    lines = []
+    if shape.has_text_frame:
+        for paragraph in shape.text_frame.paragraphs:
+            text = "".join(run.text for run in paragraph.runs).strip()
+            if text:
+                lines.append(f"{'  ' * paragraph.level}- {text}" if paragraph.level else text)
+    elif getattr(shape, "has_table", False):
+        lines.extend(_table_rows(shape.table))
+    return lines
+
+def extract_pptx(path: str) -> str:
+    from pptx import Presentation
+
+    presentation = Presentation(path)
+    slides = []
+    for number, slide in enumerate(presentation.slides, 1):
+        title_shape = slide.shapes.title
+        title = title_shape.text_frame.text.strip() if title_shape is not None else ""
+        lines = [f"## Slide {number}: {title}" if title else f"## Slide {number}"]
+        for shape in slide.shapes:
+            # python-pptx returns a new proxy per access, so the title is matched by id
+            if title_shape is None or shape.shape_id != title_shape.shape_id:
+                lines.extend(_shape_lines(shape))
+        if slide.has_notes_slide and slide.notes_slide.notes_text_frame is not None:
+            notes = slide.notes_slide.notes_text_frame.text.strip()
+            if notes:
+                lines.append(f"备注：{notes}")
+        slides.append("\n".join(lines))
+    return "\n\n".join(slides)
+
+def extract_pdf(path: str) -> Optional[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages = []
+    characters = 0
+    for number, page in enumerate(reader.pages, 1):
+        text = (page.extract_text() or "").strip()
+        characters += len(text)
+        if text:
+            pages.append(f"## Page {number}\n{text}")
+    # Scanned pages have no text layer: leave them to the remote (OCR-capable) extractor
+    if characters < settings.LOCAL_PDF_MIN_CHARS_PER_PAGE * max(len(reader.pages), 1):
+        return None
+    return "\n\n".join(pages)
+
+_EXTRACTORS: Dict[str, Callable[[str], Optional[str]]] = {
+    ".txt": extract_plain,
+    ".md": extract_plain,
+    ".markdown": extract_plain,
+    ".csv": extract_csv,
+    ".docx": extract_docx,
+    ".pptx": extract_pptx,
+    ".pdf": extract_pdf,
+}
+
+def extract_file(path: str) -> Optional[str]:
+    """Text of a supported file, or None when it has to be extracted remotely. Runs in a worker process."""
+    extractor = _EXTRACTORS.get(os.path.splitext(path)[1].lower())
+    if extractor is None:
+        return None
+    try:
+        text = extractor(path)
+    except Exception as e:
+        logger.warning(f"Local extraction of {os.path.basename(path)} failed, using remote: {e}")
+        return None
+    # Nothing but section headings, e.g. a deck of pictures: the remote extractor can read them
+    if text is not None and not _HEADING_RE.sub("", text).strip():
+        return None
+    return text
+
+class LocalExtractor:
+    def __init__(self, max_workers: int = 2, timeout: float = 60.0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        # Metrics
+        self._stats = {"extracted": 0, "fallbacks": 0, "timeouts": 0, "seconds_total": 0.0}
+
+    @staticmethod
+    def supports(path: str) -> bool:
+        return os.path.splitext(path)[1].lower() in _EXTRACTORS
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned workers do not inherit the server's threads, locks or sockets
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=settings.LOCAL_EXTRACT_TASKS_PER_WORKER,
+            )
+        return self._pool
+
+    async def extract(self, path: str) -> Optional[str]:
+        """Extract in the process pool; None means the remote extractor is needed."""
+        if not self.supports(path):
+            return None
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            text = await asyncio.wait_for(loop.run_in_executor(self._executor(), extract_file, path), self.timeout)
+        except asyncio.TimeoutError:
+            # The worker finishes in the background; its result is dropped
+            self._stats["timeouts"] += 1
+            logger.warning(f"Local extraction of {os.path.basename(path)} timed out after {self.timeout}s")
+            text = None
+        except Exception as e:
+            logger.error(f"Local extraction worker failed for {os.path.basename(path)}: {e}")
+            text = None
+        self._stats["seconds_total"] += time.perf_counter() - started
+        self._stats["fallbacks" if text is None else "extracted"] += 1
+        return text
+
+    async def extract_cached(self, path: str, sha256: Optional[str]) -> Optional[str]:
+        """`extract` through the extraction cache, keyed by content hash."""
+        if not self.supports(path):
+            return None
+
+        async def extract() -> tuple:
+            return await self.extract(path), None
+
+        text, _ = await extraction_cache.get_or_extract(sha256, "local", LOCAL_EXTRACTOR_VERSION, extract)
+        return text
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        calls = self._stats["extracted"] + self._stats["fallbacks"]
+        return {
+            **self._stats,
+            "seconds_total": round(self._stats["seconds_total"], 3),
+            "seconds_avg": round(self._stats["seconds_total"] / calls, 3) if calls else 0.0,
+        }
+
+local_extractor = LocalExtractor(
+    max_workers=settings.LOCAL_EXTRACT_WORKERS,
+    timeout=settings.LOCAL_EXTRACT_TIMEOUT,
+)
@@ -0,0 +1,241 @@
+import asyncio
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.database import run_in_db
+from app.core.logger import logger
+from app.repositories import chat_repository
+from app.services.chat_cache import chat_history_cache
+
+class _WriteGroup:
+    """Rows enqueued together; they are always committed in the same transaction."""
+    __slots__ = ("chat_id", "messages", "future")
+
+    def __init__(self, chat_id: str, messages: List[tuple], future: asyncio.Future):
+        self.chat_id = chat_id
+        self.messages = messages
+        self.future = future
+
+class MessageWriter:
+    """
+    Write-behind queue for chat messages and title updates.
+
+    Writes are coalesced into multi-row INSERTs and flushed when `batch_size` rows
+    are queued or `flush_interval` seconds after the first queued write, whichever
+    comes first. Every enqueue returns a future that resolves once the rows are
+    committed (or fails with the database error), and stop() drains the queue.
+    """
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 0.05):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._groups: List[_WriteGroup] = []
+        self._titles = {}  # chat_id -> (title, [futures]); later updates replace earlier ones
+        self._pending_rows = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+
+        # Metrics
+        self._flushes = 0
+        self._rows_written = 0
+        self._titles_written = 0
+        self._failures = 0
+        self._last_error: Optional[str] = None
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def start(self):
+        self._ensure_started()
+
+    async def stop(self):
+        """Flush everything still queued and stop the background flusher."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        # Anything enqueued while the last flush was running
+        await self.flush()
+
+    def _new_future(self) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        # Failures are logged by the flusher; mark them retrieved for fire-and-forget callers
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return future
+
+    def _notify(self):
+        # Starts the flush window, or ends it early once the batch is full
+        self._wake.set()
+
+    def save_turn(self, chat_id: str, messages: List[dict]) -> asyncio.Future:
+        """
+        Queue messages that must commit together, e.g. a turn's user and assistant messages.
+        Each dict takes role, content and optionally id, model, thinking and created_at.
+        """
+        self._ensure_started()
+        rows = [
+            (
+                msg.get("id") or str(uuid.uuid4()),
+                chat_id,
+                msg["role"],
+                msg["content"],
+                msg.get("model"),
+                msg.get("thinking"),
+                msg.get("created_at") or datetime.now(),
+            )
+            for msg in messages
+        ]
+        future = self._new_future()
+        self._groups.append(_WriteGroup(chat_id, rows, future))
+        self._pending_rows += len(rows)
+        # Readers see the messages immediately, before they are flushed
+        chat_history_cache.append(chat_id, [
+            {
+                "id": row[0],
+                "role": row[2],
+                "content": row[3],
+                "model": row[4],
+                "thinking": row[5],
+                "created_at": str(row[6]),
+            }
+            for row in rows
+        ])
+        self._notify()
+        return future
+
+    def save_message(self, chat_id: str, role: str, content: str, model: str = None,
+                     thinking: str = None) -> asyncio.Future:
+        return self.save_turn(chat_id, [{"role": role, "content": content, "model": model, "thinking": thinking}])
+
+    def update_title(self, chat_id: str, title: str) -> asyncio.Future:
+        self._ensure_started()
+        future = self._new_future()
+        _, futures = self._titles.get(chat_id, (None, []))
+        futures.append(future)
+        self._titles[chat_id] = (title, futures)
+        self._notify()
+        return future
+
+    def has_pending(self, chat_id: str) -> bool:
+        return chat_id in self._titles or any(group.chat_id == chat_id for group in self._groups)
+
+    async def wait_for_chat(self, chat_id: str):
+        """Flush now if the chat has queued writes, so a following read sees them."""
+        if self.has_pending(chat_id):
+            await self.flush()
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            if not self._stopping and self._pending_rows < self.batch_size:
+                # Give concurrent turns a window to join this batch
+                try:
+                    await asyncio.wait_for(self._wait_for_full_batch(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            await self.flush()
+            if self._stopping:
+                return
+
+    async def _wait_for_full_batch(self):
+        while self._pending_rows < self.batch_size and not self._stopping:
+            self._wake.clear()
+            await self._wake.wait()
+
+    async def flush(self):
+        """Write everything queued so far. Failures are logged and set on the affected futures."""
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            groups, self._groups = self._groups, []
+            titles, self._titles = self._titles, {}
+            self._pending_rows = 0
+            if not groups and not titles:
+                return
+
+            messages = [row for group in groups for row in group.messages]
+            title_rows = [(title, chat_id) for chat_id, (title, _) in titles.items()]
+            try:
+                await run_in_db(chat_repository.write_batch, messages, title_rows)
+            except Exception as e:
+                logger.error(f"Batched write of {len(messages)} messages failed, retrying per turn: {e}")
+                await self._write_individually(groups, titles)
+            else:
+                self._record_success(len(messages), len(title_rows))
+                for group in groups:
+                    self._resolve(group.future)
+                for _, futures in titles.values():
+                    for future in futures:
+                        self._resolve(future)
+
+    async def _write_individually(self, groups: List[_WriteGroup], titles: dict):
+        """Isolate a bad row (e.g. a chat deleted meanwhile) so it cannot sink the whole batch."""
+        for group in groups:
+            try:
+                await run_in_db(chat_repository.write_batch, group.messages, [])
+                self._record_success(len(group.messages), 0)
+                self._resolve(group.future)
+            except Exception as e:
+                self._record_failure(e)
+                logger.error(f"Failed to persist {len(group.messages)} messages for chat {group.chat_id}: {e}")
+                # The cache already holds these messages; make the next read go to the database
+                chat_history_cache.invalidate(group.chat_id)
+                self._fail(group.future, e)
+
+        for chat_id, (title, futures) in titles.items():
+            try:
+                await run_in_db(chat_repository.write_batch, [], [(title, chat_id)])
+                self._record_success(0, 1)
+                for future in futures:
+                    self._resolve(future)
+            except Exception as e:
+                self._record_failure(e)
+                logger.error(f"Failed to update title for chat {chat_id}: {e}")
+                for future in futures:
+                    self._fail(future, e)
+
+    def _record_success(self, rows: int, titles: int):
+        self._flushes += 1
+        self._rows_written += rows
+        self._titles_written += titles
+
+    def _record_failure(self, error: Exception):
+        self._failures += 1
+        self._last_error = str(error)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future):
+        if not future.done():
+            future.set_result(None)
+
+    @staticmethod
+    def _fail(future: asyncio.Future, error: Exception):
+        if not future.done():
+            future.set_exception(error)
+
+    def stats(self) -> dict:
+        return {
+            "pending_rows": self._pending_rows,
+            "pending_titles": len(self._titles),
+            "flushes": self._flushes,
+            "rows_written": self._rows_written,
+            "titles_written": self._titles_written,
+            "failures": self._failures,
+            "last_error": self._last_error,
+        }
+
+message_writer = MessageWriter(
+    batch_size=settings.MESSAGE_WRITE_BATCH_SIZE,
+    flush_interval=settings.MESSAGE_WRITE_FLUSH_INTERVAL,
+)
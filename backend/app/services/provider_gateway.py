@@ -0,0 +1,278 @@
+"""
+Resilience layer in front of the LLM provider clients.
+
+Every Kimi/DeepSeek call goes through a ProviderGateway, which bounds the
+number of concurrent calls per provider, retries rate-limit, server and
+connection errors with jittered exponential backoff (honouring Retry-After),
+and trips a circuit breaker after repeated provider failures so callers fail
+fast and can switch to the other model instead of queueing behind a brownout.
+"""
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+import openai
+
+from app.core.config import settings
+from app.core.logger import logger
+
+T = TypeVar("T")
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+class ProviderBusyError(Exception):
+    """Raised when no concurrency slot frees up within the queue timeout."""
+
+def is_retryable(error: Exception) -> bool:
+    """Transient provider-side failures: rate limits, 5xx, timeouts and connection errors."""
+    if isinstance(error, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds requested by the provider via Retry-After / retry-after-ms, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except Exception:
+        return None
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. After `reset_timeout`
+    seconds one trial call is let through (half-open): success closes the
+    circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    @property
+    def admitting(self) -> bool:
+        """Whether allow() would let a call through now; False while the half-open trial is in flight."""
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self._trial_in_flight)
+
+    def allow(self) -> bool:
+        if not self.admitting:
+            return False
+        if self.state == "half_open":
+            self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._trial_in_flight or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    def release_trial(self):
+        """A trial call ended without telling us anything about provider health."""
+        self._trial_in_flight = False
+
+class ProviderGateway:
+    def __init__(self, name: str, max_concurrency: int = 16, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0, queue_timeout: float = 10.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+
+        # Metrics, per endpoint
+        self._stats: Dict[str, dict] = {}
+
+    @property
+    def available(self) -> bool:
+        """False while calls would be rejected: callers should route to the alternate model."""
+        return self.breaker.admitting
+
+    def _endpoint_stats(self, endpoint: str) -> dict:
+        if endpoint not in self._stats:
+            self._stats[endpoint] = {
+                "calls": 0, "errors": 0, "retries": 0, "rejected": 0,
+                "latency_total": 0.0, "latency_max": 0.0,
+            }
+        return self._stats[endpoint]
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        requested = retry_after(error)
+        if requested is not None:
+            return min(requested, self.backoff_max)
+        # Full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _admit(self, endpoint: str):
+        if not self.breaker.allow():
+            self._endpoint_stats(endpoint)["rejected"] += 1
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+    async def _acquire(self, endpoint: str):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.breaker.release_trial()
+            self._endpoint_stats(endpoint)["rejected"] += 1
+            raise ProviderBusyError(f"{self.name} has {self.max_concurrency} calls in flight")
+        except asyncio.CancelledError:
+            self.breaker.release_trial()
+            raise
+        self._in_flight += 1
+
+    def _release(self):
+        self._in_flight -= 1
+        self._slots.release()
+
+    def _record(self, endpoint: str, started: float, error: Optional[Exception] = None):
+        stats = self._endpoint_stats(endpoint)
+        elapsed = time.perf_counter() - started
+        stats["calls"] += 1
+        stats["latency_total"] += elapsed
+        stats["latency_max"] = max(stats["latency_max"], elapsed)
+        if error is None:
+            self.breaker.record_success()
+            return
+        stats["errors"] += 1
+        if is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            # Bad requests say nothing about provider health
+            self.breaker.release_trial()
+
+    async def _wait_before_retry(self, endpoint: str, attempt: int, error: Exception) -> bool:
+        if attempt >= self.max_retries or not is_retryable(error):
+            return False
+        delay = self._backoff(attempt, error)
+        self._endpoint_stats(endpoint)["retries"] += 1
+        logger.warning(f"{self.name} {endpoint} failed ({error}); retry {attempt + 1} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+        return True
+
+    async def call(self, endpoint: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Run one request (`func` builds a fresh awaitable per attempt) with retries."""
+        self._admit(endpoint)
+        await self._acquire(endpoint)
+        started = time.perf_counter()
+        try:
+            attempt = 0
+            while True:
+                try:
+                    result = await func()
+                except Exception as e:
+                    if await self._wait_before_retry(endpoint, attempt, e):
+                        attempt += 1
+                        continue
+                    self._record(endpoint, started, e)
+                    raise
+                self._record(endpoint, started)
+                return result
+        except asyncio.CancelledError:
+            self.breaker.release_trial()
+            raise
+        finally:
+            self._release()
+
+    async def stream(self, endpoint: str, func: Callable[[], Awaitable[AsyncIterator]]) -> AsyncIterator:
+        """
+        Open a stream and yield its items. Retries happen only before the first
+        item; once output has reached the caller a failure is raised as-is.
+        The concurrency slot is held until the stream ends or is closed.
+        """
+        self._admit(endpoint)
+        await self._acquire(endpoint)
+        started = time.perf_counter()
+        finished = False
+        try:
+            attempt = 0
+            while True:
+                received = False
+                try:
+                    async for item in await func():
+                        received = True
+                        yield item
+                except Exception as e:
+                    if not received and await self._wait_before_retry(endpoint, attempt, e):
+                        attempt += 1
+                        continue
+                    finished = True
+                    self._record(endpoint, started, e)
+                    raise
+                finished = True
+                self._record(endpoint, started)
+                return
+        finally:
+            if not finished:
+                # Consumer stopped early or was cancelled
+                self.breaker.release_trial()
+            self._release()
+
+    def stats(self) -> dict:
+        endpoints = {}
+        for endpoint, values in self._stats.items():
+            endpoints[endpoint] = {
+                **values,
+                "latency_total": round(values["latency_total"], 3),
+                "latency_max": round(values["latency_max"], 3),
+                "latency_avg": round(values["latency_total"] / values["calls"], 3) if values["calls"] else 0.0,
+            }
+        return {
+            "circuit": self.breaker.state,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "endpoints": endpoints,
+        }
+
+def _gateway(name: str, max_concurrency: int) -> ProviderGateway:
+    return ProviderGateway(
+        name,
+        max_concurrency=max_concurrency,
+        max_retries=settings.PROVIDER_MAX_RETRIES,
+        backoff_base=settings.PROVIDER_BACKOFF_BASE,
+        backoff_max=settings.PROVIDER_BACKOFF_MAX,
+        queue_timeout=settings.PROVIDER_QUEUE_TIMEOUT,
+        failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout=settings.CIRCUIT_RESET_TIMEOUT,
+    )
+
+kimi_gateway = _gateway("kimi", settings.KIMI_MAX_CONCURRENCY)
+deepseek_gateway = _gateway("deepseek", settings.DEEPSEEK_MAX_CONCURRENCY)
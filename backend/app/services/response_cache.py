@@ -0,0 +1,173 @@
+"""
+Semantic cache of complete assistant answers.
+
+Answers to first-turn questions (no history, no attached file) are stored
+with the embedding of the question. A later question from the same user
+whose embedding is close enough is answered by replaying the stored events
+instead of calling an LLM. A user's entries are dropped whenever their
+knowledge base changes, since retrieval would now produce a different context.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+
+def _events_size(events: List[dict]) -> int:
+    return sum(64 + len(event.get("content", "").encode("utf-8")) for event in events)
+
+class _Entry:
+    __slots__ = ("user_id", "query", "embedding", "events", "size", "expires_at")
+
+    def __init__(self, user_id: str, query: str, embedding, events: List[dict], ttl: float):
+        self.user_id = user_id
+        self.query = query
+        self.embedding = embedding
+        self.events = events
+        self.size = _events_size(events) + embedding.nbytes + len(query.encode("utf-8"))
+        self.expires_at = time.monotonic() + ttl
+
+class CacheLookup:
+    """Result of a lookup: the query embedding (reused by put) and the cached events on a hit."""
+    __slots__ = ("embedding", "events", "version", "similarity")
+
+    def __init__(self, embedding, events: Optional[List[dict]], version: tuple, similarity: float = 0.0):
+        self.embedding = embedding
+        self.events = events
+        self.version = version
+        self.similarity = similarity
+
+class ResponseCache:
+    def __init__(self, threshold: float = 0.92, ttl: float = 86400, max_entries: int = 2000,
+                 max_bytes: int = 32 * 1024 * 1024, enabled: bool = True):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_user: Dict[str, set] = {}
+        # Bumped on invalidation so answers generated against an old knowledge base are not stored
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0
+        self._ids = itertools.count()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _version(self, user_key: str) -> tuple:
+        return self._epoch, self._versions.get(user_key, 0)
+
+    @staticmethod
+    def _embed(text: str):
+        # Local import to avoid circular dependency; reuses the knowledge base's MiniLM model
+        from app.services.knowledge_service import knowledge_service
+        vector = np.asarray(knowledge_service.embed([text])[0], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    async def lookup(self, user_id: Optional[str], query: str) -> Optional[CacheLookup]:
+        """Embed `query` and find the most similar live answer for this user. None if embedding fails."""
+        user_key = user_id or ""
+        version = self._version(user_key)
+        try:
+            loop = asyncio.get_running_loop()
+            embedding = await loop.run_in_executor(None, self._embed, query)
+        except Exception as e:
+            logger.warning(f"Response cache embedding failed: {e}")
+            return None
+
+        with self._lock:
+            best_id, best_similarity = None, -1.0
+            now = time.monotonic()
+            for entry_id in list(self._by_user.get(user_key, ())):
+                entry = self._entries[entry_id]
+                if entry.expires_at <= now:
+                    self._remove(entry_id)
+                    continue
+                similarity = float(entry.embedding @ embedding)
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is not None and best_similarity >= self.threshold:
+                self._entries.move_to_end(best_id)
+                self._hits += 1
+                return CacheLookup(embedding, list(self._entries[best_id].events), version, best_similarity)
+            self._misses += 1
+            return CacheLookup(embedding, None, version, max(best_similarity, 0.0))
+
+    def put(self, user_id: Optional[str], query: str, lookup: CacheLookup, events: List[dict]):
+        """Store a completed answer, unless the user's knowledge base changed since the lookup."""
+        user_key = user_id or ""
+        with self._lock:
+            if self._version(user_key) != lookup.version:
+                return
+            entry_id = next(self._ids)
+            entry = _Entry(user_key, query, lookup.embedding, events, self.ttl)
+            self._entries[entry_id] = entry
+            self._by_user.setdefault(user_key, set()).add(entry_id)
+            self._bytes += entry.size
+            self._stores += 1
+            self._evict()
+
+    def invalidate_user(self, user_id: Optional[str]):
+        """Drop a user's answers. None drops everything (unscoped retrieval may have used any document)."""
+        with self._lock:
+            self._invalidations += 1
+            if user_id is None:
+                self._epoch += 1
+                for entry_id in list(self._entries):
+                    self._remove(entry_id)
+                return
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            for entry_id in list(self._by_user.get(user_id, ())):
+                self._remove(entry_id)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        ids = self._by_user.get(entry.user_id)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del self._by_user[entry.user_id]
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+response_cache = ResponseCache(
+    threshold=settings.RESPONSE_CACHE_THRESHOLD,
+    ttl=settings.RESPONSE_CACHE_TTL,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+)
@@ -0,0 +1,117 @@
+"""
+Speculative generation: start the likely (non-reasoning) answer stream before
+the intent verdict is in, buffer its chunks, and either release them to the
+client or cancel the stream once the verdict arrives.
+"""
+import asyncio
+import threading
+import time
+from typing import AsyncIterator, Optional
+
+_DONE = object()
+
+class SpeculativeStream:
+    """
+    Consumes an async iterator in a background task, buffering chunks until drained or cancelled.
+    With `stats`, the stream is counted as released or cancelled, whichever happens first.
+    """
+
+    def __init__(self, source: AsyncIterator[str], stats: Optional["SpeculationStats"] = None):
+        self.started_at = time.perf_counter()
+        self.first_chunk_at: Optional[float] = None
+        self.chunks = 0
+        self._stats = stats
+        self._settled = False
+        if stats is not None:
+            stats.record_started()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[str]):
+        try:
+            async for chunk in source:
+                if self.first_chunk_at is None:
+                    self.first_chunk_at = time.perf_counter()
+                self.chunks += 1
+                self._queue.put_nowait(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Re-raised to the consumer in drain()
+            self._queue.put_nowait(e)
+        finally:
+            self._queue.put_nowait(_DONE)
+
+    async def drain(self):
+        """Yield buffered chunks, then the rest of the stream as it arrives."""
+        while True:
+            item = await self._queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def release(self, verdict_at: float):
+        """The verdict kept the speculation: its chunks will be drained to the client."""
+        if self._stats is not None and not self._settled:
+            self._stats.record_released(self, verdict_at)
+        self._settled = True
+
+    async def cancel(self):
+        # Also called after a released stream is drained; only an unreleased one counts as cancelled
+        if self._stats is not None and not self._settled:
+            self._stats.record_cancelled(self)
+        self._settled = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+class SpeculationStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = 0
+        self._released = 0
+        self._cancelled = 0
+        self._chunks_saved = 0  # already buffered when the speculation was released
+        self._chunks_wasted = 0  # generated by cancelled speculations
+        self._ttft_saved = 0.0
+
+    def record_released(self, stream: SpeculativeStream, verdict_at: float):
+        """
+        Without speculation the stream would have started at the verdict. With it,
+        the provider's time to first chunk was already running, so the head start is
+        the time from the speculation's start to the verdict, or to the first chunk
+        if that came sooner. A chunk usually has not arrived yet at release time.
+        """
+        ready_at = verdict_at if stream.first_chunk_at is None else min(verdict_at, stream.first_chunk_at)
+        saved = max(ready_at - stream.started_at, 0.0)
+        with self._lock:
+            self._released += 1
+            self._chunks_saved += stream.chunks
+            self._ttft_saved += saved
+
+    def record_started(self):
+        with self._lock:
+            self._started += 1
+
+    def record_cancelled(self, stream: SpeculativeStream):
+        with self._lock:
+            self._cancelled += 1
+            self._chunks_wasted += stream.chunks
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "started": self._started,
+                "released": self._released,
+                "cancelled": self._cancelled,
+                "chunks_saved": self._chunks_saved,
+                "chunks_wasted": self._chunks_wasted,
+                "ttft_saved_ms_total": round(self._ttft_saved * 1000, 1),
+                "ttft_saved_ms_avg": round(self._ttft_saved * 1000 / self._released, 1) if self._released else 0.0,
+            }
+
+speculation_stats = SpeculationStats()
@@ -0,0 +1,207 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Set
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.ai_service import ai_service
+from app.services.message_writer import message_writer
+
+Notify = Callable[[dict], Awaitable]
+
+class _TitleJob:
+    __slots__ = ("chat_id", "content", "answer", "first_turn", "notify")
+
+    def __init__(self, chat_id: str, content: str, answer: str, first_turn: bool, notify: Optional[Notify]):
+        self.chat_id = chat_id
+        self.content = content
+        self.answer = answer
+        self.first_turn = first_turn
+        self.notify = notify
+
+class _RateLimiter:
+    """Token bucket shared by all title generations."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> float:
+        """Wait for a token; returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return waited
+            delay = (1 - self._tokens) / self.rate
+            waited += delay
+            await asyncio.sleep(delay)
+
+class TitleWorker:
+    """
+    Generates chat titles in the background, off the websocket turn.
+
+    Requests are coalesced per chat (the latest turn wins) and a title is only
+    generated for a chat's first turn or when the new turn has drifted away from
+    the topic the current title was generated for. Generation is rate-limited
+    globally; results are persisted through the message writer and pushed to
+    the requester's `notify` callback as a chat_info event.
+    """
+
+    def __init__(self, rate: float = 2.0, burst: int = 5, concurrency: int = 2,
+                 drift_threshold: float = 0.5, max_topics: int = 10000):
+        self.drift_threshold = drift_threshold
+        self.max_topics = max_topics
+        self.concurrency = concurrency
+        self._limiter = _RateLimiter(rate, burst)
+        self._jobs: "OrderedDict[str, _TitleJob]" = OrderedDict()
+        # chat_id -> embedding of the turn the current title describes
+        self._topics: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._in_flight: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self._stats = {
+            "requested": 0, "coalesced": 0, "generated": 0,
+            "skipped_no_drift": 0, "failures": 0, "rate_limit_wait_seconds": 0.0,
+        }
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def start(self):
+        self._ensure_started()
+
+    async def stop(self):
+        """Drop queued requests and cancel generations in progress; titles are best effort."""
+        if self._task is None:
+            return
+        self._jobs.clear()
+        for task in [self._task, *self._tasks]:
+            task.cancel()
+        await asyncio.gather(self._task, *self._tasks, return_exceptions=True)
+        self._task = None
+
+    def request(self, chat_id: str, content: str, answer: str = "", first_turn: bool = False,
+                notify: Optional[Notify] = None):
+        """Queue a title check for a finished turn. Never blocks."""
+        self._ensure_started()
+        self._stats["requested"] += 1
+        previous = self._jobs.pop(chat_id, None)
+        if previous is not None:
+            self._stats["coalesced"] += 1
+            first_turn = first_turn or previous.first_turn
+        self._jobs[chat_id] = _TitleJob(chat_id, content, answer, first_turn, notify)
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while True:
+                # One generation per chat at a time; a newer request waits for the running one
+                chat_id = next((c for c in self._jobs if c not in self._in_flight), None)
+                if chat_id is None:
+                    break
+                await self._slots.acquire()
+                job = self._jobs.pop(chat_id, None)
+                if job is None:
+                    self._slots.release()
+                    continue
+                self._in_flight.add(chat_id)
+                task = asyncio.get_running_loop().create_task(self._process(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, job: _TitleJob):
+        try:
+            embedding = await self._embed(ai_service._clean_user_content(job.content))
+            if not job.first_turn and not self._drifted(job.chat_id, embedding):
+                self._stats["skipped_no_drift"] += 1
+                return
+
+            self._stats["rate_limit_wait_seconds"] += await self._limiter.acquire()
+            title = await ai_service.generate_title(job.content, job.answer)
+            if embedding is not None:
+                self._remember_topic(job.chat_id, embedding)
+            if not title or title == "新对话":
+                logger.warning(f"Generated title was empty or default: {title}")
+                return
+
+            self._stats["generated"] += 1
+            logger.info(f"Updating chat {job.chat_id} title to: {title}")
+            message_writer.update_title(job.chat_id, title)
+            if job.notify is not None:
+                await job.notify({"type": "chat_info", "chat_id": job.chat_id, "title": title})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._stats["failures"] += 1
+            logger.error(f"Failed to update title for chat {job.chat_id}: {e}")
+        finally:
+            self._in_flight.discard(job.chat_id)
+            self._slots.release()
+            if job.chat_id in self._jobs:
+                self._wake.set()
+
+    def _drifted(self, chat_id: str, embedding: Optional[np.ndarray]) -> bool:
+        if embedding is None:
+            return False
+        topic = self._topics.get(chat_id)
+        if topic is None:
+            # Title predates this process: adopt the current turn as its topic
+            self._remember_topic(chat_id, embedding)
+            return False
+        self._topics.move_to_end(chat_id)
+        return float(topic @ embedding) < self.drift_threshold
+
+    def _remember_topic(self, chat_id: str, embedding: np.ndarray):
+        self._topics[chat_id] = embedding
+        self._topics.move_to_end(chat_id)
+        while len(self._topics) > self.max_topics:
+            self._topics.popitem(last=False)
+
+    @staticmethod
+    async def _embed(text: str) -> Optional[np.ndarray]:
+        if not text:
+            return None
+        try:
+            # Local import to avoid circular dependency; reuses the knowledge base's MiniLM model
+            from app.services.knowledge_service import knowledge_service
+            loop = asyncio.get_running_loop()
+            vectors = await loop.run_in_executor(None, knowledge_service.embed, [text])
+        except Exception as e:
+            logger.warning(f"Title topic embedding failed: {e}")
+            return None
+        vector = np.asarray(vectors[0], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "rate_limit_wait_seconds": round(self._stats["rate_limit_wait_seconds"], 3),
+            "queued": len(self._jobs),
+            "in_flight": len(self._in_flight),
+            "tracked_topics": len(self._topics),
+        }
+
+title_worker = TitleWorker(
+    rate=settings.TITLE_RATE_LIMIT,
+    burst=settings.TITLE_RATE_BURST,
+    concurrency=settings.TITLE_CONCURRENCY,
+    drift_threshold=settings.TITLE_DRIFT_THRESHOLD,
+)
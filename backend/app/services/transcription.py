@@ -0,0 +1,250 @@
+"""
+Segmented batch transcription of uploaded audio.
+
+A recording is split at silences into segments of ASR_SEGMENT_MIN_SECONDS to
+ASR_SEGMENT_MAX_SECONDS. Segments that contain only silence are skipped. The
+rest are transcribed concurrently by a pluggable `Recognizer`, at most
+ASR_MAX_CONCURRENCY at a time across all uploads, and stitched back in order
+with their start times. A progress callback is invoked as each segment
+finishes. The recognizer is the only part that talks to a provider, so a
+local stand-in can replace DashScope.
+"""
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.audio_normalize import FRAME_BYTES, TARGET_RATE, iter_frames, normalize_file
+
+try:
+    from dashscope.audio.asr import Recognition, RecognitionCallback, RecognitionResult
+except ImportError:
+    Recognition = None
+    RecognitionCallback = object
+
+SAMPLE_WIDTH = 2  # 16-bit PCM
+_ANALYSIS_MS = 30  # window for silence detection
+
+class TranscriptionError(Exception):
+    pass
+
+class Recognizer(ABC):
+    """Transcribes one segment of 16-bit mono PCM. Called from worker threads, possibly concurrently."""
+    name = "recognizer"
+
+    @abstractmethod
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        ...
+
+class DashScopeRecognizer(Recognizer):
+    name = "dashscope"
+
+    def __init__(self, model: str, frame_bytes: int = FRAME_BYTES, frame_interval: float = 0.005):
+        self.model = model
+        self.frame_bytes = frame_bytes
+        self.frame_interval = frame_interval
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        if Recognition is None:
+            raise TranscriptionError("dashscope is not installed")
+        sentences, errors = [], []
+
+        class Callback(RecognitionCallback):
+            def on_event(self, result: RecognitionResult) -> None:
+                sentence = result.get_sentence()
+                if 'text' in sentence and result.is_sentence_end(sentence):
+                    sentences.append(sentence['text'])
+
+            def on_complete(self) -> None:
+                pass
+
+            def on_error(self, result: RecognitionResult) -> None:
+                errors.append(result)
+
+        recognition = Recognition(model=self.model, format='pcm', sample_rate=sample_rate, callback=Callback())
+        recognition.start()
+        try:
+            for frame in iter_frames(pcm, self.frame_bytes):
+                recognition.send_audio_frame(frame)
+                time.sleep(self.frame_interval)
+        finally:
+            recognition.stop()
+        if errors and not sentences:
+            raise TranscriptionError(f"ASR error: {errors[0]}")
+        return "".join(sentences)
+
+class Segment:
+    __slots__ = ("index", "start", "end", "text", "error")
+
+    def __init__(self, index: int, start: float, end: float):
+        self.index = index
+        self.start = start  # seconds
+        self.end = end
+        self.text = ""
+        self.error: Optional[str] = None
+
+class Transcript:
+    __slots__ = ("segments", "duration")
+
+    def __init__(self, segments: List[Segment], duration: float):
+        self.segments = segments
+        self.duration = duration
+
+    @property
+    def text(self) -> str:
+        """Segment texts in order, each prefixed with its start time."""
+        return "\n".join(
+            f"[{format_timestamp(segment.start)}] {segment.text}" for segment in self.segments if segment.text
+        )
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for segment in self.segments if segment.error)
+
+def format_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+def split_on_silence(pcm: bytes, sample_rate: int, min_seconds: float, max_seconds: float,
+                     min_silence_ms: int = 300) -> List[tuple]:
+    """
+    (start_sample, end_sample) spans of speech. A span is closed at the middle of the
+    first long-enough silence after `min_seconds`, or at the quietest window before
+    `max_seconds`. Spans with no window above the silence threshold are dropped.
+    """
+    samples = np.frombuffer(pcm[:len(pcm) - len(pcm) % SAMPLE_WIDTH], dtype="<i2")
+    window = max(sample_rate * _ANALYSIS_MS // 1000, 1)
+    count = len(samples) // window
+    if count == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    frames = samples[:count * window].astype(np.float32).reshape(count, window)
+    level = 20 * np.log10(np.sqrt(np.mean(frames ** 2, axis=1)) / 32768 + 1e-9)
+    # Silence is anything within 10 dB of the noise floor, and always below -50 dBFS
+    threshold = max(float(np.percentile(level, 10)) + 10, -50.0)
+    silent = level < threshold
+
+    min_windows = max(int(min_seconds * 1000 / _ANALYSIS_MS), 1)
+    max_windows = max(int(max_seconds * 1000 / _ANALYSIS_MS), min_windows + 1)
+    gap_windows = max(min_silence_ms // _ANALYSIS_MS, 1)
+
+    cuts, start, run = [], 0, 0
+    for i in range(count):
+        run = run + 1 if silent[i] else 0
+        length = i + 1 - start
+        if run >= gap_windows and length >= min_windows:
+            cut = i + 1 - run // 2
+        elif length >= max_windows:
+            # No pause long enough: cut at the quietest window in the second half
+            half = start + length // 2
+            cut = half + int(np.argmin(level[half:i + 1])) + 1
+        else:
+            continue
+        cuts.append((start, cut))
+        start, run = cut, 0
+    if start < count:
+        cuts.append((start, count))
+
+    spans = []
+    for first, last in cuts:
+        if silent[first:last].all():
+            continue
+        end = last * window if last < count else len(samples)
+        spans.append((first * window, end))
+    return spans
+
+ProgressCallback = Callable[[int, int, Segment], Awaitable[None]]
+
+class SegmentedTranscriber:
+    def __init__(self, recognizer: Recognizer, max_concurrency: int = 4, min_seconds: float = 20.0,
+                 max_seconds: float = 60.0, min_silence_ms: int = 300, retries: int = 1):
+        self.recognizer = recognizer
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.min_silence_ms = min_silence_ms
+        self.retries = retries
+        # One pool for every upload bounds calls to the provider
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="asr")
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._stats = {"files": 0, "segments": 0, "failed_segments": 0, "audio_seconds": 0.0, "wall_seconds": 0.0}
+
+    def _transcribe_segment(self, pcm: bytes, sample_rate: int, segment: Segment):
+        for attempt in range(self.retries + 1):
+            try:
+                segment.text = self.recognizer.transcribe(pcm, sample_rate).strip()
+                segment.error = None
+                return
+            except Exception as e:
+                segment.error = str(e)
+                logger.warning(f"ASR segment {segment.index} attempt {attempt + 1} failed: {e}")
+
+    async def transcribe(self, pcm: bytes, sample_rate: int,
+                         on_progress: Optional[ProgressCallback] = None) -> Transcript:
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        spans = await loop.run_in_executor(
+            None, split_on_silence, pcm, sample_rate, self.min_seconds, self.max_seconds, self.min_silence_ms
+        )
+        segments = [Segment(i, first / sample_rate, end / sample_rate) for i, (first, end) in enumerate(spans)]
+        duration = len(pcm) / SAMPLE_WIDTH / sample_rate
+        logger.info(f"Transcribing {duration:.1f}s of audio in {len(segments)} segments")
+
+        done = 0
+
+        async def run(segment: Segment, first: int, end: int):
+            nonlocal done
+            data = pcm[first * SAMPLE_WIDTH:end * SAMPLE_WIDTH]
+            await loop.run_in_executor(self._executor, self._transcribe_segment, data, sample_rate, segment)
+            done += 1
+            if on_progress:
+                try:
+                    await on_progress(done, len(segments), segment)
+                except Exception as e:
+                    logger.warning(f"ASR progress callback failed: {e}")
+
+        await asyncio.gather(*(run(segment, *span) for segment, span in zip(segments, spans)))
+
+        transcript = Transcript(segments, duration)
+        if segments and transcript.failed == len(segments):
+            raise TranscriptionError(f"All {len(segments)} segments failed: {segments[0].error}")
+        with self._lock:
+            self._stats["files"] += 1
+            self._stats["segments"] += len(segments)
+            self._stats["failed_segments"] += transcript.failed
+            self._stats["audio_seconds"] += duration
+            self._stats["wall_seconds"] += time.perf_counter() - started
+        return transcript
+
+    async def transcribe_file(self, file_path: str, on_progress: Optional[ProgressCallback] = None) -> Transcript:
+        loop = asyncio.get_running_loop()
+        # WAV of any rate and channel count (or another container, via ffmpeg) -> 16 kHz mono PCM
+        pcm = await loop.run_in_executor(None, normalize_file, file_path)
+        return await self.transcribe(pcm, TARGET_RATE, on_progress)
+
+    def stats(self) -> dict:
+        with self._lock:
+            wall = self._stats["wall_seconds"]
+            return {
+                **self._stats,
+                "audio_seconds": round(self._stats["audio_seconds"], 1),
+                "wall_seconds": round(wall, 1),
+                # Seconds of audio per second of processing
+                "speed": round(self._stats["audio_seconds"] / wall, 1) if wall else 0.0,
+            }
+
+transcriber = SegmentedTranscriber(
+    DashScopeRecognizer(settings.ASR_MODEL),
+    max_concurrency=settings.ASR_MAX_CONCURRENCY,
+    min_seconds=settings.ASR_SEGMENT_MIN_SECONDS,
+    max_seconds=settings.ASR_SEGMENT_MAX_SECONDS,
+    min_silence_ms=settings.ASR_MIN_SILENCE_MS,
+)
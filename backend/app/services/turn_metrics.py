@@ -0,0 +1,52 @@
+"""
+Per-mode latency of chat turns, measured from the start of stream_chat.
+
+ttft is the time to the first answer chunk (llm_chunk); first_output also
+counts thinking chunks, i.e. the first moment the user sees model output.
+"""
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+class TurnMetrics:
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._lock = threading.Lock()
+        # mode -> metric -> recent samples in ms
+        self._samples: Dict[str, Dict[str, deque]] = {}
+        self._counts: Dict[str, int] = {}
+
+    def record(self, mode: str, ttft: Optional[float], first_output: Optional[float], total: float):
+        """Record one finished turn; times are seconds, None when the turn produced no such output."""
+        with self._lock:
+            samples = self._samples.setdefault(mode, {
+                "ttft": deque(maxlen=self.window),
+                "first_output": deque(maxlen=self.window),
+                "total": deque(maxlen=self.window),
+            })
+            self._counts[mode] = self._counts.get(mode, 0) + 1
+            for metric, value in (("ttft", ttft), ("first_output", first_output), ("total", total)):
+                if value is not None:
+                    samples[metric].append(value * 1000)
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {}
+            for mode, samples in self._samples.items():
+                result[mode] = {"turns": self._counts[mode]}
+                for metric, values in samples.items():
+                    values = list(values)
+                    result[mode][f"{metric}_ms"] = {
+                        "avg": round(sum(values) / len(values), 1) if values else 0.0,
+                        "p50": round(_percentile(values, 0.5), 1),
+                        "p95": round(_percentile(values, 0.95), 1),
+                    }
+            return result
+
+turn_metrics = TurnMetrics()
@@ -0,0 +1,37 @@
+-- Composite indexes for the hottest filter + sort paths.
+-- The trailing id column makes each index usable for (timestamp, id) keyset cursors,
+-- and InnoDB drops the implicit FK index on the leading column once these exist.
+-- MySQL has no CREATE INDEX IF NOT EXISTS, so each index is created through a prepared
+-- statement only when information_schema does not list it yet; the file is safe to re-run.
+
+-- chat_repository.get_chat_history: WHERE chat_id = ? ORDER BY created_at
+SET @ddl = IF((SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'messages' AND INDEX_NAME = 'idx_messages_chat_created') = 0,
+    'CREATE INDEX idx_messages_chat_created ON messages (chat_id, created_at, id)', 'DO 0');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- chat_repository.get_user_chats: WHERE user_id = ? AND created_at >= ? ORDER BY created_at DESC
+SET @ddl = IF((SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'chats' AND INDEX_NAME = 'idx_chats_user_created') = 0,
+    'CREATE INDEX idx_chats_user_created ON chats (user_id, created_at, id)', 'DO 0');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- knowledge_repository.list_items: WHERE user_id = ? ORDER BY upload_date DESC
+SET @ddl = IF((SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'knowledge_base' AND INDEX_NAME = 'idx_knowledge_user_upload') = 0,
+    'CREATE INDEX idx_knowledge_user_upload ON knowledge_base (user_id, upload_date, id)', 'DO 0');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- analysis_repository.get_latest_analysis: ORDER BY created_at DESC LIMIT 1
+SET @ddl = IF((SELECT COUNT(*) FROM information_schema.STATISTICS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'analysis_results' AND INDEX_NAME = 'idx_analysis_created') = 0,
+    'CREATE INDEX idx_analysis_created ON analysis_results (created_at)', 'DO 0');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
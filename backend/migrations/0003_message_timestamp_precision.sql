@@ -0,0 +1,5 @@
+-- Messages are now timestamped by the application when they are produced and written
+-- in batches, so a user message and its reply can land in the same second.
+-- Microsecond precision keeps ORDER BY created_at stable within a turn.
+
+ALTER TABLE messages MODIFY created_at DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6);
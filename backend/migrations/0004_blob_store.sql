@@ -0,0 +1,20 @@
+-- Content-addressed storage for uploaded files.
+-- Each distinct file is stored once under upload/blobs; ref_count is the number of
+-- knowledge items (or legacy upload paths hard-linked to the blob) that use it.
+
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 CHAR(64) PRIMARY KEY,
+    path VARCHAR(512) NOT NULL,
+    size BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- The blob a knowledge item's file is stored in; NULL for files not yet deduplicated.
+-- Added only if missing (MySQL has no ADD COLUMN IF NOT EXISTS), so a re-run is safe
+SET @ddl = IF((SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'knowledge_base' AND COLUMN_NAME = 'blob_sha256') = 0,
+    'ALTER TABLE knowledge_base ADD COLUMN blob_sha256 CHAR(64) NULL', 'DO 0');
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,130 @@
+"""
+Compare the bytes and latency of sending an image to the vision model with and
+without preprocessing.
+
+The old path read the file twice, uploaded it with files.create and sent the
+full-resolution bytes again inline as base64. The new path decodes once,
+downsizes, re-encodes, and sends one base64 payload. Transfer time is
+estimated from --uplink-mbps. No provider call is made.
+
+    python scripts/bench_image_preprocess.py photo.jpg screenshot.png
+    python scripts/bench_image_preprocess.py --uplink-mbps 20 --workers 4
+"""
+import argparse
+import asyncio
+import base64
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add the parent directory to sys.path to allow importing app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image
+
+from app.services.image_preprocess import prepare_image, preprocess_image
+
+def _generate_samples(directory: str) -> list:
+    """Photo-like, screenshot-like and transparent images at typical upload sizes."""
+    rng = np.random.default_rng(0)
+    samples = []
+
+    def photo(width, height):
+        y, x = np.mgrid[0:height, 0:width]
+        base = np.stack([x * 255 / width, y * 255 / height, (x + y) * 127 / (width + height)], axis=-1)
+        noise = rng.normal(0, 18, (height, width, 3))
+        return Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8))
+
+    path = os.path.join(directory, "photo_4032x3024.jpg")
+    photo(4032, 3024).save(path, quality=95)
+    samples.append(path)
+
+    path = os.path.join(directory, "scan_2480x3508.png")
+    photo(2480, 3508).convert("L").save(path)
+    samples.append(path)
+
+    screenshot = Image.new("RGB", (2560, 1440), "white")
+    pixels = np.array(screenshot)
+    for row in range(40, 1400, 36):
+        pixels[row:row + 14, 80:80 + int(rng.integers(600, 2300))] = rng.integers(0, 90, 3)
+    path = os.path.join(directory, "screenshot_2560x1440.png")
+    Image.fromarray(pixels).save(path)
+    samples.append(path)
+
+    path = os.path.join(directory, "icon_512x512.png")
+    icon = photo(512, 512).convert("RGBA")
+    icon.putalpha(Image.fromarray((rng.random((512, 512)) > 0.3).astype(np.uint8) * 255))
+    icon.save(path)
+    samples.append(path)
+    return samples
+
+def _old_path(file_path: str) -> tuple:
+    """Bytes sent and local time of the previous implementation."""
+    started = time.perf_counter()
+    with open(file_path, "rb") as f:
+        uploaded = f.read()
+    with open(file_path, "rb") as f:
+        inline = base64.b64encode(f.read())
+    return len(uploaded) + len(inline), time.perf_counter() - started
+
+def _new_path(file_path: str) -> tuple:
+    started = time.perf_counter()
+    image = prepare_image(file_path)
+    inline = base64.b64encode(image.data)
+    return len(inline), time.perf_counter() - started, image
+
+def _median(func, file_path: str, repeat: int):
+    runs = [func(file_path) for _ in range(repeat)]
+    middle = sorted(runs, key=lambda run: run[1])[len(runs) // 2]
+    return middle
+
+async def _pool_throughput(paths: list, copies: int) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(preprocess_image(path) for path in paths * copies))
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="image files (default: generated samples)")
+    parser.add_argument("--uplink-mbps", type=float, default=10.0, help="assumed upload bandwidth")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--copies", type=int, default=4, help="copies of each image for the pool throughput run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = args.images or _generate_samples(directory)
+        transfer = lambda size: size * 8 / (args.uplink_mbps * 1_000_000)
+
+        print(f"{'image':<28}{'file KB':>9}{'old sent KB':>13}{'new sent KB':>13}{'new size':>12}"
+              f"{'old ms':>9}{'new ms':>9}{'old total ms':>14}{'new total ms':>14}")
+        old_totals, new_totals, ratios = [], [], []
+        for path in paths:
+            old_bytes, old_seconds = _median(_old_path, path, args.repeat)
+            new_bytes, new_seconds, image = _median(_new_path, path, args.repeat)
+            old_total = old_seconds + transfer(old_bytes)
+            new_total = new_seconds + transfer(new_bytes)
+            old_totals.append(old_total)
+            new_totals.append(new_total)
+            ratios.append(new_bytes / old_bytes)
+            print(f"{os.path.basename(path)[:27]:<28}{os.path.getsize(path) / 1024:>9.0f}"
+                  f"{old_bytes / 1024:>13.0f}{new_bytes / 1024:>13.0f}{f'{image.width}x{image.height}':>12}"
+                  f"{old_seconds * 1000:>9.1f}{new_seconds * 1000:>9.1f}"
+                  f"{old_total * 1000:>14.0f}{new_total * 1000:>14.0f}")
+
+        print(f"\nBytes sent: new/old = {statistics.mean(ratios):.2f} on average")
+        print(f"Estimated latency at {args.uplink_mbps:g} Mbps: "
+              f"old {statistics.mean(old_totals) * 1000:.0f} ms, new {statistics.mean(new_totals) * 1000:.0f} ms per image")
+
+        sequential_started = time.perf_counter()
+        for path in paths * args.copies:
+            prepare_image(path)
+        sequential = time.perf_counter() - sequential_started
+        pooled = asyncio.run(_pool_throughput(paths, args.copies))
+        count = len(paths) * args.copies
+        print(f"Preprocessing {count} images: sequential {sequential:.2f}s, worker pool {pooled:.2f}s")
+
+if __name__ == "__main__":
+    main()
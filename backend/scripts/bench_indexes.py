@@ -0,0 +1,219 @@
+"""
+Benchmark the hot-path queries before and after the index migration.
+
+Creates a scratch database (never the application database), applies the
+baseline schema (0001) only, seeds users/chats/messages/knowledge items/analyses,
+times the hot queries, applies the index migration (0002) alone and times them
+again. The baseline is the schema production ran on, so it already has the
+indexes InnoDB creates for its foreign keys (messages.chat_id, chats.user_id,
+knowledge_base.user_id, analysis_results.user_id): the comparison measures what
+the composite indexes add over those. The indexes of each phase are listed.
+
+    python scripts/bench_indexes.py --messages 2000000
+"""
+import argparse
+import random
+import statistics
+import sys
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Add the parent directory to sys.path to allow importing app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pymysql
+from app.core.config import settings
+from app.core.database import get_db_connection
+from app.core.migrations import migrate
+
+BATCH_SIZE = 5000
+
+def _recreate_database(name: str):
+    conn = pymysql.connect(
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        charset='utf8mb4'
+    )
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS {name}")
+        cursor.execute(f"CREATE DATABASE {name} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    conn.commit()
+    conn.close()
+
+def _insert_batches(conn, sql: str, rows, label: str):
+    total = 0
+    batch = []
+    with conn.cursor() as cursor:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                cursor.executemany(sql, batch)
+                conn.commit()
+                total += len(batch)
+                batch = []
+                print(f"\r  {label}: {total}", end="", flush=True)
+        if batch:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+    print(f"\r  {label}: {total}")
+
+def seed(conn, n_users: int, n_chats: int, n_messages: int, n_items: int, n_analyses: int) -> dict:
+    rng = random.Random(42)
+    now = datetime.now()
+
+    def random_time(days: int = 60) -> datetime:
+        return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+    user_ids = [str(uuid.uuid4()) for _ in range(n_users)]
+    chat_ids = [str(uuid.uuid4()) for _ in range(n_chats)]
+    chat_owner = {chat_id: rng.choice(user_ids) for chat_id in chat_ids}
+
+    print("Seeding...")
+    _insert_batches(
+        conn,
+        "INSERT INTO users (id, username, password_hash) VALUES (%s, %s, %s)",
+        ((user_id, f"bench_user_{i}", "x") for i, user_id in enumerate(user_ids)),
+        "users"
+    )
+    _insert_batches(
+        conn,
+        "INSERT INTO chats (id, user_id, title, created_at) VALUES (%s, %s, %s, %s)",
+        ((chat_id, chat_owner[chat_id], "bench chat", random_time()) for chat_id in chat_ids),
+        "chats"
+    )
+    _insert_batches(
+        conn,
+        "INSERT INTO messages (id, chat_id, role, content, created_at) VALUES (%s, %s, %s, %s, %s)",
+        (
+            (str(uuid.uuid4()), rng.choice(chat_ids), "user" if i % 2 == 0 else "assistant",
+             "benchmark message content " * 4, random_time())
+            for i in range(n_messages)
+        ),
+        "messages"
+    )
+    _insert_batches(
+        conn,
+        "INSERT INTO knowledge_base (id, user_id, title, type, url, status, summary, upload_date) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+        (
+            (f"document-{uuid.uuid4()}", rng.choice(user_ids), "bench.pdf", "document", "#", "ready",
+             "summary", random_time())
+            for _ in range(n_items)
+        ),
+        "knowledge_base"
+    )
+    _insert_batches(
+        conn,
+        "INSERT INTO analysis_results (id, user_id, topic, structure, created_at) VALUES (%s, %s, %s, %s, %s)",
+        ((str(uuid.uuid4()), rng.choice(user_ids), "topic", "[]", random_time()) for _ in range(n_analyses)),
+        "analysis_results"
+    )
+
+    with conn.cursor() as cursor:
+        for table in ("users", "chats", "messages", "knowledge_base", "analysis_results"):
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+
+    return {"user_ids": user_ids, "chat_ids": chat_ids}
+
+QUERIES = {
+    "messages by chat": (
+        "SELECT role, content, created_at FROM messages WHERE chat_id = %s ORDER BY created_at ASC LIMIT 100",
+        "chat_ids"
+    ),
+    "recent chats by user": (
+        "SELECT id, title, created_at FROM chats WHERE user_id = %s "
+        "AND created_at >= NOW() - INTERVAL 3 DAY ORDER BY created_at DESC",
+        "user_ids"
+    ),
+    "knowledge by user": (
+        "SELECT id, title, upload_date FROM knowledge_base WHERE user_id = %s ORDER BY upload_date DESC",
+        "user_ids"
+    ),
+    "latest analysis": (
+        "SELECT topic, structure FROM analysis_results ORDER BY created_at DESC LIMIT 1",
+        None
+    ),
+}
+
+INDEX_MIGRATION = 2
+
+def list_indexes(conn):
+    with conn.cursor() as cursor:
+        for table in ("messages", "chats", "knowledge_base", "analysis_results"):
+            cursor.execute(f"SHOW INDEX FROM {table}")
+            columns = {}
+            for row in cursor.fetchall():
+                columns.setdefault(row["Key_name"], []).append(row["Column_name"])
+            print(f"  {table}: " + ", ".join(f"{name} ({', '.join(cols)})" for name, cols in columns.items()))
+
+def run_queries(conn, keys: dict, iterations: int) -> dict:
+    rng = random.Random(7)
+    results = {}
+    with conn.cursor() as cursor:
+        for name, (sql, key) in QUERIES.items():
+            samples = []
+            for _ in range(iterations):
+                params = (rng.choice(keys[key]),) if key else None
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                samples.append((time.perf_counter() - started) * 1000)
+            samples.sort()
+            results[name] = {
+                "p50": statistics.median(samples),
+                "p95": samples[int(len(samples) * 0.95) - 1],
+            }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=f"{settings.DB_NAME}_bench", help="Scratch database (dropped and recreated)")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--chats", type=int, default=200000)
+    parser.add_argument("--messages", type=int, default=2000000)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--analyses", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.db == settings.DB_NAME:
+        sys.exit("Refusing to benchmark against the application database")
+
+    _recreate_database(args.db)
+    conn = get_db_connection(args.db)
+    try:
+        migrate(conn, target=INDEX_MIGRATION - 1)
+        keys = seed(conn, args.users, args.chats, args.messages, args.items, args.analyses)
+
+        print("Baseline indexes:")
+        list_indexes(conn)
+        print("Timing queries on the baseline schema...")
+        before = run_queries(conn, keys, args.iterations)
+
+        # Only the index migration, so later schema changes do not skew the comparison
+        print("Applying the index migration...")
+        started = time.perf_counter()
+        migrate(conn, target=INDEX_MIGRATION)
+        print(f"  migration took {time.perf_counter() - started:.1f}s")
+
+        print("Indexes after the migration:")
+        list_indexes(conn)
+        print("Timing queries with the hot-path indexes...")
+        after = run_queries(conn, keys, args.iterations)
+    finally:
+        conn.close()
+
+    print()
+    print(f"{'query':<24}{'p50 before':>12}{'p50 after':>12}{'p95 before':>12}{'p95 after':>12}  (ms)")
+    for name in QUERIES:
+        b, a = before[name], after[name]
+        print(f"{name:<24}{b['p50']:>12.2f}{a['p50']:>12.2f}{b['p95']:>12.2f}{a['p95']:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare local document extraction with Kimi's file-extract endpoint.
+
+Each sample is parsed in-process, then through the extraction worker pool
+(the first pool call includes spawning the workers). With --remote, the same
+files are uploaded and extracted through Kimi as before; that needs
+MOONSHOT_API_KEY and uploads the files. The extraction cache is not used.
+
+    python scripts/bench_local_extract.py                  # samples in test-kimi2.5/
+    python scripts/bench_local_extract.py notes.pdf --remote
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import sys
+import time
+
+# Add the parent directory to sys.path to allow importing app
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from app.core.config import settings
+from app.services.local_extractors import LocalExtractor, extract_file
+
+SAMPLE_DIR = os.path.join(BACKEND_DIR, "test-kimi2.5")
+
+def _samples() -> list:
+    return sorted(
+        os.path.join(SAMPLE_DIR, name) for name in os.listdir(SAMPLE_DIR)
+        if LocalExtractor.supports(name)
+    )
+
+def _sections(text: str) -> int:
+    return len(re.findall(r"^#{1,6} ", text or "", flags=re.MULTILINE))
+
+async def _remote(path: str) -> tuple:
+    from app.services.ai_service import ai_service
+
+    started = time.perf_counter()
+    text, file_id = await ai_service.get_document_content(path)
+    elapsed = time.perf_counter() - started
+    if file_id:
+        try:
+            await ai_service.kimi_client.files.delete(file_id=file_id)
+        except Exception:
+            pass
+    return text, elapsed
+
+async def _run(paths: list, repeat: int, remote: bool):
+    extractor = LocalExtractor(max_workers=settings.LOCAL_EXTRACT_WORKERS, timeout=settings.LOCAL_EXTRACT_TIMEOUT)
+    print(f"{'file':<22}{'KB':>7}{'chars':>8}{'sections':>10}{'inline ms':>11}{'pool ms':>9}{'remote ms':>11}")
+    local_times, remote_times = [], []
+    try:
+        # Spawning the workers is paid once per server process
+        started = time.perf_counter()
+        await extractor.extract(paths[0])
+        cold = time.perf_counter() - started
+
+        for path in paths:
+            inline = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                text = extract_file(path)
+                inline.append(time.perf_counter() - started)
+            pooled = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                await extractor.extract(path)
+                pooled.append(time.perf_counter() - started)
+            local_times.append(statistics.median(pooled))
+
+            remote_ms = "-"
+            if remote and text is not None:
+                _, remote_seconds = await _remote(path)
+                remote_times.append(remote_seconds)
+                remote_ms = f"{remote_seconds * 1000:.0f}"
+
+            chars = "remote" if text is None else str(len(text))
+            print(f"{os.path.basename(path)[:21]:<22}{os.path.getsize(path) / 1024:>7.0f}{chars:>8}"
+                  f"{_sections(text):>10}{statistics.median(inline) * 1000:>11.1f}"
+                  f"{statistics.median(pooled) * 1000:>9.1f}{remote_ms:>11}")
+    finally:
+        extractor.shutdown()
+
+    print(f"\nPool start-up (first call): {cold * 1000:.0f} ms")
+    print(f"Local extraction: {statistics.mean(local_times) * 1000:.1f} ms per file on average")
+    if remote_times:
+        print(f"Remote extraction: {statistics.mean(remote_times) * 1000:.0f} ms per file on average")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="documents (default: samples in test-kimi2.5/)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--remote", action="store_true", help="also time Kimi file-extract (uploads the files)")
+    args = parser.parse_args()
+
+    if args.remote and not settings.MOONSHOT_API_KEY:
+        parser.error("--remote needs MOONSHOT_API_KEY")
+    paths = args.files or _samples()
+    if not paths:
+        parser.error("no supported files")
+    asyncio.run(_run(paths, args.repeat, args.remote))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Compare single-stream and segmented transcription using a local stand-in recognizer.
+
+The stand-in takes len(audio) / --service-speed seconds per call, which models a
+streaming ASR service that consumes audio that many times faster than real
+time. It returns a label for each segment instead of a transcript, so no
+provider is called. The old path streams the whole file through one
+recognizer. The new path splits it on silence and transcribes the segments
+through SegmentedTranscriber.
+
+    python scripts/bench_transcription.py                        # synthetic 10-minute lecture
+    python scripts/bench_transcription.py lecture.wav --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add the parent directory to sys.path to allow importing app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.audio_normalize import TARGET_RATE, normalize_file
+from app.services.transcription import Recognizer, SegmentedTranscriber, format_timestamp
+
+class StandInRecognizer(Recognizer):
+    name = "stand-in"
+
+    def __init__(self, service_speed: float):
+        self.service_speed = service_speed
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        seconds = len(pcm) / 2 / sample_rate
+        time.sleep(seconds / self.service_speed)
+        return f"<{seconds:.1f}s of audio>"
+
+def _synthetic_lecture(minutes: float, sample_rate: int = 16000) -> bytes:
+    """Bursts of voiced noise (1-8 s) separated by pauses (0.2-1.5 s) over a low noise floor."""
+    rng = np.random.default_rng(0)
+    parts, total = [], int(minutes * 60 * sample_rate)
+    length = 0
+    while length < total:
+        speech = int(rng.uniform(1, 8) * sample_rate)
+        t = np.arange(speech) / sample_rate
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+        voiced = np.sin(2 * np.pi * rng.uniform(100, 220) * t) * 6000 * envelope + rng.normal(0, 1500, speech)
+        pause = int(rng.uniform(0.2, 1.5) * sample_rate)
+        parts += [voiced, rng.normal(0, 60, pause)]
+        length += speech + pause
+    return np.clip(np.concatenate(parts)[:total], -32768, 32767).astype("<i2").tobytes()
+
+async def _run(pcm: bytes, sample_rate: int, args):
+    recognizer = StandInRecognizer(args.service_speed)
+    duration = len(pcm) / 2 / sample_rate
+
+    started = time.perf_counter()
+    await asyncio.get_running_loop().run_in_executor(None, recognizer.transcribe, pcm, sample_rate)
+    single = time.perf_counter() - started
+
+    transcriber = SegmentedTranscriber(
+        recognizer,
+        max_concurrency=args.concurrency,
+        min_seconds=settings.ASR_SEGMENT_MIN_SECONDS,
+        max_seconds=settings.ASR_SEGMENT_MAX_SECONDS,
+        min_silence_ms=settings.ASR_MIN_SILENCE_MS,
+    )
+
+    async def report(done: int, total: int, segment):
+        if args.verbose:
+            print(f"  {done}/{total} [{format_timestamp(segment.start)}-{format_timestamp(segment.end)}] {segment.text}")
+
+    started = time.perf_counter()
+    transcript = await transcriber.transcribe(pcm, sample_rate, on_progress=report)
+    segmented = time.perf_counter() - started
+
+    lengths = [segment.end - segment.start for segment in transcript.segments]
+    speech = sum(lengths)
+    print(f"Audio: {duration:.1f}s at {sample_rate} Hz; {len(lengths)} segments of "
+          f"{min(lengths):.1f}-{max(lengths):.1f}s, {duration - speech:.1f}s of silence skipped")
+    print(f"Single stream: {single:.2f}s ({duration / single:.0f}x real time)")
+    print(f"Segmented, {args.concurrency} concurrent: {segmented:.2f}s "
+          f"({duration / segmented:.0f}x real time, {single / segmented:.1f}x faster)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio", nargs="?", help="audio file (default: synthetic lecture)")
+    parser.add_argument("--minutes", type=float, default=10.0, help="length of the synthetic lecture")
+    parser.add_argument("--service-speed", type=float, default=20.0, help="stand-in speed, in multiples of real time")
+    parser.add_argument("--concurrency", type=int, default=settings.ASR_MAX_CONCURRENCY)
+    parser.add_argument("--verbose", action="store_true", help="print progress per segment")
+    args = parser.parse_args()
+
+    if args.audio:
+        pcm, sample_rate = normalize_file(args.audio), TARGET_RATE
+    else:
+        pcm, sample_rate = _synthetic_lecture(args.minutes), 16000
+    asyncio.run(_run(pcm, sample_rate, args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Move existing uploads into the content-addressed blob store.
+
+Every file under upload/{images,audios,videos,documents} is hashed. Files with
+the same content are hard-linked to one blob under upload/blobs, so each
+legacy path (and therefore every existing /static URL) keeps working while
+the data is stored once. The blobs table is recounted and knowledge_base rows
+are linked to their blobs, so deleting an item releases its reference. Run it
+while the server is stopped; it is safe to re-run.
+
+    python scripts/migrate.py            # 0004 creates the blobs table
+    python scripts/dedupe_uploads.py --dry-run
+    python scripts/dedupe_uploads.py
+"""
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+# Add the parent directory to sys.path to allow importing app
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from app.core.database import db_connection
+from app.repositories import blob_repository, knowledge_repository
+from app.services.blob_store import BLOB_DIR, UPLOAD_DIR, blob_path, hash_file
+
+LEGACY_DIRS = ["images", "audios", "videos", "documents"]
+
+def _legacy_files() -> list:
+    files = []
+    for name in LEGACY_DIRS:
+        directory = os.path.join(UPLOAD_DIR, name)
+        if not os.path.isdir(directory):
+            continue
+        for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+            if entry.is_file(follow_symlinks=False):
+                files.append(entry.path)
+    return files
+
+def _existing_blobs() -> dict:
+    """sha256 -> path of blobs already on disk."""
+    blobs = {}
+    for directory, _, filenames in os.walk(BLOB_DIR):
+        if os.path.basename(directory) == "tmp":
+            continue
+        for filename in filenames:
+            sha256 = os.path.splitext(filename)[0]
+            if len(sha256) == 64:
+                blobs[sha256] = os.path.join(directory, filename)
+    return blobs
+
+def _blob_item_counts() -> dict:
+    """sha256 -> number of items stored directly in a blob (uploaded after the blob store)."""
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT blob_sha256, COUNT(*) AS items FROM knowledge_base
+                WHERE blob_sha256 IS NOT NULL AND url LIKE '/static/blobs/%'
+                GROUP BY blob_sha256
+            """)
+            return {row['blob_sha256']: row['items'] for row in cursor.fetchall()}
+
+def _link_into_place(source: str, target: str):
+    """Atomically make `target` a hard link to `source`."""
+    tmp = f"{target}.dedupe-tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    os.link(source, tmp)
+    os.replace(tmp, target)
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate upload/ into the content-addressed blob store.")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be reclaimed without changing anything")
+    args = parser.parse_args()
+
+    # Paths are relative to the backend directory, as in the application
+    os.chdir(BACKEND_DIR)
+
+    groups = defaultdict(list)
+    files = _legacy_files()
+    for i, path in enumerate(files, 1):
+        groups[hash_file(path)].append(path)
+        print(f"\r  Hashed {i}/{len(files)} files", end="", flush=True)
+    print()
+
+    existing = _existing_blobs()
+    duplicate_files = sum(len(paths) - 1 for paths in groups.values())
+    reclaimable = 0
+    for sha256, paths in groups.items():
+        size = os.path.getsize(paths[0])
+        inodes = {os.stat(path).st_ino for path in paths}
+        if sha256 in existing:
+            inodes.discard(os.stat(existing[sha256]).st_ino)
+            reclaimable += size * len(inodes)
+        else:
+            reclaimable += size * (len(inodes) - 1)
+
+    print(f"Legacy files: {len(files)}, distinct contents: {len(groups)}, duplicates: {duplicate_files}")
+    print(f"Reclaimable: {reclaimable / (1024 * 1024):.1f} MB")
+    if args.dry_run:
+        return
+
+    ref_counts, urls = {}, {}
+    for sha256, paths in groups.items():
+        blob = existing.get(sha256)
+        if blob is None:
+            blob = blob_path(sha256, os.path.splitext(paths[0])[1])
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.link(paths[0], blob)
+            existing[sha256] = blob
+        blob_inode = os.stat(blob).st_ino
+        for path in paths:
+            if os.stat(path).st_ino != blob_inode:
+                _link_into_place(blob, path)
+            urls[f"/static/{os.path.relpath(path, UPLOAD_DIR).replace(os.sep, '/')}"] = sha256
+        # One reference per legacy path; items uploaded into the blob store are added below
+        ref_counts[sha256] = (blob, os.path.getsize(blob), len(paths))
+
+    for sha256, items in _blob_item_counts().items():
+        path = existing.get(sha256)
+        if path is None:
+            print(f"  Warning: blob {sha256} is referenced but missing on disk")
+            continue
+        _, size, count = ref_counts.get(sha256, (path, os.path.getsize(path), 0))
+        ref_counts[sha256] = (path, size, count + items)
+
+    blob_repository.set_ref_counts(ref_counts)
+    linked = knowledge_repository.set_blob_hashes(urls)
+    print(f"Linked {len(files)} files to {len(groups)} blobs; {linked} knowledge items updated")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Offline evaluation (and training) of the local intent classifier.
+
+Input is a JSONL file with one {"text": ..., "label": true|false} per line.
+Rows without a label are labelled by the LLM classifier, timing each call;
+pass --save-labels to write the labelled set back out for later runs.
+
+Reports, against the LLM labels:
+  - coverage: share of queries the local tiers answer without the LLM
+  - agreement on locally-answered queries, and overall (local + LLM fallback)
+  - mean local latency vs mean LLM latency, and total latency saved
+
+With --train, the labelled set is shuffled (--seed) and split: the embedding
+head is fitted on the training part and saved to INTENT_MODEL_PATH, and only
+the held-out part (--holdout) is evaluated, so the reported agreement is not
+measured on the data the model was trained on.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to sys.path to allow importing app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.ai_service import ai_service
+from app.services.intent_classifier import intent_classifier
+
+def load_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+async def label_with_llm(rows):
+    """Fill in missing labels from the LLM; returns per-call latencies in seconds."""
+    latencies = []
+    for row in rows:
+        if "label" in row:
+            continue
+        started = time.perf_counter()
+        row["label"] = await ai_service.check_intent_llm(row["text"])
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+def train(rows):
+    texts = [row["text"] for row in rows]
+    labels = [1.0 if row["label"] else 0.0 for row in rows]
+    embeddings = intent_classifier.embed(texts)
+    weights, bias = intent_classifier.train(embeddings, labels)
+    intent_classifier.save_model(settings.INTENT_MODEL_PATH, weights, bias)
+    intent_classifier.load_model(settings.INTENT_MODEL_PATH)
+    print(f"Trained on {len(rows)} examples, saved to {settings.INTENT_MODEL_PATH}")
+
+async def evaluate(rows, llm_latency):
+    local_answered = local_agree = overall_agree = 0
+    local_seconds = 0.0
+    for row in rows:
+        query = ai_service._clean_user_content(row["text"])
+        started = time.perf_counter()
+        verdict, _ = await intent_classifier.classify_local(query)
+        local_seconds += time.perf_counter() - started
+        if verdict is None:
+            # Uncertain band: production asks the LLM, which agrees with itself by definition
+            overall_agree += 1
+            continue
+        local_answered += 1
+        if verdict == row["label"]:
+            local_agree += 1
+            overall_agree += 1
+
+    total = len(rows)
+    mean_local_ms = local_seconds / total * 1000
+    print(f"Examples:              {total}")
+    print(f"Coverage (local):      {local_answered / total:.1%} ({local_answered}/{total})")
+    if local_answered:
+        print(f"Agreement (local):     {local_agree / local_answered:.1%}")
+    print(f"Agreement (overall):   {overall_agree / total:.1%}")
+    print(f"Mean local latency:    {mean_local_ms:.3f} ms")
+    if llm_latency is not None:
+        saved = local_answered * (llm_latency * 1000 - mean_local_ms)
+        print(f"Mean LLM latency:      {llm_latency * 1000:.1f} ms")
+        print(f"Latency saved:         {saved / 1000:.1f} s total, {saved / total:.1f} ms per query")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Evaluate the local intent classifier against LLM labels.")
+    parser.add_argument("dataset", help="JSONL file of {'text': ..., 'label': bool}")
+    parser.add_argument("--train", action="store_true", help="Fit and save the embedding head before evaluating")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of rows held out for evaluation with --train")
+    parser.add_argument("--seed", type=int, default=0, help="Shuffle seed for the train/evaluation split")
+    parser.add_argument("--save-labels", help="Write the dataset, with LLM-filled labels, to this path")
+    parser.add_argument("--llm-latency-ms", type=float, default=None,
+                        help="Mean LLM intent latency to assume when every row is already labelled")
+    args = parser.parse_args()
+
+    rows = load_rows(args.dataset)
+    if not rows:
+        print("Dataset is empty")
+        return
+
+    latencies = await label_with_llm(rows)
+    if args.save_labels:
+        with open(args.save_labels, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    llm_latency = sum(latencies) / len(latencies) if latencies else None
+    if llm_latency is None and args.llm_latency_ms is not None:
+        llm_latency = args.llm_latency_ms / 1000
+
+    if args.train:
+        if not 0 < args.holdout < 1:
+            parser.error("--holdout must be between 0 and 1")
+        shuffled = list(rows)
+        random.Random(args.seed).shuffle(shuffled)
+        held_out = max(1, int(len(shuffled) * args.holdout))
+        if held_out >= len(shuffled):
+            print("Dataset is too small to hold out an evaluation split")
+            return
+        rows = shuffled[:held_out]
+        train(shuffled[held_out:])
+        print(f"Evaluating on {len(rows)} held-out examples")
+    await evaluate(rows, llm_latency)
+
+if __name__ == "__main__":
+    asyncio.run(main())
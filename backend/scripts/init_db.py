@@ -7,6 +7,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.migrations import migrate
 
 # Database configuration from settings
 DB_HOST = settings.DB_HOST
@@ -47,99 +48,15 @@ def create_database():
         sys.exit(1)
 
 def create_tables():
+    """
+    Create or upgrade all tables by applying pending schema migrations.
+    """
     logger.info(f"Connecting to database '{DB_NAME}'...")
     try:
         conn = get_connection(DB_NAME)
-        cursor = conn.cursor()
-
-        # Table: users
-        logger.info("Creating table 'users'...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id VARCHAR(36) PRIMARY KEY,
-                username VARCHAR(255) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                avatar_url VARCHAR(512),
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Table: knowledge_base
-        print("Creating table 'knowledge_base'...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS knowledge_base (
-                id VARCHAR(50) PRIMARY KEY,
-                user_id VARCHAR(36) NOT NULL,
-                title VARCHAR(255) NOT NULL,
-                type VARCHAR(50) NOT NULL,
-                url VARCHAR(512) NOT NULL,
-                status VARCHAR(50) DEFAULT 'pending',
-                summary TEXT,
-                upload_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
-
-        # Table: chats
-        print("Creating table 'chats'...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS chats (
-                id VARCHAR(36) PRIMARY KEY,
-                user_id VARCHAR(36) NOT NULL,
-                title VARCHAR(255),
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
-
-        # Table: messages
-        print("Creating table 'messages'...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id VARCHAR(36) PRIMARY KEY,
-                chat_id VARCHAR(36) NOT NULL,
-                role VARCHAR(20) NOT NULL,
-                content LONGTEXT NOT NULL,
-                model VARCHAR(50),
-                thinking TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (chat_id) REFERENCES chats(id) ON DELETE CASCADE
-            )
-        """)
-
-        # Table: analysis_results
-        print("Creating table 'analysis_results'...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS analysis_results (
-                id VARCHAR(36) PRIMARY KEY,
-                user_id VARCHAR(36) NOT NULL,
-                topic VARCHAR(255) NOT NULL,
-                audience VARCHAR(255),
-                duration INT,
-                style VARCHAR(100),
-                structure JSON,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-            )
-        """)
-
-        # Table: generated_contents
-        print("Creating table 'generated_contents'...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS generated_contents (
-                id VARCHAR(36) PRIMARY KEY,
-                analysis_id VARCHAR(36) NOT NULL,
-                slides JSON,
-                lesson_plan LONGTEXT,
-                games JSON,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (analysis_id) REFERENCES analysis_results(id) ON DELETE CASCADE
-            )
-        """)
-
-        conn.commit()
+        applied = migrate(conn)
         conn.close()
-        print("All tables created successfully.")
+        print(f"All tables created successfully. Applied migrations: {applied or 'none'}")
 
     except Exception as e:
         print(f"Error creating tables: {e}")
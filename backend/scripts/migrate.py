@@ -0,0 +1,26 @@
+import argparse
+import sys
+import os
+
+# Add the parent directory to sys.path to allow importing app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.migrations import migrate, status
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations to the EduMind database.")
+    parser.add_argument("--target", type=int, default=None, help="Stop after this migration version")
+    parser.add_argument("--status", action="store_true", help="List migrations and whether they are applied")
+    args = parser.parse_args()
+
+    if args.status:
+        for row in status():
+            mark = "x" if row["applied"] else " "
+            print(f"[{mark}] {row['version']:04d}_{row['name']}")
+        return
+
+    applied = migrate(target=args.target)
+    print(f"Applied migrations: {applied or 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Add the backend directory to sys.path to allow importing app, as the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,36 @@
+from app.services.chat_cache import ChatHistoryCache
+
+def _message(content: str) -> dict:
+    return {"role": "user", "content": content}
+
+def test_fill_is_skipped_when_a_turn_is_appended_during_the_read():
+    cache = ChatHistoryCache()
+    generation = cache.begin_fill("chat")
+    # save_turn runs while the database read is in flight; the chat is not cached yet
+    cache.append("chat", [_message("new")])
+
+    assert not cache.end_fill("chat", generation, "user", [_message("old")])
+    assert cache.get("chat", "user") is None
+    assert cache.stats()["stale_fills"] == 1
+
+    # The next miss reads again and is cached
+    generation = cache.begin_fill("chat")
+    assert cache.end_fill("chat", generation, "user", [_message("old"), _message("new")])
+    assert [m["content"] for m in cache.get("chat", "user")] == ["old", "new"]
+
+def test_fill_is_skipped_when_the_chat_is_invalidated_during_the_read():
+    cache = ChatHistoryCache()
+    generation = cache.begin_fill("chat")
+    cache.invalidate("chat")
+
+    assert not cache.end_fill("chat", generation, "user", [_message("old")])
+    assert cache.get("chat", "user") is None
+
+def test_failed_fill_stops_tracking_the_chat():
+    cache = ChatHistoryCache()
+    first = cache.begin_fill("chat")
+    second = cache.begin_fill("chat")
+
+    assert not cache.end_fill("chat", first, "user", None)
+    assert cache.end_fill("chat", second, "user", [_message("old")])
+    assert cache._fills == {}
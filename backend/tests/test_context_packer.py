@@ -0,0 +1,35 @@
+from app.services.context_packer import ContextPacker, _terms, count_tokens
+
+def _packer() -> ContextPacker:
+    return ContextPacker({"kimi": 1300}, knowledge_share=0.6, passage_max_tokens=600, reserve_tokens=300)
+
+def _history(messages: int) -> list:
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": "勾股定理" * 25} for i in range(messages)]
+
+def test_history_uses_the_budget_left_by_missing_passages():
+    packed = _packer().pack("问题", [], _history(20), "kimi")
+
+    available = 1300 - 300 - count_tokens("问题")
+    # 104 tokens per message: well past the 40% history share, up to the whole budget
+    assert packed.tokens["knowledge"] == 0
+    assert len(packed.history) == available // 104
+    assert packed.tokens["history"] > available * 0.4
+
+def test_passages_still_capped_at_knowledge_share():
+    passages = [f"第{i}段：" + "直角三角形的斜边。" * 40 for i in range(5)]
+    packed = _packer().pack("直角三角形", passages, _history(20), "kimi")
+
+    available = 1300 - 300 - count_tokens("直角三角形")
+    assert 0 < packed.tokens["knowledge"] <= int(available * 0.6)
+    assert packed.tokens["total"] <= 1300 - 300
+
+def test_snippet_gap_markers_count_against_the_budget():
+    packer = _packer()
+    sentences = [("勾股定理成立。" if i % 2 == 0 else "无关内容在此。") for i in range(40)]
+    passage = "".join(sentences)
+
+    snippets = [packer.extract_snippet(passage, _terms("勾股定理"), max_tokens) for max_tokens in range(8, 80)]
+
+    assert any("……" in snippet for snippet in snippets)
+    for max_tokens, snippet in zip(range(8, 80), snippets):
+        assert count_tokens(snippet) <= max_tokens
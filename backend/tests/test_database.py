@@ -0,0 +1,27 @@
+import asyncio
+import time
+
+from app.core.database import run_in_db
+
+def test_event_loop_stays_responsive_during_slow_query():
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        started = time.perf_counter()
+        # Stands in for a slow query: blocks its worker thread, not the loop
+        await run_in_db(time.sleep, 0.5)
+        elapsed = time.perf_counter() - started
+        task.cancel()
+        return ticks, elapsed
+
+    ticks, elapsed = asyncio.run(scenario())
+    assert elapsed >= 0.5
+    # A blocked loop would not tick at all until the sleep returned
+    assert ticks >= 10
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from app.services import extraction_jobs as jobs_module
+from app.services.extraction_jobs import FAILED, ExtractionError, ExtractionJobManager
+
+@pytest.fixture
+def provider(monkeypatch):
+    calls = {"deleted": []}
+
+    async def upload(path):
+        await asyncio.sleep(0.3)
+        return "file-1"
+
+    async def fetch(file_id):
+        await asyncio.sleep(10)
+
+    async def delete(file_id):
+        calls["deleted"].append(file_id)
+        return True
+
+    monkeypatch.setattr(jobs_module.ai_service, "upload_for_extraction", upload)
+    monkeypatch.setattr(jobs_module.ai_service, "fetch_extracted_content", fetch)
+    monkeypatch.setattr(jobs_module.ai_service, "delete_file", delete)
+    return calls
+
+def test_upload_finishing_after_the_deadline_is_deleted(provider):
+    async def scenario():
+        manager = ExtractionJobManager(deadline=0.1)
+        job = manager.submit("lesson.pdf")
+        with pytest.raises(ExtractionError):
+            await job.wait()
+        assert provider["deleted"] == []
+        # The provider accepts the upload after the job gave up
+        await asyncio.sleep(0.4)
+        return manager.stats()
+
+    stats = asyncio.run(scenario())
+    assert provider["deleted"] == ["file-1"]
+    assert stats["failed"] == 1
+
+def test_cancelled_job_counts_as_failed(provider):
+    async def scenario():
+        manager = ExtractionJobManager(deadline=30)
+        job = manager.submit("lesson.pdf")
+        await asyncio.sleep(0.4)
+        for task in list(manager._tasks):
+            task.cancel()
+        await asyncio.sleep(0.05)
+        return job, manager.stats()
+
+    job, stats = asyncio.run(scenario())
+    assert job.status == FAILED
+    assert stats["submitted"] == stats["ready"] + stats["failed"] == 1
+    assert provider["deleted"] == ["file-1"]
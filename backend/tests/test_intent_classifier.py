@@ -0,0 +1,22 @@
+import pytest
+
+from app.services.intent_classifier import IntentClassifier, rule_probability
+
+HIGH = IntentClassifier(enabled=False).high
+
+@pytest.mark.parametrize("text", ["解方程 2x+3=7", "x^2 - 4 = 0", "已知 f(x)=x+1，求f(2)"])
+def test_expressions_are_confident(text):
+    assert rule_probability(text) >= HIGH
+
+@pytest.mark.parametrize("text", [
+    "2024-2025学年",
+    "9/1开学",
+    "3-5岁的孩子",
+    "2024 - 2025 学年",
+    "10:00-11:30 上课",
+])
+def test_dates_and_ranges_are_not_confident(text):
+    assert rule_probability(text) < HIGH
+
+def test_teaching_question_with_school_year_is_not_routed_to_reasoning():
+    assert rule_probability("2024-2025学年第一学期的教学计划怎么写") < 0.5
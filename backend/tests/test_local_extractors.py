@@ -0,0 +1,22 @@
+from pptx import Presentation
+
+from app.services.local_extractors import extract_pptx, local_extractor
+
+def test_pptx_slide_title_appears_once(tmp_path):
+    presentation = Presentation()
+    slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+    slide.shapes.title.text = "勾股定理"
+    slide.placeholders[1].text = "直角三角形两直角边的平方和等于斜边的平方"
+    path = tmp_path / "deck.pptx"
+    presentation.save(path)
+
+    text = extract_pptx(str(path))
+
+    assert text == "## Slide 1: 勾股定理\n直角三角形两直角边的平方和等于斜边的平方"
+    assert text.count("勾股定理") == 1
+
+def test_legacy_office_files_go_remote():
+    assert not local_extractor.supports("lesson.doc")
+    assert not local_extractor.supports("lesson.ppt")
+    assert local_extractor.supports("lesson.docx")
+    assert local_extractor.supports("lesson.pptx")
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.speculation import SpeculationStats, SpeculativeStream
+
+async def _slow_source(first_chunk_after: float, chunks=("a", "b")):
+    await asyncio.sleep(first_chunk_after)
+    for chunk in chunks:
+        yield chunk
+
+def test_release_before_first_chunk_counts_time_to_verdict():
+    stats = SpeculationStats()
+
+    async def scenario():
+        # The verdict takes 200 ms; the provider needs 500 ms to its first chunk
+        stream = SpeculativeStream(_slow_source(0.5), stats=stats)
+        await asyncio.sleep(0.2)
+        stream.release(time.perf_counter())
+        chunks = [chunk async for chunk in stream.drain()]
+        await stream.cancel()
+        return chunks
+
+    assert asyncio.run(scenario()) == ["a", "b"]
+    result = stats.stats()
+    assert result["started"] == result["released"] == 1
+    assert result["cancelled"] == 0
+    assert result["ttft_saved_ms_total"] == pytest.approx(200, abs=60)
+
+def test_release_after_first_chunk_counts_provider_ttft():
+    stats = SpeculationStats()
+
+    async def scenario():
+        stream = SpeculativeStream(_slow_source(0.1), stats=stats)
+        await asyncio.sleep(0.3)
+        stream.release(time.perf_counter())
+        await stream.cancel()
+
+    asyncio.run(scenario())
+    result = stats.stats()
+    assert result["chunks_saved"] == 2
+    assert result["ttft_saved_ms_total"] == pytest.approx(100, abs=60)
+
+def test_every_cancelled_stream_is_counted_once():
+    stats = SpeculationStats()
+
+    async def scenario():
+        stream = SpeculativeStream(_slow_source(0.5), stats=stats)
+        await stream.cancel()
+        await stream.cancel()
+        # Streams without stats, e.g. teaching advice, are not counted
+        await SpeculativeStream(_slow_source(0.5)).cancel()
+
+    asyncio.run(scenario())
+    result = stats.stats()
+    assert result["started"] == result["cancelled"] == 1
+    assert result["released"] == 0
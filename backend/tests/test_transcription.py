@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.services.transcription import (
+    Recognizer,
+    SegmentedTranscriber,
+    TranscriptionError,
+    split_on_silence,
+)
+
+RATE = 16000
+
+def _pcm(samples: np.ndarray) -> bytes:
+    return np.clip(samples, -32768, 32767).astype("<i2").tobytes()
+
+def _noise(seconds: float, std: float, rng) -> np.ndarray:
+    return rng.normal(0, std, int(seconds * RATE))
+
+def _lecture(amplitudes, rng) -> bytes:
+    """Bursts of 1 s voiced audio, each with its own amplitude, between 0.6 s pauses."""
+    t = np.arange(RATE) / RATE
+    parts = [_noise(0.6, 30, rng)]
+    for amplitude in amplitudes:
+        parts += [np.sin(2 * np.pi * 180 * t) * amplitude + rng.normal(0, 30, RATE), _noise(0.6, 30, rng)]
+    return _pcm(np.concatenate(parts))
+
+class LabelRecognizer(Recognizer):
+    """Names a segment by its peak amplitude in thousands; earlier bursts take longer."""
+    name = "label"
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def transcribe(self, pcm: bytes, sample_rate: int) -> str:
+        peak = int(np.abs(np.frombuffer(pcm, dtype="<i2")).max())
+        label = f"burst{round(peak / 1000)}"
+        with self._lock:
+            self.calls[label] = self.calls.get(label, 0) + 1
+            attempt = self.calls[label]
+        if attempt <= self.failures:
+            raise RuntimeError(f"{label} unavailable")
+        # Finish out of order: the first burst returns last
+        time.sleep(0.1 / round(peak / 3000))
+        return label
+
+def _transcriber(recognizer: Recognizer, retries: int = 1) -> SegmentedTranscriber:
+    return SegmentedTranscriber(recognizer, max_concurrency=4, min_seconds=0.5, max_seconds=5.0,
+                                min_silence_ms=300, retries=retries)
+
+def test_split_on_silence_drops_all_silent_input():
+    rng = np.random.default_rng(0)
+    assert split_on_silence(bytes(RATE * 4), RATE, 1.0, 3.0) == []
+    assert split_on_silence(_pcm(_noise(4.0, 30, rng)), RATE, 1.0, 3.0) == []
+
+def test_split_on_silence_cuts_at_max_seconds_without_pauses():
+    rng = np.random.default_rng(0)
+    # Loud and quiet 30 ms windows alternate at random: never a 1 s pause
+    levels = rng.choice([1000.0, 8000.0], size=400)
+    samples = rng.normal(0, 1, 400 * 480) * np.repeat(levels, 480)
+    spans = split_on_silence(_pcm(samples), RATE, 1.0, 3.0, min_silence_ms=1000)
+
+    assert len(spans) >= 4
+    assert spans[0][0] == 0 and spans[-1][1] == len(samples)
+    for (_, end), (start, _) in zip(spans, spans[1:]):
+        assert end == start
+    for start, end in spans:
+        assert end - start <= 3.0 * RATE
+    # The cut is the quietest window in the second half of the span
+    for start, end in spans[:-1]:
+        assert end - start >= 1.5 * RATE
+
+def test_segments_are_stitched_in_order():
+    rng = np.random.default_rng(0)
+    recognizer = LabelRecognizer()
+    progress = []
+
+    async def report(done, total, segment):
+        progress.append((done, total, segment.text))
+
+    transcript = asyncio.run(_transcriber(recognizer).transcribe(
+        _lecture([3000, 6000, 9000], rng), RATE, on_progress=report
+    ))
+
+    assert [segment.text for segment in transcript.segments] == ["burst3", "burst6", "burst9"]
+    starts = [segment.start for segment in transcript.segments]
+    assert starts == sorted(starts)
+    assert transcript.text.splitlines()[0] == "[00:00] burst3"
+    assert transcript.failed == 0
+    # Progress follows completion order, which the recognizer reverses
+    assert [done for done, _, _ in progress] == [1, 2, 3]
+    assert [text for _, _, text in progress] == ["burst9", "burst6", "burst3"]
+
+def test_failed_segment_is_retried():
+    rng = np.random.default_rng(0)
+    recognizer = LabelRecognizer(failures=1)
+
+    transcript = asyncio.run(_transcriber(recognizer, retries=1).transcribe(_lecture([3000, 6000], rng), RATE))
+
+    assert [segment.text for segment in transcript.segments] == ["burst3", "burst6"]
+    assert transcript.failed == 0
+    assert recognizer.calls == {"burst3": 2, "burst6": 2}
+
+def test_all_segments_failing_raises():
+    rng = np.random.default_rng(0)
+    recognizer = LabelRecognizer(failures=5)
+
+    with pytest.raises(TranscriptionError):
+        asyncio.run(_transcriber(recognizer, retries=1).transcribe(_lecture([3000, 6000], rng), RATE))
+
+def test_recognizer_requires_transcribe():
+    class Incomplete(Recognizer):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()